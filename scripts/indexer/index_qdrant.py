@@ -23,7 +23,7 @@ import os
 import time # Necesario para medir duración y para pausas
 import logging
 from pathlib import Path
-from typing import Dict, Optional, List, Any, Set
+from typing import Dict, Optional, List, Any, Set, Tuple
 
 # --- Importación de TQDM ---
 tqdm_available = False
@@ -121,6 +121,8 @@ def main():
     parser.add_argument("--batch-size", type=int, default=settings.qdrant_batch_size, help="Tamaño de lote Qdrant.")
     parser.add_argument("--force-reindex", action="store_true", help="Forzar reindexación total ignorando estado.")
     parser.add_argument("--dry-run", action="store_true", help="Simular sin modificar Qdrant ni estado.")
+    parser.add_argument("--verify-content", action="store_true",
+                        help="Leer y hashear todos los archivos aunque su tamaño y mtime no hayan cambiado.")
     args = parser.parse_args()
 
     # --- Validaciones Iniciales ---
@@ -188,39 +190,50 @@ def main():
 
         # 2. Cargar Q&As actuales
         logger.info(f"Escaneando y cargando Q&As desde {args.source}...")
-        all_current_qas_map = data_loader.load_all_qas_from_directory(args.source)
+        current_file_hashes: Dict[str, bytes] = {} # {ruta relativa -> hash de bytes}, para saltar archivos idénticos
+        current_file_stats: Dict[str, Tuple[int, int]] = {} # {ruta relativa -> (tamaño, mtime_ns)}
+        # Archivos con el mismo tamaño y mtime que en la ejecución anterior: no se leen
+        # (con --force-reindex hacen falta todos los Q&As, así que se leen todos; con
+        # --verify-content o INPUT_TRUST_FILE_STATS=false se compara siempre el contenido)
+        known_file_stats = None
+        trust_file_stats = settings.input_trust_file_stats and not args.verify_content
+        if trust_file_stats and not args.force_reindex and isinstance(previous_indexed_points, state_manager.IndexedPoints):
+            known_file_stats = previous_indexed_points.reusable_file_stats()
+        all_current_qas_map = data_loader.load_all_qas_from_directory(
+            args.source, current_file_hashes, current_file_stats, known_file_stats
+        )
         total_processed_files = len(all_current_qas_map)
         logger.info(f"Lectura completada. {total_processed_files} archivos JSON procesados.")
 
         # 3. Calcular Diff
         logger.info("Comparando Q&As actuales con estado anterior...")
         qas_for_processing, ids_to_delete, current_points_details = state_manager.calculate_diff(
-            all_current_qas_map, previous_indexed_points
+            all_current_qas_map, previous_indexed_points, current_file_hashes=current_file_hashes,
+            current_file_stats=current_file_stats
         )
-        total_qas_found = sum(len(v) for v in all_current_qas_map.values())
+        # Contar desde el diff: los archivos no leídos (mismo tamaño y mtime) vienen
+        # vacíos en all_current_qas_map, pero sus puntos se copian del estado previo
+        total_qas_found = len(current_points_details)
 
         # 4. Aplicar Force Reindex si es necesario
         if args.force_reindex and not args.dry_run: # No recalcular en dry run, solo mostrar intención
              logger.warning("Forzando reindexación (--force-reindex)...")
              qas_for_processing = []
-             current_points_details = {}
-             all_current_point_ids: Set[str] = set()
+             current_points_details = state_manager.IndexedPoints() # Columnar, sin un objeto por punto
              total_qas_found = 0
              for file_rel_path, qa_list in all_current_qas_map.items():
                  total_qas_found += len(qa_list)
-                 for qa_item in qa_list:
-                     question = qa_item.get('q')
-                     if not question or not isinstance(question, str): continue
-                     point_id = state_manager.generate_qa_uuid(question, file_rel_path)
-                     q_hash = state_manager.generate_content_hash(question)
-                     all_current_point_ids.add(point_id)
-                     current_points_details[point_id] = {"source_file": file_rel_path, "question_hash": q_hash}
-                     qa_item['_id'] = point_id
-                     qa_item['_question_hash'] = q_hash
-                     qa_item['_source_file'] = file_rel_path
-                     qas_for_processing.append(qa_item)
-             previous_ids = set(previous_state.get('indexed_points', {}).keys())
-             ids_to_delete = list(previous_ids - all_current_point_ids)
+                 valid_qas = [qa_item for qa_item in qa_list if qa_item.get('q') and isinstance(qa_item.get('q'), str)]
+                 questions = [qa_item['q'] for qa_item in valid_qas]
+                 # Ruta normalizada una vez por archivo; IDs y hashes en lote
+                 point_ids = state_manager.generate_file_qa_uuids(questions, file_rel_path)
+                 q_hashes = state_manager.generate_content_hashes_batch(questions)
+                 current_points_details.extend(point_ids, file_rel_path, q_hashes)
+                 for qa_item, point_id, q_hash in zip(valid_qas, point_ids, q_hashes):
+                     qas_for_processing.append(state_manager.QAToProcess(point_id, q_hash, file_rel_path, qa_item))
+             # Una pasada sobre el estado previo probando contra las claves actuales,
+             # sin construir sets de IDs (y conservando el orden del estado previo)
+             ids_to_delete = [pid for pid in previous_indexed_points.keys() if pid not in current_points_details]
              logger.warning(f"Force-reindex: {len(qas_for_processing)} Q&As marcados para upsert.")
              logger.warning(f"Force-reindex: {len(ids_to_delete)} puntos del estado anterior marcados para eliminación.")
         elif args.force_reindex and args.dry_run:
@@ -239,7 +252,7 @@ def main():
         points_to_upsert: List[PointStruct] = []
         if qas_for_processing:
             logger.info("Preparando puntos para Qdrant (generando embeddings y chunking)...")
-            questions_to_embed = [qa['q'] for qa in qas_for_processing]
+            questions_to_embed = [qa.qa_item['q'] for qa in qas_for_processing]
 
             # Generar embeddings en lote
             logger.info(f"Generando {len(questions_to_embed)} embeddings...")
@@ -257,13 +270,21 @@ def main():
             if not disable_tqdm:
                 iterable_qas = tqdm(qas_for_processing, desc="Construyendo puntos Qdrant", unit="q&a")
 
+            # Dividir todas las respuestas en una sola llamada por lotes (en varios procesos si son muchas)
+            all_answer_chunks = text_chunker.chunk_texts_parallel(
+                [qa.qa_item.get('a') for qa in qas_for_processing],
+                chunk_size=settings.chunk_size, chunk_overlap=settings.chunk_overlap,
+                min_chunk_size=settings.chunk_min_size,
+                normalize_whitespace=settings.chunk_normalize_whitespace
+            )
+
             logger.info("Construyendo puntos Qdrant (PointStructs)...")
-            for i, qa_item in enumerate(iterable_qas):
+            for i, (point_id, _q_hash, source_file, qa_item) in enumerate(iterable_qas):
                 try:
                     answer_content = qa_item['a']
-                    answer_chunks = text_chunker.chunk_text(chunker, answer_content)
+                    answer_chunks = all_answer_chunks[i]
                     if not answer_chunks:
-                         logger.warning(f"No se generaron chunks para Q/A ID: {qa_item['_id']}. Usando respuesta original.")
+                         logger.warning(f"No se generaron chunks para Q/A ID: {point_id}. Usando respuesta original.")
                          answer_chunks = [answer_content]
 
                     payload = {
@@ -271,16 +292,16 @@ def main():
                         "answer": answer_chunks,
                         "product": qa_item.get('product', 'General'),
                         "keywords": qa_item.get('keywords', []),
-                        "source": qa_item['_source_file']
+                        "source": source_file
                     }
                     if PointStruct is Dict: # Fallback si qdrant no importó PointStruct
-                        point = {"id": qa_item['_id'], "vector": question_vectors[i].tolist(), "payload": payload}
+                        point = {"id": point_id, "vector": question_vectors[i].tolist(), "payload": payload}
                     else:
-                         point = PointStruct(id=qa_item['_id'], vector=question_vectors[i].tolist(), payload=payload)
+                         point = PointStruct(id=point_id, vector=question_vectors[i].tolist(), payload=payload)
                     points_to_upsert.append(point) # type: ignore
 
                 except Exception as e:
-                     logger.error(f"Error preparando punto Qdrant (ID: {qa_item.get('_id', 'N/A')}, Archivo: {qa_item.get('_source_file', 'N/A')}): {e}", exc_info=False) # exc_info=False para no llenar log
+                     logger.error(f"Error preparando punto Qdrant (ID: {point_id}, Archivo: {source_file}): {e}", exc_info=False) # exc_info=False para no llenar log
                      error_count += 1
             logger.info(f"Preparados {len(points_to_upsert)} puntos para upsert (errores preparación: {error_count}).")
 
@@ -297,24 +318,39 @@ def main():
             logger.warning("No se harán cambios en Qdrant ni en el archivo de estado.")
         else:
             logger.info("Ejecutando operaciones en Qdrant...")
+            # Sin estado previo es una carga inicial: si la colección se crea
+            # ahora, crearla sin indexar y construir el índice HNSW una sola vez al final.
+            bulk_load = not previous_indexed_points and bool(points_to_upsert)
+            created_collections: Set[str] = set()
             # Asegurar colección
             collection_ok = qdrant_ops.ensure_collection(
                 client=qdrant_client, collection_name=settings.qdrant_collection_name,
-                vector_size=settings.vector_dimension, distance_metric_str=settings.distance_metric
+                vector_size=settings.vector_dimension, distance_metric_str=settings.distance_metric,
+                verify_config=True, # Una vez por ejecución: avisar si la colección difiere
+                bulk_load=bulk_load,
+                created_collections=created_collections
             )
             if not collection_ok:
                  logger.critical(f"No se pudo asegurar colección '{settings.qdrant_collection_name}'. Abortando.")
                  raise RuntimeError("Fallo colección Qdrant.")
 
+            # Solo una colección creada en esta llamada tiene la indexación desactivada
+            bulk_load = bulk_load and settings.qdrant_collection_name in created_collections
+
             # Realizar Upsert
             upsert_errors = 0
-            if points_to_upsert:
-                upserted_count, upsert_errors = qdrant_ops.batch_upsert(
-                    client=qdrant_client, collection_name=settings.qdrant_collection_name,
-                    points=points_to_upsert, batch_size=args.batch_size
-                )
-                error_count += upsert_errors
-            else: logger.info("No hay puntos nuevos/modificados para upsert.")
+            try:
+                if points_to_upsert:
+                    upserted_count, upsert_errors = qdrant_ops.batch_upsert(
+                        client=qdrant_client, collection_name=settings.qdrant_collection_name,
+                        points=points_to_upsert, batch_size=args.batch_size
+                    )
+                    error_count += upsert_errors
+                else: logger.info("No hay puntos nuevos/modificados para upsert.")
+            finally:
+                # También si el upsert falla: no dejar la colección sin índice HNSW
+                if bulk_load and not qdrant_ops.finalize_bulk_load(qdrant_client, settings.qdrant_collection_name):
+                    logger.warning("No se pudo reactivar la indexación tras la carga inicial; revisar optimizers_config de la colección.")
 
             # Realizar Delete
             delete_errors = 0
@@ -328,7 +364,13 @@ def main():
 
             # 7. Guardar Estado Final (solo si no es dry run)
             logger.info("Guardando estado final...")
-            save_success = state_manager.save_state(args.state_file, final_state_to_save)
+            # Si otro proceso guardó el estado mientras tanto, no pisarlo (se perderían sus borrados)
+            save_success = state_manager.save_state(
+                args.state_file, final_state_to_save,
+                pretty=settings.state_file_pretty,
+                expected_prev_sha256=previous_state.get('file_sha256'),
+                durable=settings.state_file_fsync
+            )
             if not save_success:
                  logger.error("¡FALLO AL GUARDAR EL ARCHIVO DE ESTADO!")
                  error_count += 1
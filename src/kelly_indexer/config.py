@@ -79,6 +79,21 @@ class Settings(BaseSettings):
         alias='STATE_FILE_PATH',
         description="Ruta al archivo JSON que guarda el estado de la indexación."
     )
+    state_file_pretty: bool = Field(
+        default=False,
+        alias='STATE_FILE_PRETTY',
+        description="Guardar el archivo de estado JSON indentado (más grande y lento; útil para depurar)."
+    )
+    input_trust_file_stats: bool = Field(
+        default=True,
+        alias='INPUT_TRUST_FILE_STATS',
+        description="No leer los archivos de entrada con el mismo tamaño y mtime que en la ejecución anterior (desactivar para comparar siempre su contenido)."
+    )
+    state_file_fsync: bool = Field(
+        default=True,
+        alias='STATE_FILE_FSYNC',
+        description="Hacer fsync al guardar el estado (desactivarlo es más rápido, pero un corte de corriente puede perder el último estado)."
+    )
     # Rutas para directorios que podrían necesitar ser creados (usar Path normal)
     input_dir_processed: Path = Field(
         default=PROJECT_ROOT / "data" / "input" / "processed",
@@ -104,6 +119,17 @@ class Settings(BaseSettings):
         alias='CHUNK_OVERLAP',
         description="Solapamiento de caracteres entre chunks de respuesta."
     )
+    chunk_min_size: int = Field(
+        default=0,
+        ge=0,
+        alias='CHUNK_MIN_SIZE',
+        description="Chunks de respuesta más cortos que esto se unen con un vecino (0 = desactivado)."
+    )
+    chunk_normalize_whitespace: bool = Field(
+        default=False,
+        alias='CHUNK_NORMALIZE_WHITESPACE',
+        description="Colapsar espacios y saltos de línea repetidos de las respuestas antes de dividirlas (reescribe el texto guardado)."
+    )
     qdrant_batch_size: PositiveInt = Field(
         default=128,
         alias='QDRANT_BATCH_SIZE',
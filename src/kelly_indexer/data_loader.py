@@ -7,9 +7,33 @@ desde los archivos JSON de entrada.
 """
 
 import json
+import hashlib
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Mapping, Tuple, Union
+
+# orjson es opcional (extra 'speedups'): parsea directamente los bytes leídos
+try:
+    import orjson
+except ImportError:
+    orjson = None # type: ignore
+
+# ijson es opcional (extra 'speedups'): valida los items de archivos grandes a
+# medida que se parsean, sin construir antes la lista completa
+try:
+    import ijson
+except ImportError:
+    ijson = None # type: ignore
+
+# msgspec es opcional (extra 'speedups'): valida en C la forma de todos los
+# items ya parseados de un archivo; si alguno no encaja se usa la validación item a item.
+try:
+    import msgspec
+except ImportError:
+    msgspec = None # type: ignore
 
 # Obtener logger para este módulo
 logger = logging.getLogger(__name__)
@@ -31,7 +55,129 @@ except ImportError:
 # Definir las claves esperadas en cada objeto Q&A dentro del JSON
 EXPECTED_QA_KEYS = {'q', 'a', 'product', 'keywords'}
 
-def load_single_json_file(file_path: Path) -> Optional[List[Dict[str, Any]]]:
+# A partir de cuántos archivos se leen y parsean en un pool de hilos (la
+# lectura libera el GIL); con menos, el coste de crear el pool no compensa.
+PARALLEL_LOAD_MIN_FILES = 16
+# A partir de cuántos archivos el parseo y la validación (CPU, con el GIL) se
+# reparten entre procesos, enviando los archivos en grupos de PROCESS_LOAD_CHUNKSIZE.
+PROCESS_LOAD_MIN_FILES = 64
+PROCESS_LOAD_CHUNKSIZE = 32
+
+# Tamaño a partir del cual un archivo se parsea en streaming con ijson (si está
+# instalado) en vez de cargarlo entero con orjson/json.
+STREAM_PARSE_MIN_BYTES = 1024 * 1024
+
+# Errores de parseo de JSON (los de ijson no heredan de json.JSONDecodeError)
+_JSON_DECODE_ERRORS: Tuple[type, ...] = (json.JSONDecodeError, UnicodeDecodeError) + ((ijson.JSONError,) if ijson is not None else ())
+
+# Tamaño (bytes) del hash de contenido de archivo; fijo e independiente del
+# algoritmo de hash de preguntas del estado para que siempre sea comparable.
+FILE_HASH_SIZE = 16
+
+if msgspec is not None:
+    class _QAItem(msgspec.Struct):
+        """Forma esperada de un item Q&A (las claves extra se ignoran al validar)."""
+        q: str
+        a: str
+        product: str
+        keywords: list
+
+def _all_items_valid(data: Any) -> bool:
+    """
+    Comprueba con msgspec si el JSON ya parseado es una lista de items Q&A
+    válidos (msgspec.convert valida los objetos Python sin volver a parsear).
+    False si msgspec no está disponible o algún item no encaja; en ese caso
+    la validación item a item da los avisos detallados.
+    """
+    if msgspec is None:
+        return False
+    try:
+        typed_items = msgspec.convert(data, List[_QAItem])
+    except msgspec.ValidationError:
+        return False
+    return all(item.q.strip() and item.a.strip() for item in typed_items)
+
+def file_content_hash(raw: bytes) -> bytes:
+    """Hash (SHA-256 truncado a FILE_HASH_SIZE bytes) de los bytes de un archivo fuente."""
+    return hashlib.sha256(raw).digest()[:FILE_HASH_SIZE]
+
+# Flags para leer con os.open: binario en Windows y sin heredar el descriptor
+_READ_FLAGS = os.O_RDONLY | getattr(os, 'O_BINARY', 0) | getattr(os, 'O_CLOEXEC', 0)
+
+def _read_file_bytes(path: str) -> bytes:
+    """
+    Lee un archivo completo con el mínimo de llamadas al sistema: open, fstat,
+    un único read del tamaño conocido (+1 para detectar el fin sin otro read)
+    y close. open(...).read() añade la comprobación de terminal (ioctl), otro
+    fstat y una lectura extra para confirmar el fin del archivo.
+    """
+    fd = os.open(path, _READ_FLAGS)
+    try:
+        return _read_fd(fd, os.fstat(fd).st_size)
+    finally:
+        os.close(fd)
+
+def _read_fd(fd: int, size: int) -> bytes:
+    """
+    Lee el resto de un descriptor de `size` bytes (ver _read_file_bytes).
+    Una lectura corta (señales, sistemas de archivos de red o FUSE) no se toma
+    como fin del archivo: se sigue leyendo hasta tener size + 1 bytes o un
+    read vacío.
+    """
+    data = os.read(fd, size + 1)
+    if len(data) == size or not data: # Caso normal: todo en un read (y el +1 confirma el fin)
+        return data
+    chunks = [data]
+    read = len(data)
+    while read <= size: # Lectura corta: completar el tamaño conocido y el byte de comprobación
+        chunk = os.read(fd, size + 1 - read)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+        read += len(chunk)
+    # El archivo creció mientras se leía: leer el resto
+    while True:
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+class _HashingReader:
+    """
+    Lector para ijson que calcula el hash de todo lo leído del archivo y
+    empieza devolviendo `prefix` (bytes ya leídos y ya incluidos en el hash).
+    """
+
+    def __init__(self, f: Any, hasher: Any, prefix: bytes = b"") -> None:
+        self._f = f
+        self._hasher = hasher
+        self._prefix = prefix
+
+    def read(self, size: int = -1) -> bytes:
+        if self._prefix:
+            if size is None or size < 0:
+                data, self._prefix = self._prefix + self._read(-1), b""
+                return data
+            data, self._prefix = self._prefix[:size], self._prefix[size:]
+            return data
+        return self._read(size)
+
+    def _read(self, size: int) -> bytes:
+        data = self._f.read(size)
+        self._hasher.update(data)
+        return data
+
+def _json_loads(raw: bytes) -> Any:
+    """Parsea bytes JSON (UTF-8) con orjson si está disponible, si no con json."""
+    if orjson is not None:
+        return orjson.loads(raw) # orjson.JSONDecodeError hereda de json.JSONDecodeError
+    return json.loads(raw)
+
+def load_single_json_file(
+    file_path: Union[Path, bytes],
+    file_hashes: Optional[Dict[str, bytes]] = None,
+    hash_key: Optional[str] = None
+) -> Optional[List[Dict[str, Any]]]:
     """
     Carga y valida el contenido de un único archivo JSON.
 
@@ -39,13 +185,20 @@ def load_single_json_file(file_path: Path) -> Optional[List[Dict[str, Any]]]:
     objeto tiene las claves definidas en EXPECTED_QA_KEYS.
 
     Args:
-        file_path: Ruta (objeto Path) al archivo JSON.
+        file_path: Ruta (objeto Path) al archivo JSON, o directamente su
+                   contenido (bytes) si ya está en memoria: se valida igual
+                   sin tocar el sistema de archivos.
+        file_hashes: Si se indica, se guarda en él file_content_hash() de los
+                     bytes leídos bajo la clave `hash_key` (por defecto el
+                     nombre del archivo, o "<bytes>" si se pasan bytes).
 
     Returns:
         Una lista de diccionarios Q&A válidos si el archivo es correcto,
         una lista vacía si el archivo JSON contiene una lista vacía,
         o None si ocurre un error de lectura, parseo o validación estructural grave.
     """
+    if isinstance(file_path, (bytes, bytearray)):
+        return _load_json_bytes(bytes(file_path), hash_key or "<bytes>", file_hashes, hash_key or "<bytes>")
     if not isinstance(file_path, Path):
          logger.error(f"Tipo inválido para ruta de archivo: {type(file_path)}")
          return None
@@ -54,68 +207,209 @@ def load_single_json_file(file_path: Path) -> Optional[List[Dict[str, Any]]]:
         logger.warning(f"Ruta no es un archivo válido o no encontrado: {file_path}")
         return None
 
-    logger.debug(f"Intentando cargar y validar JSON desde: {file_path.name}")
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        # Validar estructura principal: debe ser una lista
-        if not isinstance(data, list):
-            logger.error(f"Error de formato en {file_path.name}: Se esperaba una lista JSON ([...]), se obtuvo {type(data).__name__}.")
-            return None
-
-        if not data: # Si la lista está vacía
-             logger.info(f"Archivo JSON {file_path.name} contiene una lista vacía [].")
-             return [] # Devolver lista vacía, es válido
-
-        # Validar cada item en la lista
-        valid_qa_list = []
-        invalid_items_count = 0
-        for i, item in enumerate(data):
-            if isinstance(item, dict) and EXPECTED_QA_KEYS.issubset(item.keys()):
-                 # Verificación básica de tipos y contenido no vacío para q/a
-                 if (isinstance(item.get('q'), str) and item['q'].strip() and
-                     isinstance(item.get('a'), str) and item['a'].strip() and
-                     isinstance(item.get('product'), str) and
-                     isinstance(item.get('keywords'), list)):
-                     # Opcional: Validar que keywords contenga solo strings
-                     # if all(isinstance(kw, str) for kw in item['keywords']):
-                     #     valid_qa_list.append(item)
-                     # else: ... log warning ...
-                     valid_qa_list.append(item) # Añadir si tipos básicos son correctos
-                 else:
-                      logger.warning(f"Item {i+1} en {file_path.name} tiene claves correctas pero tipos/contenido inválido (ej. q/a vacíos o keywords no es lista). Item descartado: {str(item)[:150]}...")
-                      invalid_items_count += 1
-            else:
-                logger.warning(f"Item {i+1} en {file_path.name} no tiene la estructura Q&A esperada (claves: {EXPECTED_QA_KEYS}). Item descartado: {str(item)[:150]}...")
-                invalid_items_count += 1
-
-        if invalid_items_count > 0:
-             logger.warning(f"Se descartaron {invalid_items_count} items inválidos del archivo {file_path.name}.")
-
-        # Decidir si devolver lista parcial o None si hubo errores
-        # Devolver la lista de válidos encontrados es más flexible
-        # if not valid_qa_list:
-        #      logger.error(f"Ningún item válido encontrado en {file_path.name} después de filtrar.")
-        #      return None # O devolver [] si se prefiere
+    return _load_json_path(str(file_path), file_path.name, file_hashes, hash_key or file_path.name)
 
-        logger.debug(f"Cargados {len(valid_qa_list)} Q&A válidos desde {file_path.name}.")
-        return valid_qa_list # Devuelve lista (potencialmente vacía si todos fallaron validación)
+def _load_json_path(
+    path: str,
+    name: str,
+    file_hashes: Optional[Dict[str, bytes]],
+    hash_key: str
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Lee, parsea y valida un archivo JSON de Q&A dado como ruta str, sin
+    comprobar antes que exista (el escaneo del directorio ya lo sabe; un
+    archivo que desaparezca se registra como cualquier error de lectura).
+    `name` se usa en los logs. Devuelve lo mismo que load_single_json_file.
+    """
+    logger.debug(f"Intentando cargar y validar JSON desde: {name}")
+    try:
+        fd = os.open(path, _READ_FLAGS)
+        try:
+            size = os.fstat(fd).st_size
+            if ijson is not None and size > STREAM_PARSE_MIN_BYTES:
+                return _load_streamed(fd, name, file_hashes, hash_key)
+            # Leer bytes una vez: sirven para el hash del archivo y para el parseo
+            raw = _read_fd(fd, size)
+        finally:
+            os.close(fd)
+        if file_hashes is not None:
+            file_hashes[hash_key] = file_content_hash(raw)
+        return _parse_and_validate(raw, name)
 
     except FileNotFoundError:
-        logger.error(f"Archivo JSON no encontrado (inesperado después de check inicial): {file_path}")
+        logger.error(f"Archivo JSON no encontrado (inesperado después de check inicial): {path}")
         return None
-    except json.JSONDecodeError as e:
-        logger.error(f"Error al decodificar JSON en archivo {file_path.name}: {e}")
+    except _JSON_DECODE_ERRORS as e:
+        logger.error(f"Error al decodificar JSON en archivo {name}: {e}")
         return None
     except PermissionError:
-         logger.error(f"Permiso denegado al leer archivo JSON: {file_path}")
+         logger.error(f"Permiso denegado al leer archivo JSON: {path}")
          return None
     except Exception as e:
-        logger.exception(f"Error inesperado al cargar o validar archivo JSON {file_path.name}: {e}")
+        logger.exception(f"Error inesperado al cargar o validar archivo JSON {name}: {e}")
         return None
 
-def load_all_qas_from_directory(base_directory: Path) -> Dict[str, List[Dict[str, Any]]]:
+def _load_json_bytes(
+    raw: bytes,
+    name: str,
+    file_hashes: Optional[Dict[str, bytes]],
+    hash_key: str
+) -> Optional[List[Dict[str, Any]]]:
+    """Como _load_json_path, pero con el contenido ya en memoria."""
+    if file_hashes is not None:
+        file_hashes[hash_key] = file_content_hash(raw)
+    try:
+        return _parse_and_validate(raw, name)
+    except _JSON_DECODE_ERRORS as e:
+        logger.error(f"Error al decodificar JSON en {name}: {e}")
+        return None
+    except Exception as e:
+        logger.exception(f"Error inesperado al validar JSON {name}: {e}")
+        return None
+
+def _parse_and_validate(raw: bytes, name: str) -> Optional[List[Dict[str, Any]]]:
+    """Parsea el contenido completo de un archivo y valida sus items (None si no es una lista)."""
+    data = _json_loads(raw) # Un único parseo; msgspec solo valida los objetos resultantes
+    if data and _all_items_valid(data):
+        # Todos los items ya validados en C: se devuelven tal cual (con sus claves extra)
+        logger.debug(f"Cargados {len(data)} Q&A válidos desde {name}.")
+        return data
+    # Validar estructura principal: debe ser una lista
+    if not isinstance(data, list):
+        logger.error(f"Error de formato en {name}: Se esperaba una lista JSON ([...]), se obtuvo {type(data).__name__}.")
+        return None
+    return _validate_qa_items(data, name)
+
+def _load_streamed(
+    fd: int,
+    name: str,
+    file_hashes: Optional[Dict[str, bytes]],
+    hash_key: str
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Parsea un archivo grande con ijson, validando cada item en cuanto se
+    construye: los items inválidos se descartan sin haber reunido antes la
+    lista completa. El hash del archivo se calcula durante la misma lectura.
+    Si el archivo no empieza por '[' se carga entero (mismos mensajes de error
+    que el camino normal).
+    """
+    hasher = hashlib.sha256()
+    f = os.fdopen(fd, 'rb', closefd=False) # El descriptor lo cierra quien lo abrió
+    reader = _HashingReader(f, hasher)
+    head = reader.read(65536)
+    if not head.lstrip(b" \t\r\n").startswith(b"["):
+        raw = head + reader.read()
+        if file_hashes is not None:
+            file_hashes[hash_key] = hasher.digest()[:FILE_HASH_SIZE]
+        return _parse_and_validate(raw, name)
+    try:
+        items = ijson.items(_HashingReader(f, hasher, head), 'item', use_float=True)
+        return _validate_qa_items(items, name)
+    finally:
+        if file_hashes is not None:
+            while reader.read(65536): # Incluir en el hash lo que ijson no llegó a leer
+                pass
+            file_hashes[hash_key] = hasher.digest()[:FILE_HASH_SIZE]
+
+def _is_valid_qa(item: Any) -> bool:
+    """True si el item tiene las claves esperadas con tipos correctos y q/a no vacíos."""
+    return (isinstance(item, dict) and EXPECTED_QA_KEYS.issubset(item.keys()) and
+            isinstance(item['q'], str) and bool(item['q'].strip()) and
+            isinstance(item['a'], str) and bool(item['a'].strip()) and
+            isinstance(item['product'], str) and
+            isinstance(item['keywords'], list))
+
+def _validate_qa_items(items: Iterable[Any], name: str) -> List[Dict[str, Any]]:
+    """
+    Filtra los items válidos (ver _is_valid_qa) registrando cada descarte.
+    Acepta cualquier iterable, incluido el generador de ijson.
+    """
+    valid_qa_list = []
+    invalid_items_count = 0
+    total_items = 0
+    for i, item in enumerate(items):
+        total_items += 1
+        if _is_valid_qa(item):
+            # Opcional: Validar que keywords contenga solo strings
+            valid_qa_list.append(item)
+        elif isinstance(item, dict) and EXPECTED_QA_KEYS.issubset(item.keys()):
+            logger.warning(f"Item {i+1} en {name} tiene claves correctas pero tipos/contenido inválido (ej. q/a vacíos o keywords no es lista). Item descartado: {str(item)[:150]}...")
+            invalid_items_count += 1
+        else:
+            logger.warning(f"Item {i+1} en {name} no tiene la estructura Q&A esperada (claves: {EXPECTED_QA_KEYS}). Item descartado: {str(item)[:150]}...")
+            invalid_items_count += 1
+
+    if not total_items: # Si la lista está vacía
+         logger.info(f"Archivo JSON {name} contiene una lista vacía [].")
+         return [] # Devolver lista vacía, es válido
+
+    if invalid_items_count > 0:
+         logger.warning(f"Se descartaron {invalid_items_count} items inválidos del archivo {name}.")
+
+    # Devolver la lista de válidos encontrados (aunque haya descartes) es más flexible
+    logger.debug(f"Cargados {len(valid_qa_list)} Q&A válidos desde {name}.")
+    return valid_qa_list # Devuelve lista (potencialmente vacía si todos fallaron validación)
+
+def _iter_json_files(directory: str) -> Iterator[os.DirEntry]:
+    """
+    Recorre recursivamente `directory` con os.scandir y produce las entradas
+    de archivos terminados en '.json' (mismo recorrido que Path.rglob: primero
+    los archivos de cada directorio, luego sus subdirectorios), usando el tipo
+    que ya devuelve scandir en lugar de un stat por archivo. Los enlaces
+    simbólicos no se siguen (un enlace a un directorio padre recorrería el
+    árbol sin fin).
+    """
+    subdirectories = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.path)
+                elif entry.name.endswith('.json') and entry.is_file(follow_symlinks=False):
+                    yield entry
+    except PermissionError: # Como rglob: un subdirectorio sin permisos se omite
+        logger.warning(f"Permiso denegado al listar el directorio: {directory}. Se omite.")
+        return
+    for subdirectory in subdirectories:
+        yield from _iter_json_files(subdirectory)
+
+def _load_json_worker(found: Tuple[str, str], want_hash: bool) -> Tuple[Optional[List[Dict[str, Any]]], Optional[bytes]]:
+    """Worker de proceso: carga un archivo y devuelve también su hash (el dict del padre no se comparte)."""
+    path, relative_path_str = found
+    hashes: Optional[Dict[str, bytes]] = {} if want_hash else None
+    qa_list = _load_json_path(path, relative_path_str, hashes, relative_path_str)
+    return qa_list, hashes.get(relative_path_str) if hashes else None
+
+def _iter_loaded_in_processes(
+    json_files_found: List[Tuple[str, str]],
+    file_hashes: Optional[Dict[str, bytes]]
+) -> Iterator[Optional[List[Dict[str, Any]]]]:
+    """
+    Carga los archivos en un ProcessPoolExecutor y produce sus resultados en
+    orden, guardando los hashes en `file_hashes`. Si el pool falla, el resto
+    de archivos se carga en este proceso.
+    """
+    done = 0
+    worker = partial(_load_json_worker, want_hash=file_hashes is not None)
+    try:
+        with ProcessPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+            for qa_list, file_hash in executor.map(worker, json_files_found, chunksize=PROCESS_LOAD_CHUNKSIZE):
+                if file_hashes is not None and file_hash is not None:
+                    file_hashes[json_files_found[done][1]] = file_hash
+                done += 1
+                yield qa_list
+        return
+    except Exception as e:
+        logger.warning(f"Fallo al cargar archivos en paralelo ({e}). Cargando los {len(json_files_found) - done} restantes en serie.")
+    for path, relative_path_str in json_files_found[done:]:
+        yield _load_json_path(path, relative_path_str, file_hashes, relative_path_str)
+
+def load_all_qas_from_directory(
+    base_directory: Path,
+    file_hashes: Optional[Dict[str, bytes]] = None,
+    file_stats: Optional[Dict[str, Tuple[int, int]]] = None,
+    known_file_stats: Optional[Mapping[str, Tuple[int, int]]] = None
+) -> Dict[str, List[Dict[str, Any]]]:
     """
     Escanea recursivamente un directorio base, carga y valida todos los
     archivos JSON encontrados, devolviendo un diccionario con los Q&A válidos.
@@ -123,23 +417,53 @@ def load_all_qas_from_directory(base_directory: Path) -> Dict[str, List[Dict[str
     Args:
         base_directory: Ruta (objeto Path) al directorio raíz donde buscar
                         archivos JSON (ej. data/input/json/SOAP_TXT).
+        file_hashes: Diccionario opcional que se rellena con {ruta relativa ->
+                     file_content_hash} de cada archivo leído, para que
+                     state_manager.calculate_diff salte los que no cambiaron.
+        file_stats: Diccionario opcional que se rellena con {ruta relativa ->
+                    (tamaño, mtime_ns)} de cada archivo encontrado.
+        known_file_stats: (tamaño, mtime_ns) de archivos ya indexados (ver
+                          IndexedPoints.reusable_file_stats). Los que siguen
+                          igual no se leen: aparecen en el resultado con una
+                          lista vacía y calculate_diff copia sus puntos.
 
     Returns:
         Un diccionario donde las claves son las rutas relativas (como string)
         de los archivos JSON procesados (respecto a base_directory) que contenían
-        al menos un Q&A válido, y los valores son las listas de esos Q&A válidos.
+        al menos un Q&A válido, y los valores son las listas de esos Q&A válidos
+        (vacías para los archivos sin cambios según known_file_stats).
     """
     if not base_directory.is_dir():
         logger.error(f"El directorio de entrada especificado no existe o no es un directorio: {base_directory}")
         return {}
 
     all_qas: Dict[str, List[Dict[str, Any]]] = {}
-    json_files_found = []
+    json_files_found: List[Tuple[str, str]] = [] # (ruta, ruta relativa)
     try:
         logger.info(f"Buscando archivos .json recursivamente en: {base_directory}...")
-        json_files_found = list(base_directory.rglob("*.json"))
-        file_count = len(json_files_found)
+        # Las rutas de scandir empiezan por el directorio base: la relativa es el resto
+        base_prefix = os.path.join(str(base_directory), '')
+        want_stats = file_stats is not None or bool(known_file_stats)
+        for entry in _iter_json_files(str(base_directory)):
+            relative_path_str = entry.path[len(base_prefix):]
+            if want_stats:
+                # Antes de leerlo: si cambia después, la próxima ejecución verá otro mtime
+                try:
+                    entry_stat = entry.stat()
+                except OSError: # Desapareció tras listarlo: la carga registrará el error
+                    entry_stat = None
+                if entry_stat is not None:
+                    stat = (entry_stat.st_size, entry_stat.st_mtime_ns)
+                    if file_stats is not None:
+                        file_stats[relative_path_str] = stat
+                    if known_file_stats and known_file_stats.get(relative_path_str) == stat:
+                        all_qas[relative_path_str] = [] # Sin cambios: no se lee
+                        continue
+            json_files_found.append((entry.path, relative_path_str))
+        file_count = len(json_files_found) + len(all_qas)
         logger.info(f"Encontrados {file_count} archivos .json.")
+        if all_qas:
+            logger.info(f"  {len(all_qas)} sin cambios de tamaño ni fecha desde la última ejecución (no se leen).")
     except Exception as e:
          logger.exception(f"Error al buscar archivos .json en {base_directory}: {e}")
          return {} # Devolver vacío si falla la búsqueda
@@ -149,41 +473,55 @@ def load_all_qas_from_directory(base_directory: Path) -> Dict[str, List[Dict[str
     total_valid_qas = 0
 
     if not json_files_found:
-        logger.warning(f"No se encontraron archivos .json en el directorio: {base_directory}")
-        return {}
+        if not all_qas:
+            logger.warning(f"No se encontraron archivos .json en el directorio: {base_directory}")
+        return all_qas
+
+    def load_entry(found: Tuple[str, str]) -> Optional[List[Dict[str, Any]]]:
+        path, relative_path_str = found
+        return _load_json_path(path, relative_path_str, file_hashes, relative_path_str)
+
+    # Parsear y validar entre procesos si hay muchos archivos, o leer en un pool
+    # de hilos si hay bastantes; los resultados llegan en el orden del escaneo
+    # y se registran en este hilo
+    executor = None
+    process_results = None
+    if len(json_files_found) >= PROCESS_LOAD_MIN_FILES and (os.cpu_count() or 1) > 1:
+        results = process_results = _iter_loaded_in_processes(json_files_found, file_hashes)
+    elif len(json_files_found) >= PARALLEL_LOAD_MIN_FILES:
+        executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+        results = executor.map(load_entry, json_files_found)
+    else:
+        results = map(load_entry, json_files_found)
 
     # Usar tqdm si está disponible
     iterable_files = tqdm(json_files_found, desc="Cargando archivos JSON Q&A", unit="archivo") if tqdm_available else json_files_found
 
-    for json_file_path in iterable_files:
-         if hasattr(iterable_files, 'set_postfix_str'): # Actualizar barra si tqdm está activo
-              iterable_files.set_postfix_str(f"{json_file_path.name[:30]}...", refresh=True)
-
-         logger.debug(f"Procesando archivo JSON: {json_file_path}")
-         # Calcular ruta relativa para usarla como clave y para logs
-         try:
-              # Usar relative_to(base_directory) para obtener la ruta desde la base
-              relative_path_str = str(json_file_path.relative_to(base_directory))
-         except ValueError:
-              logger.warning(f"No se pudo calcular ruta relativa para {json_file_path} respecto a {base_directory}. Usando nombre de archivo.")
-              relative_path_str = json_file_path.name # Fallback a solo nombre de archivo
-
-         # Cargar y validar el archivo individual
-         qa_list = load_single_json_file(json_file_path)
-
-         if qa_list is not None: # Si la carga no dio error fatal (puede ser lista vacía [])
-             processed_files_count += 1
-             if qa_list: # Solo añadir al resultado si la lista contiene Q&As válidos
-                 all_qas[relative_path_str] = qa_list
-                 total_valid_qas += len(qa_list)
-                 logger.info(f"Cargado: '{relative_path_str}' ({len(qa_list)} Q&As válidos)")
+    try:
+        for (json_file_path, relative_path_str), qa_list in zip(iterable_files, results):
+             if hasattr(iterable_files, 'set_postfix_str'): # Actualizar barra si tqdm está activo
+                  iterable_files.set_postfix_str(f"{os.path.basename(json_file_path)[:30]}...", refresh=True)
+
+             logger.debug(f"Procesando archivo JSON: {json_file_path}")
+
+             if qa_list is not None: # Si la carga no dio error fatal (puede ser lista vacía [])
+                 processed_files_count += 1
+                 if qa_list: # Solo añadir al resultado si la lista contiene Q&As válidos
+                     all_qas[relative_path_str] = qa_list
+                     total_valid_qas += len(qa_list)
+                     logger.info(f"Cargado: '{relative_path_str}' ({len(qa_list)} Q&As válidos)")
+                 else:
+                     # Si devolvió [], fue un archivo válido pero vacío o sin items válidos
+                     logger.info(f"Archivo '{relative_path_str}' procesado pero no contenía Q&As válidos o estaba vacío.")
              else:
-                 # Si devolvió [], fue un archivo válido pero vacío o sin items válidos
-                 logger.info(f"Archivo '{relative_path_str}' procesado pero no contenía Q&As válidos o estaba vacío.")
-         else:
-             # Si devolvió None, hubo un error durante la carga/validación
-             logger.error(f"Fallo completo al cargar/validar archivo: '{relative_path_str}'. Excluido del resultado.")
-             error_files_count += 1
+                 # Si devolvió None, hubo un error durante la carga/validación
+                 logger.error(f"Fallo completo al cargar/validar archivo: '{relative_path_str}'. Excluido del resultado.")
+                 error_files_count += 1
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if process_results is not None: # Cierra el pool de procesos aunque no se haya agotado
+            process_results.close()
 
     logger.info(f"Carga de datos finalizada.")
     logger.info(f"  Archivos JSON encontrados: {file_count}")
@@ -7,22 +7,29 @@ Módulo para encapsular las operaciones con la base de datos vectorial Qdrant.
 Funciones:
 - initialize_client: Crea y devuelve un cliente Qdrant.
 - ensure_collection: Verifica si una colección existe y la crea si no.
+- finalize_bulk_load: Reactiva la indexación HNSW tras una carga masiva.
+- invalidate_collection_cache: Olvida las colecciones ya aseguradas en el proceso.
 - batch_upsert: Sube/actualiza puntos (vectores + payload) a Qdrant en lotes.
 - delete_points: Elimina puntos de Qdrant por sus IDs.
 """
 
 import logging
 # CORRECCIÓN: Añadir Union, uuid, time
+import os
 import uuid
 import time
-from typing import List, Optional, Dict, Any, Tuple, Union
+import random
+import queue
+import threading
+from itertools import islice
+from typing import List, Optional, Dict, Any, Tuple, Union, Iterable, Iterator, Set, Sized
 
 # Importar dependencias de Qdrant
 try:
     from qdrant_client import QdrantClient, models
     from qdrant_client.http.models import PointStruct, Distance, VectorParams, UpdateStatus, CollectionInfo, VectorParamsDiff, OptimizersConfigDiff, CollectionStatus
     # Importar excepciones específicas
-    from qdrant_client.http.exceptions import UnexpectedResponse
+    from qdrant_client.http.exceptions import UnexpectedResponse, ResponseHandlingException
 except ImportError:
     print("[ERROR CRÍTICO] Librería 'qdrant-client' no instalada. Ejecuta: pip install qdrant-client")
     # Definir dummies
@@ -37,27 +44,145 @@ except ImportError:
     OptimizersConfigDiff = None # type: ignore
     CollectionStatus = None # type: ignore
     UnexpectedResponse = ConnectionError # type: ignore
+    ResponseHandlingException = ConnectionError # type: ignore
 
 # Obtener logger
 logger = logging.getLogger(__name__)
 
-# Mapeo de nombres de métrica de distancia (config) a enums de Qdrant
-# Asegurarse que los enums existan si la librería se importó
+# Mapeo de nombres de métrica de distancia (config, en minúsculas) a enums de Qdrant.
+# Se construye una sola vez al importar; vacío si la librería no está disponible.
 DISTANCE_MAP = {
-    "Cosine": getattr(models, 'Distance', {}).COSINE if models else None,
-    "Dot": getattr(models, 'Distance', {}).DOT if models else None,
-    "Euclid": getattr(models, 'Distance', {}).EUCLID if models else None,
-}
+    "cosine": models.Distance.COSINE,
+    "dot": models.Distance.DOT,
+    "euclid": models.Distance.EUCLID,
+} if models else {}
+
+# Códigos HTTP considerados transitorios (se reintentan). Otros 4xx (400, 404...)
+# indican un error en la petición y reintentar no ayudaría.
+RETRYABLE_STATUS_CODES = frozenset({429, 502, 503, 504})
+MAX_RETRY_DELAY = 60 # Segundos, tope del backoff exponencial
+
+# indexing_threshold por defecto de Qdrant (KB); se restaura tras una carga masiva
+DEFAULT_INDEXING_THRESHOLD = 20000
+
+# Colecciones ya aseguradas en este proceso:
+# (id(client), nombre, tamaño, métrica) -> True si además se verificó su configuración.
+# Solo se guardan éxitos; un fallo (ej. red) se reintenta en la siguiente llamada.
+_ENSURED_COLLECTIONS: Dict[Tuple[int, str, int, str], bool] = {}
+
+def _status_ok(status: Any) -> bool:
+    """
+    Indica si la respuesta de upsert/delete corresponde a una operación
+    completada: cualquier objeto con .status COMPLETED (UpdateResult o
+    subclases) o un dict crudo con status 'ok'.
+    """
+    if isinstance(status, dict):
+        return status.get('status') == 'ok'
+    return UpdateStatus is not None and getattr(status, 'status', None) == UpdateStatus.COMPLETED
+
+_BYTES_DECODE = bytes.decode # Método ligado una sola vez al cargar el módulo
 
 def _decode_qdrant_error_content(content: Optional[bytes]) -> str:
     """Intenta decodificar el contenido de un error de Qdrant (bytes) a string."""
-    if isinstance(content, bytes):
+    # 'replace' nunca lanza excepción; type() evita el recorrido del MRO de isinstance
+    return _BYTES_DECODE(content, 'utf-8', 'replace') if type(content) is bytes else str(content)
+
+
+def _is_retryable_error(error: Exception) -> bool:
+    """
+    Indica si un error de Qdrant/red es transitorio y merece reintento.
+
+    El cliente HTTP de Qdrant envuelve los fallos de transporte (conexión
+    rechazada, timeouts de httpx...) en ResponseHandlingException, que no
+    hereda de ConnectionError/TimeoutError.
+    """
+    if isinstance(error, UnexpectedResponse):
+        return getattr(error, 'status_code', None) in RETRYABLE_STATUS_CODES
+    return isinstance(error, (TimeoutError, ConnectionError, ResponseHandlingException))
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Extrae la cabecera Retry-After (en segundos) de una respuesta 429, si existe."""
+    if not isinstance(error, UnexpectedResponse) or getattr(error, 'status_code', None) != 429:
+        return None
+    headers = getattr(error, 'headers', None)
+    if not headers:
+        return None
+    try:
+        return max(0.0, float(headers.get('Retry-After') or headers.get('retry-after')))
+    except (TypeError, ValueError):
+        return None # Formato HTTP-date u otro no soportado: usar backoff normal
+
+def _backoff_delay(attempt: int, base_delay: float, error: Optional[Exception] = None) -> float:
+    """
+    Calcula la espera antes del siguiente reintento.
+
+    Usa backoff exponencial con "full jitter" (espera aleatoria entre 0 y
+    base_delay * 2^attempt, con tope MAX_RETRY_DELAY) para que lotes que fallan
+    a la vez no vuelvan a sincronizarse. Si el servidor envía Retry-After en un
+    429, se respeta ese valor.
+    """
+    retry_after = _retry_after_seconds(error) if error is not None else None
+    if retry_after is not None:
+        return min(retry_after, MAX_RETRY_DELAY)
+    return random.uniform(0, min(base_delay * (2 ** attempt), MAX_RETRY_DELAY))
+
+def _iter_batches(point_iter: Iterator[PointStruct], batch_size: int) -> Iterator[List[PointStruct]]:
+    """Extrae lotes de hasta batch_size puntos de un iterador."""
+    while True:
+        batch = list(islice(point_iter, batch_size))
+        if not batch:
+            return
+        yield batch
+
+_PREFETCH_DONE = object() # Centinela de fin para _prefetch_batches
+
+def _prefetch_batches(
+    point_iter: Iterator[PointStruct],
+    batch_size: int,
+    depth: int = 2
+) -> Iterator[List[PointStruct]]:
+    """
+    Como _iter_batches, pero un hilo en segundo plano prepara los siguientes
+    lotes (hasta `depth`) mientras el actual está en vuelo hacia Qdrant.
+
+    Útil cuando `points` es un generador que construye los PointStruct de forma
+    perezosa: ese trabajo de CPU se solapa con la espera de red del upsert (que
+    libera el GIL). Las excepciones del generador se re-lanzan en el consumidor.
+    """
+    batch_queue: "queue.Queue[Any]" = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def _put(item: Any) -> None:
+        # put con timeout para no quedar bloqueado si el consumidor abandona
+        while not stop.is_set():
+            try:
+                batch_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _producer() -> None:
         try:
-            return content.decode('utf-8', errors='replace')
-        except Exception:
-            return repr(content) # Devolver repr si falla la decodificación
-    return str(content) # Devolver como string si no eran bytes
+            for batch in _iter_batches(point_iter, batch_size):
+                if stop.is_set():
+                    return
+                _put(batch)
+            _put(_PREFETCH_DONE)
+        except Exception as e:
+            _put(e)
 
+    producer = threading.Thread(target=_producer, name="qdrant-upsert-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = batch_queue.get()
+            if item is _PREFETCH_DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
 
 def initialize_client(url: str, api_key: Optional[str] = None, timeout: int = 60) -> Optional[QdrantClient]:
     """
@@ -93,11 +218,30 @@ def ensure_collection(
     collection_name: str,
     vector_size: int,
     distance_metric_str: str = "Cosine",
-    recreate_if_exists: bool = False # ¡Peligroso!
+    recreate_if_exists: bool = False, # ¡Peligroso!
+    verify_config: bool = False,
+    hnsw_config: Optional[Dict[str, Any]] = None,
+    optimizers_config: Optional[Dict[str, Any]] = None,
+    bulk_load: bool = False,
+    created_collections: Optional[Set[str]] = None
 ) -> bool:
     """
     Asegura que una colección exista en Qdrant con los parámetros especificados.
     La crea si no existe. NO la recrea por defecto si ya existe.
+
+    Si verify_config=True y la colección ya existe, obtiene su información
+    (get_collection) y avisa si el tamaño/distancia del vector no coinciden.
+    Por defecto solo se comprueba la existencia, sin descargar la configuración.
+
+    hnsw_config / optimizers_config (dicts con los campos de HnswConfigDiff /
+    OptimizersConfigDiff, ej. {"m": 16, "ef_construct": 100}) solo se aplican
+    al crear o recrear la colección. Con bulk_load=True la colección se crea
+    con indexing_threshold=0 (sin construir el índice HNSW durante la carga
+    inicial); llamar a finalize_bulk_load() al terminar los upserts, solo si
+    la colección se creó en esta llamada (una existente no cambia).
+
+    Si se pasa `created_collections`, se le añade collection_name cuando esta
+    llamada crea o recrea la colección.
     """
     # CORRECCIÓN: Quitar Distance/VectorParams del check booleano inicial
     if not client or not models:
@@ -106,48 +250,131 @@ def ensure_collection(
 
     # Validar y obtener la métrica de distancia enum
     # Usar get() con default None para evitar KeyError si DISTANCE_MAP no está bien inicializado
-    distance_metric = DISTANCE_MAP.get(distance_metric_str.capitalize())
+    distance_metric = DISTANCE_MAP.get(distance_metric_str.lower())
     if distance_metric is None:
         logger.error(f"Métrica de distancia '{distance_metric_str}' no válida o librería Qdrant no cargada. Usar: Cosine, Dot, Euclid.")
         return False
 
-    logger.info(f"Asegurando existencia/configuración de colección '{collection_name}'...")
+    # Caché de resultados positivos: evita un round-trip por llamada cuando la
+    # colección ya se aseguró en este proceso con la misma configuración.
+    cache_key = (id(client), collection_name, vector_size, distance_metric_str.lower())
+    if recreate_if_exists:
+        invalidate_collection_cache(collection_name)
+    elif cache_key in _ENSURED_COLLECTIONS and (_ENSURED_COLLECTIONS[cache_key] or not verify_config):
+        logger.debug(f"Colección '{collection_name}' ya asegurada en este proceso (caché).")
+        return True
+
+    create_kwargs = _collection_create_kwargs(hnsw_config, optimizers_config, bulk_load)
+    ok = _ensure_collection_remote(client, collection_name, vector_size, distance_metric, recreate_if_exists, verify_config, create_kwargs, created_collections)
+    if ok:
+        # Guardar si la configuración se verificó; una entrada no verificada
+        # no satisface una llamada posterior con verify_config=True.
+        _ENSURED_COLLECTIONS[cache_key] = _ENSURED_COLLECTIONS.get(cache_key, False) or verify_config
+    return ok
+
+
+def _collection_create_kwargs(
+    hnsw_config: Optional[Dict[str, Any]],
+    optimizers_config: Optional[Dict[str, Any]],
+    bulk_load: bool
+) -> Dict[str, Any]:
+    """Construye los kwargs opcionales (HNSW/optimizador) para create/recreate_collection."""
+    kwargs: Dict[str, Any] = {}
+    if hnsw_config:
+        kwargs['hnsw_config'] = models.HnswConfigDiff(**hnsw_config)
+    optimizer_params = dict(optimizers_config or {})
+    if bulk_load:
+        # Carga masiva: no indexar segmentos mientras se insertan los puntos
+        optimizer_params['indexing_threshold'] = 0
+    if optimizer_params:
+        kwargs['optimizers_config'] = models.OptimizersConfigDiff(**optimizer_params)
+    return kwargs
+
+
+def finalize_bulk_load(
+    client: QdrantClient,
+    collection_name: str,
+    indexing_threshold: int = DEFAULT_INDEXING_THRESHOLD
+) -> bool:
+    """
+    Restaura el indexing_threshold de una colección creada con bulk_load=True,
+    para que Qdrant construya el índice HNSW una sola vez tras la carga.
+    """
+    if not client or not models:
+        logger.error("Cliente Qdrant o modelos no inicializados correctamente.")
+        return False
+    logger.info(f"Finalizando carga masiva en '{collection_name}' (indexing_threshold={indexing_threshold})...")
     try:
-        collection_exists = False
-        try:
-            # Usar get_collection para verificar existencia y obtener info a la vez
-            collection_info = client.get_collection(collection_name=collection_name)
-            collection_exists = True
-            logger.info(f"Colección '{collection_name}' ya existe.")
-        except UnexpectedResponse as e:
-            # Un error 404 indica que no existe, otros errores son problemas reales
-            if e.status_code == 404:
-                logger.info(f"Colección '{collection_name}' no encontrada.")
-                collection_exists = False
-            else:
-                # Otro error inesperado al intentar obtener la colección
-                content_str = _decode_qdrant_error_content(e.content)
-                logger.error(f"Error inesperado de Qdrant al verificar colección '{collection_name}': Status={e.status_code}, Contenido={content_str}")
-                return False # Fallar si no podemos verificar
-        except Exception as e: # Capturar otros errores (ej. conexión)
-             logger.exception(f"Error al intentar obtener información de la colección '{collection_name}': {e}")
-             return False
+        client.update_collection(
+            collection_name=collection_name,
+            optimizers_config=models.OptimizersConfigDiff(indexing_threshold=indexing_threshold)
+        )
+        return True
+    except UnexpectedResponse as e:
+        content_str = _decode_qdrant_error_content(e.content)
+        logger.error(f"Error Qdrant al finalizar carga masiva en '{collection_name}': Status={e.status_code}, Contenido={content_str}")
+        return False
+    except Exception as e:
+        logger.exception(f"Error inesperado al finalizar carga masiva en '{collection_name}': {e}")
+        return False
+
+
+def invalidate_collection_cache(collection_name: Optional[str] = None) -> None:
+    """
+    Olvida los resultados cacheados de ensure_collection.
+
+    Llamar tras borrar/recrear una colección fuera de este módulo. Sin
+    argumentos limpia toda la caché; con collection_name solo sus entradas.
+    """
+    if collection_name is None:
+        _ENSURED_COLLECTIONS.clear()
+        return
+    for key in [k for k in _ENSURED_COLLECTIONS if k[1] == collection_name]:
+        del _ENSURED_COLLECTIONS[key]
 
 
+def _ensure_collection_remote(
+    client: QdrantClient,
+    collection_name: str,
+    vector_size: int,
+    distance_metric: Any,
+    recreate_if_exists: bool,
+    verify_config: bool,
+    create_kwargs: Dict[str, Any],
+    created_collections: Optional[Set[str]] = None
+) -> bool:
+    """Parte de ensure_collection que habla con Qdrant (sin caché)."""
+    logger.info(f"Asegurando existencia/configuración de colección '{collection_name}'...")
+    try:
+        # collection_exists evita traer (y parsear) el CollectionInfo completo
+        # solo para saber si la colección existe, y no usa el 404 como control de flujo.
+        collection_exists = client.collection_exists(collection_name=collection_name)
+
         if collection_exists:
+            logger.info(f"Colección '{collection_name}' ya existe.")
             if recreate_if_exists:
                 logger.warning(f"Colección '{collection_name}' existe y recreate_if_exists=True. ¡RECREANDO (borrando datos)!")
                 # Usar timeout más largo para operaciones potencialmente lentas
                 client.recreate_collection(
                     collection_name=collection_name,
                     vectors_config=models.VectorParams(size=vector_size, distance=distance_metric),
-                    timeout=120 # Ejemplo de timeout más largo para recrear
+                    timeout=120, # Ejemplo de timeout más largo para recrear
+                    **create_kwargs
                 )
                 logger.info(f"Colección '{collection_name}' recreada exitosamente.")
+                if created_collections is not None:
+                    created_collections.add(collection_name)
+                return True
+            elif not verify_config:
+                logger.debug(f"Colección '{collection_name}' existe; verificación de configuración omitida (verify_config=False).")
                 return True
             else:
-                # Verificar configuración existente (Lógica refinada)
-                vectors_config = getattr(collection_info, 'vectors_config', None) # Usar getattr por seguridad
+                # Verificar configuración existente (Lógica refinada). Solo aquí se
+                # necesita el CollectionInfo completo.
+                collection_info = client.get_collection(collection_name=collection_name)
+                # CORRECCIÓN: En CollectionInfo los vectores están en config.params.vectors
+                collection_params = getattr(getattr(collection_info, 'config', None), 'params', None)
+                vectors_config = getattr(collection_params, 'vectors', None) # Usar getattr por seguridad
                 vector_params = None
                 config_ok = False
 
@@ -163,7 +390,7 @@ def ensure_collection(
                         for params in vectors_config.values():
                             params_dict = params if isinstance(params, dict) else params.dict()
                             if params_dict.get('size') == vector_size and \
-                               DISTANCE_MAP.get(params_dict.get('distance', '').capitalize()) == distance_metric:
+                               DISTANCE_MAP.get(str(getattr(params_dict.get('distance'), 'value', params_dict.get('distance')) or '').lower()) == distance_metric:
                                 logger.info(f"Encontrado vector compatible en colección existente.")
                                 config_ok = True
                                 break
@@ -207,14 +434,16 @@ def ensure_collection(
             logger.info(f"Colección '{collection_name}' no encontrada. Creando...")
             client.create_collection(
                 collection_name=collection_name,
-                vectors_config=models.VectorParams(size=vector_size, distance=distance_metric)
-                # Añadir aquí otras opciones si son necesarias (on_disk, hnsw_config, etc.)
+                vectors_config=models.VectorParams(size=vector_size, distance=distance_metric),
+                **create_kwargs
             )
             # Esperar un poco para asegurar que la colección esté lista (opcional)
             time.sleep(0.5)
             # Verificar que realmente se creó
             if client.collection_exists(collection_name=collection_name):
                  logger.info(f"Colección '{collection_name}' creada exitosamente.")
+                 if created_collections is not None:
+                     created_collections.add(collection_name)
                  return True
             else:
                  logger.error(f"Fallo al verificar la creación de la colección '{collection_name}'.")
@@ -232,78 +461,92 @@ def ensure_collection(
 def batch_upsert(
     client: QdrantClient,
     collection_name: str,
-    points: List[PointStruct],
+    points: Iterable[PointStruct],
     batch_size: int = 128,
     wait: bool = True,
     max_retries: int = 2, # Añadir reintentos básicos para upsert
-    retry_delay: int = 5 # Segundos
+    retry_delay: int = 5, # Segundos (base del backoff exponencial)
+    prefetch: bool = True
 ) -> Tuple[int, int]:
     """
     Realiza upsert (insertar o actualizar) de puntos en Qdrant en lotes,
-    con reintentos básicos para errores transitorios.
+    con reintentos (backoff exponencial con jitter) para errores transitorios.
+
+    Acepta cualquier iterable de puntos (lista, generador...): los lotes se
+    extraen de forma incremental, por lo que un generador nunca se materializa
+    completo en memoria. Si `points` no es una colección con len() (ej. un
+    generador) y prefetch=True, el siguiente lote se prepara en un hilo
+    mientras el actual se envía.
+
+    Solo se reintentan timeouts, errores de conexión (incluidos los de
+    transporte del cliente, ResponseHandlingException) y respuestas HTTP
+    429/502/503/504; cualquier otro error marca el lote como fallido.
     """
-    if not client or not models: return 0, len(points)
-    if not points: return 0, 0
+    known_total = len(points) if isinstance(points, Sized) else None
+    if not client or not models: return 0, known_total or 0
+    if known_total == 0: return 0, 0
 
-    total_points = len(points)
+    point_iter = iter(points)
+    total_points = 0 # Contador incremental (el iterable puede no tener len())
     successful_points = 0
     total_errors = 0
     processed_batches = 0
+    expected_batches = f"/{(known_total + batch_size - 1) // batch_size}" if known_total else ""
 
-    logger.info(f"Iniciando upsert de {total_points} puntos en '{collection_name}' (lotes de {batch_size})...")
+    logger.info(f"Iniciando upsert de {known_total if known_total is not None else 'N'} puntos en '{collection_name}' (lotes de {batch_size})...")
 
-    for i in range(0, total_points, batch_size):
-        batch = points[i : i + batch_size]
-        batch_num = (i // batch_size) + 1
-        logger.debug(f"Procesando lote {batch_num}/{ (total_points + batch_size - 1) // batch_size } ({len(batch)} puntos)...")
+    use_prefetch = prefetch and known_total is None # Una lista ya está materializada
+    batches = _prefetch_batches(point_iter, batch_size) if use_prefetch else _iter_batches(point_iter, batch_size)
+
+    for batch in batches:
+        total_points += len(batch)
+        batch_num = processed_batches + 1
+        logger.debug(f"Procesando lote {batch_num}{expected_batches} ({len(batch)} puntos)...")
         current_retries = 0
         while current_retries <= max_retries:
             try:
                 status = client.upsert(collection_name=collection_name, points=batch, wait=wait)
 
-                if hasattr(status, 'status') and status.status == UpdateStatus.COMPLETED:
+                if _status_ok(status):
                      logger.debug(f"Lote {batch_num} completado exitosamente.")
                      successful_points += len(batch)
                      break # Salir del bucle while de reintentos
-                elif isinstance(status, dict) and status.get('status') == 'ok':
-                     logger.debug(f"Lote {batch_num} completado exitosamente (status dict ok).")
-                     successful_points += len(batch)
-                     break # Salir del bucle while de reintentos
                 else:
-                     # Status inesperado, tratar como error del lote
+                     # Status inesperado, tratar como error transitorio del lote
                      logger.warning(f"Estado inesperado en upsert lote {batch_num}: {status}")
-                     if current_retries >= max_retries: total_errors += len(batch)
-                     # Intentar reintentar si no es el último intento
                      raise ConnectionError(f"Estado inesperado {status}") # Re-lanzar para reintento
 
-            except (UnexpectedResponse, APIError, APIConnectionError, TimeoutError, ConnectionError) as e: # Errores que podrían ser transitorios
+            except Exception as e:
+                if not _is_retryable_error(e):
+                    # Errores no transitorios (ej. 400 por datos inválidos): no reintentar
+                    if isinstance(e, UnexpectedResponse):
+                        content_str = _decode_qdrant_error_content(e.content)
+                        logger.error(f"Error Qdrant no recuperable en upsert lote {batch_num}: Status={e.status_code}, Contenido={content_str[:200]}...")
+                    else:
+                        logger.exception(f"Error inesperado y fatal durante upsert del lote {batch_num}: {e}")
+                    total_errors += len(batch)
+                    break # Salir del bucle while, no reintentar estos errores
+
                 content_str = ""
                 status_code = "N/A"
                 if isinstance(e, UnexpectedResponse):
                      content_str = _decode_qdrant_error_content(e.content)
                      status_code = e.status_code
-                elif isinstance(e, APIError):
-                     status_code = getattr(e, 'status_code', 'N/A')
 
                 logger.warning(f"Error de Qdrant/Red en upsert lote {batch_num} (Intento {current_retries+1}/{max_retries+1}): Status={status_code}, Error={e}, Contenido={content_str[:200]}...")
-                current_retries += 1
-                if current_retries > max_retries:
+                if current_retries >= max_retries:
                     logger.error(f"Máximo de reintentos alcanzado para lote {batch_num}. Marcando lote como fallido.")
                     total_errors += len(batch)
                     break # Salir del bucle while
-                else:
-                    logger.info(f"Esperando {retry_delay}s antes de reintentar...")
-                    time.sleep(retry_delay)
-                    # Continuar con la siguiente iteración del while (reintento)
-
-            except Exception as e: # Otros errores inesperados (ej. datos inválidos)
-                logger.exception(f"Error inesperado y fatal durante upsert del lote {batch_num}: {e}")
-                total_errors += len(batch)
-                break # Salir del bucle while, no reintentar estos errores
+                delay = _backoff_delay(current_retries, retry_delay, e)
+                current_retries += 1
+                logger.info(f"Esperando {delay:.2f}s antes de reintentar...")
+                time.sleep(delay)
+                # Continuar con la siguiente iteración del while (reintento)
 
         processed_batches += 1 # Incrementar batches procesados (incluso si falló)
 
-    logger.info(f"Upsert finalizado tras procesar {processed_batches} lotes.")
+    logger.info(f"Upsert finalizado tras procesar {processed_batches} lotes ({total_points} puntos).")
     # El conteo de errores ya se maneja dentro del bucle
     actual_success = max(0, total_points - total_errors)
     if actual_success != successful_points and total_errors > 0: # Corregir conteo si hubo fallos
@@ -312,6 +555,7 @@ def batch_upsert(
 
     return successful_points, total_errors
 
+
 def delete_points(
     client: QdrantClient,
     collection_name: str,
@@ -342,12 +586,9 @@ def delete_points(
                 points_selector=models.PointIdsList(points=batch_ids),
                 wait=wait
             )
-            if hasattr(status, 'status') and status.status == UpdateStatus.COMPLETED:
+            if _status_ok(status):
                 logger.debug(f"Lote delete {batch_num} completado exitosamente.")
                 successful_deletes += len(batch_ids)
-            elif isinstance(status, dict) and status.get('status') == 'ok':
-                 logger.debug(f"Lote delete {batch_num} completado exitosamente (status dict ok).")
-                 successful_deletes += len(batch_ids)
             else:
                 logger.warning(f"Estado inesperado devuelto por delete para lote {batch_num}: {status}")
                 total_errors += len(batch_ids)
@@ -374,8 +615,9 @@ def delete_points(
 # --- Bloque para pruebas rápidas (requiere instancia Qdrant corriendo) ---
 if __name__ == "__main__":
     # CORRECCIÓN: Añadir imports necesarios para este bloque
-    import uuid
     import time
+    import numpy as np
+    from kelly_indexer.state_manager import generate_qa_uuid
     # Configurar logging básico si se ejecuta directamente
     logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s [%(levelname)s] - %(message)s')
 
@@ -405,12 +647,12 @@ if __name__ == "__main__":
             # CORRECCIÓN: Asegurar que el tipo PointStruct esté disponible o usar Dict
             points_data = []
             if PointStruct and models: # Verificar que se importaron
+                 test_payloads = [{"text": f"punto {n + 1}", "num": n + 1} for n in range(5)]
+                 # Matriz (5, D) en un solo bloque: fila n = 0.1 * (n + 1)
+                 test_vecs = np.full((5, TEST_VECTOR_SIZE), 0.1, dtype=np.float32) * np.arange(1, 6, dtype=np.float32)[:, None]
                  points_data = [
-                     models.PointStruct(id=str(uuid.uuid4()), vector=[0.1] * TEST_VECTOR_SIZE, payload={"text": "punto 1", "num": 1}),
-                     models.PointStruct(id=str(uuid.uuid4()), vector=[0.2] * TEST_VECTOR_SIZE, payload={"text": "punto 2", "num": 2}),
-                     models.PointStruct(id=str(uuid.uuid4()), vector=[0.3] * TEST_VECTOR_SIZE, payload={"text": "punto 3", "num": 3}),
-                     models.PointStruct(id=str(uuid.uuid4()), vector=[0.4] * TEST_VECTOR_SIZE, payload={"text": "punto 4", "num": 4}),
-                     models.PointStruct(id=str(uuid.uuid4()), vector=[0.5] * TEST_VECTOR_SIZE, payload={"text": "punto 5", "num": 5}),
+                     models.PointStruct(id=generate_qa_uuid(test_payloads[n]["text"], TEST_COLLECTION), vector=test_vecs[n].tolist(), payload=test_payloads[n])
+                     for n in range(5)
                  ]
             point_ids_to_delete = [points_data[1].id, points_data[3].id] if points_data else []
 
@@ -10,15 +10,70 @@ Genera IDs deterministas y hashes de contenido.
 """
 
 import json
+import base64
+import binascii
 import logging
 import uuid
 import hashlib
 import tempfile
+import mmap
+import sys
 import os
+from functools import lru_cache
+from itertools import groupby, repeat
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timezone
+from collections.abc import Mapping
 # CORRECCIÓN: Añadir importaciones de typing necesarias
-from typing import Dict, List, Any, Optional, Tuple, Set
+from typing import Dict, List, Any, Optional, Tuple, Iterator, NamedTuple, Callable, Set
+
+# orjson es opcional (extra 'speedups'): serializa/parsea el estado varias veces
+# más rápido que json. Si no está, se usa json de la stdlib con el mismo formato.
+try:
+    import orjson
+except ImportError:
+    orjson = None # type: ignore
+
+# ijson es opcional: permite leer archivos de estado muy grandes en streaming,
+# construyendo 'indexed_points' entrada a entrada sin cargar el documento entero.
+try:
+    import ijson
+except ImportError:
+    ijson = None # type: ignore
+
+# zstandard es opcional: si la ruta del estado termina en '.zst' (ej.
+# 'index_state.json.zst'), save_state comprime el JSON y load_state lo descomprime.
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None # type: ignore
+
+# msgpack es opcional: con una ruta '.msgpack' (o '.msgpack.zst') el estado se
+# guarda en binario, con los hashes como bytes en vez de base64.
+try:
+    import msgpack
+except ImportError:
+    msgpack = None # type: ignore
+
+# xxhash es opcional: question_hash solo detecta cambios (no necesita ser
+# criptográfico) y xxh3 es mucho más rápido que SHA-256 con textos cortos.
+try:
+    import xxhash
+except ImportError:
+    xxhash = None # type: ignore
+
+# blake3 es opcional: hash SIMD (y multihilo en textos grandes), mucho más
+# rápido que SHA-256 cuando xxhash no está disponible.
+try:
+    from blake3 import blake3 as _blake3
+except ImportError:
+    _blake3 = None # type: ignore
+
+try:
+    import numpy as np
+except ImportError: # Opcional aquí: sin numpy los hashes previos se recogen punto a punto
+    np = None # type: ignore
 
 logger = logging.getLogger(__name__)
 
@@ -28,13 +83,181 @@ logger = logging.getLogger(__name__)
 # Ejemplo: python -c "import uuid; print(uuid.uuid4())"
 QDRANT_POINT_NAMESPACE = uuid.UUID('f8a7c9a1-e45f-4e6d-8f3c-1b7a2b9e8d0f') # ¡CAMBIA ESTO!
 
-STATE_FILE_VERSION = "1.0" # Versión del formato del archivo de estado
+_NS_BYTES = QDRANT_POINT_NAMESPACE.bytes # Precalculado una vez para _uuid5_str
+# SHA-1 ya alimentado con el namespace: cada UUID parte de una copia de este
+# estado (copy() + update()) en vez de crear un hasher y concatenar bytes.
+_UUID_PREFIX_HASHER = hashlib.sha1(_NS_BYTES)
+
+STATE_FILE_VERSION = "3.1" # Versión del formato del archivo de estado
+# Versiones anteriores que load_state sabe migrar:
+# 1.0: dict por punto con hashes SHA-256 en hex de 64 chars.
+# 2.0: dict por punto con hashes truncados en base64.
+# 3.0: columnar con el archivo fuente repetido en cada punto ('source_files');
+#      desde 3.1 se guarda por tramos ('source_file_runs').
+LEGACY_STATE_FILE_VERSIONS = ("1.0", "2.0", "3.0")
+
+# Tamaño a partir del cual load_state usa ijson (si está instalado) en vez de
+# parsear el archivo completo en memoria.
+STREAMING_LOAD_MIN_BYTES = 64 * 1024 * 1024
+
+ZSTD_SUFFIX = ".zst" # Sufijo que activa la compresión zstd del archivo de estado
+ZSTD_LEVEL = 3 # Nivel rápido: el estado se reescribe en cada ejecución
+MSGPACK_SUFFIX = ".msgpack" # Sufijo que activa el formato binario msgpack
+
+# save_state_incremental compacta (reescribe el snapshot y vacía el log) cuando
+# el log supera esta fracción del tamaño del snapshot, y al menos
+# STATE_LOG_COMPACT_MIN_BYTES: así load_state nunca tiene que reaplicar un log
+# comparable al propio estado, y los logs pequeños no provocan reescrituras.
+STATE_LOG_COMPACT_RATIO = 0.25
+STATE_LOG_COMPACT_MIN_BYTES = 1024 * 1024
+
+CONTENT_HASH_SIZE = 16 # Bytes de cada hash de contenido (128 bits, suficiente para detectar cambios)
+
+# A partir de este tamaño blake3 reparte el hash entre hilos (no cambia el resultado)
+BLAKE3_MULTITHREAD_MIN_BYTES = 1024 * 1024
+
+# Hasher SHA-256 vacío: copiarlo evita inicializar un contexto nuevo de
+# OpenSSL en cada llamada (notable con miles de preguntas cortas)
+_SHA256_EMPTY = hashlib.sha256()
+
+def _sha256_128(data: bytes) -> bytes:
+    hasher = _SHA256_EMPTY.copy()
+    hasher.update(data)
+    return hasher.digest()[:CONTENT_HASH_SIZE]
+
+# BLAKE2b (stdlib) con salida de CONTENT_HASH_SIZE bytes: más rápido que
+# SHA-256 con las preguntas cortas habituales y sin necesidad de truncar.
+_BLAKE2B_EMPTY = hashlib.blake2b(digest_size=CONTENT_HASH_SIZE)
+
+def _blake2b_128(data: bytes) -> bytes:
+    hasher = _BLAKE2B_EMPTY.copy()
+    hasher.update(data)
+    return hasher.digest()
+
+def _blake3_128(data: bytes) -> bytes:
+    if len(data) >= BLAKE3_MULTITHREAD_MIN_BYTES:
+        return _blake3(data, max_threads=_blake3.AUTO).digest(length=CONTENT_HASH_SIZE)
+    return _blake3(data).digest(length=CONTENT_HASH_SIZE)
+
+# Algoritmos de hash de contenido disponibles (nombre -> función bytes -> CONTENT_HASH_SIZE bytes).
+# El nombre se guarda en el archivo de estado: calculate_diff sigue usando el
+# del estado previo para que los hashes sean comparables entre ejecuciones.
+CONTENT_HASH_ALGORITHMS: Dict[str, Callable[[bytes], bytes]] = {"sha256": _sha256_128, "blake2b_128": _blake2b_128}
+if _blake3 is not None:
+    CONTENT_HASH_ALGORITHMS["blake3_128"] = _blake3_128
+if xxhash is not None:
+    CONTENT_HASH_ALGORITHMS["xxh3_128"] = xxhash.xxh3_128_digest
+# Para estados nuevos: el más rápido disponible
+DEFAULT_HASH_ALGORITHM = "xxh3_128" if xxhash is not None else "blake3_128" if _blake3 is not None else "blake2b_128"
+LEGACY_HASH_ALGORITHM = "sha256" # Estados guardados antes de registrar el algoritmo
+
+# Por debajo de este número de Q&As a calcular, calculate_diff no usa procesos
+# (el coste de arrancarlos y serializar superaría el ahorro).
+PARALLEL_DIFF_MIN_QAS = 10_000
+# Tramos de preguntas por proceso al repartir: varios por proceso equilibran
+# la carga sin multiplicar el coste de serializar cada tarea.
+PARALLEL_SLICES_PER_WORKER = 4
+
+# hashlib (y blake3) liberan el GIL con entradas de más de ~2 KB: a partir de
+# ese tamaño medio, y con bastante volumen total, el lote se hashea en hilos.
+THREADED_HASH_MIN_AVG_BYTES = 2048
+THREADED_HASH_MIN_TOTAL_BYTES = 8 * 1024 * 1024
+
+# A partir de cuántos puntos de un archivo conocido calculate_diff recoge sus
+# hashes previos con numpy (IndexedPoints.gather_hashes) en vez de uno a uno.
+NUMPY_GATHER_MIN_POINTS = 256
+
+# Textos distintos cuyo hash memoriza generate_content_hash
+CONTENT_HASH_CACHE_SIZE = 65536
 
 # --- Funciones de Hashing e IDs ---
 
-def generate_content_hash(content: str) -> str:
-    """Genera un hash SHA-256 para una cadena de texto."""
-    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+def generate_content_hash(content: str, algorithm: Optional[str] = None) -> bytes:
+    """
+    Genera un hash de CONTENT_HASH_SIZE bytes para una cadena de texto.
+
+    Usa `algorithm` (clave de CONTENT_HASH_ALGORITHMS) o, por defecto,
+    DEFAULT_HASH_ALGORITHM (xxh3_128 si xxhash está instalado, si no blake3_128
+    si blake3 lo está, y si no blake2b_128 de hashlib). Se mantiene en binario en memoria; en el archivo de estado se
+    guarda en base64 (ver save_state/load_state).
+
+    Los resultados se memorizan (ver _content_hash_cached): un texto repetido
+    no se vuelve a hashear. El cálculo en lote (generate_content_hashes_batch)
+    no pasa por la caché, porque ahí casi todo son textos nuevos y un fallo de
+    caché cuesta más que el propio hash.
+    """
+    # El algoritmo se resuelve antes de la caché para que la clave sea explícita
+    return _content_hash_cached(content, algorithm or DEFAULT_HASH_ALGORITHM)
+
+@lru_cache(maxsize=CONTENT_HASH_CACHE_SIZE)
+def _content_hash_cached(content: str, algorithm: str) -> bytes:
+    return CONTENT_HASH_ALGORITHMS[algorithm](content.encode('utf-8'))
+
+def generate_content_hashes_batch(contents: List[str], algorithm: Optional[str] = None) -> List[bytes]:
+    """
+    Genera los hashes de una lista de textos en una sola pasada.
+
+    Equivalente a `[generate_content_hash(c, algorithm) for c in contents]`,
+    pero con la función de hash resuelta una sola vez (evita búsquedas y
+    llamadas por elemento, el coste dominante con textos cortos). Con textos
+    largos (ver THREADED_HASH_MIN_AVG_BYTES) se reparte entre hilos, ya que el
+    hash en C se ejecuta sin el GIL.
+    """
+    _hash = CONTENT_HASH_ALGORITHMS[algorithm or DEFAULT_HASH_ALGORITHM]
+    encoded = [c.encode('utf-8') for c in contents]
+    total_bytes = sum(map(len, encoded))
+    workers = os.cpu_count() or 1
+    if (workers > 1 and total_bytes >= THREADED_HASH_MIN_TOTAL_BYTES
+            and total_bytes >= THREADED_HASH_MIN_AVG_BYTES * len(encoded)):
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_hash, encoded))
+    return [_hash(data) for data in encoded]
+
+def _file_digest(questions: List[str], algorithm: Optional[str] = None) -> bytes:
+    """
+    Hash del conjunto ordenado de preguntas válidas de un archivo. Si coincide
+    con el de la ejecución anterior, ninguna pregunta del archivo cambió y sus
+    IDs/hashes pueden copiarse del estado previo.
+    """
+    return CONTENT_HASH_ALGORITHMS[algorithm or DEFAULT_HASH_ALGORITHM]("\x00".join(questions).encode('utf-8'))
+
+def _encode_hash(digest: bytes) -> str:
+    """Codifica un hash binario en base64 para guardarlo en JSON (24 chars)."""
+    return base64.b64encode(digest).decode('ascii')
+
+def _decode_hash(stored: Any) -> Optional[bytes]:
+    """
+    Decodifica un hash leído del archivo de estado a bytes.
+
+    Acepta el formato actual (base64) y el heredado de la versión 1.0
+    (SHA-256 completo en hex, 64 chars): como el hash nuevo es el mismo SHA-256
+    truncado, los primeros 32 chars hex equivalen exactamente y no hace falta
+    reindexar. Devuelve None si el valor no es válido (el punto se reprocesará).
+    """
+    if isinstance(stored, bytes):
+        return stored # Ya decodificado (ej. carga en streaming)
+    if not isinstance(stored, str):
+        return None
+    try:
+        if len(stored) == 64:
+            return bytes.fromhex(stored[:CONTENT_HASH_SIZE * 2])
+        return base64.b64decode(stored, validate=True)
+    except (ValueError, binascii.Error):
+        return None
+
+def _uuid5_str(name: str) -> str:
+    """
+    Equivalente a `str(uuid.uuid5(QDRANT_POINT_NAMESPACE, name))` sin construir
+    objetos UUID: SHA-1 de namespace + nombre, bits de versión 5 y variante
+    RFC 4122, y formato 8-4-4-4-12. Los IDs resultantes son idénticos.
+    """
+    hasher = _UUID_PREFIX_HASHER.copy()
+    hasher.update(name.encode('utf-8'))
+    h = bytearray(hasher.digest()[:16])
+    h[6] = (h[6] & 0x0F) | 0x50
+    h[8] = (h[8] & 0x3F) | 0x80
+    x = h.hex()
+    return f"{x[:8]}-{x[8:12]}-{x[12:16]}-{x[16:20]}-{x[20:]}"
 
 def generate_qa_uuid(question: str, source_file_rel_path: str) -> str:
     """
@@ -53,83 +276,827 @@ def generate_qa_uuid(question: str, source_file_rel_path: str) -> str:
     """
     # Normalizar separadores de ruta para consistencia entre OS
     normalized_path = source_file_rel_path.replace("\\", "/")
-    unique_string = f"question:{question}|source:{normalized_path}"
-    # Usar el namespace definido para generar el UUID v5
-    return str(uuid.uuid5(QDRANT_POINT_NAMESPACE, unique_string))
+    return _generate_qa_uuid_prenormalized(question, normalized_path)
+
+def _generate_qa_uuid_prenormalized(question: str, normalized_path: str) -> str:
+    """Como generate_qa_uuid, pero con la ruta ya normalizada (separadores '/')."""
+    # UUID v5 con el namespace definido (ver _uuid5_str)
+    return _uuid5_str(f"question:{question}|source:{normalized_path}")
+
+def generate_qa_uuids_batch(pairs: List[Tuple[str, str]]) -> List[str]:
+    """
+    Genera los UUID v5 de una lista de pares (pregunta, ruta_relativa).
+
+    Mismo resultado que llamar a generate_qa_uuid por cada par, sin la
+    llamada de función por elemento.
+    """
+    _gen = _generate_qa_uuid_prenormalized
+    normalized: Dict[str, str] = {} # Cada ruta distinta se normaliza una sola vez
+    return [_gen(question, normalized.get(path) or normalized.setdefault(path, path.replace("\\", "/")))
+            for question, path in pairs]
+
+def generate_file_qa_uuids(questions: List[str], source_file_rel_path: str) -> List[str]:
+    """
+    Genera los UUID v5 de las preguntas de un mismo archivo, normalizando su
+    ruta una sola vez (en vez de una vez por pregunta como generate_qa_uuid).
+    """
+    _gen = _generate_qa_uuid_prenormalized
+    normalized_path = sys.intern(source_file_rel_path.replace("\\", "/"))
+    return [_gen(question, normalized_path) for question in questions]
+
+# --- Registro columnar de puntos indexados ---
+
+class PointDetail(NamedTuple):
+    """Detalles de un punto indexado (tupla inmutable, más ligera que un dict)."""
+    source_file: str
+    question_hash: bytes
+
+class QAToProcess(NamedTuple):
+    """Q&A nuevo o modificado devuelto por calculate_diff (el qa_item original no se modifica)."""
+    point_id: str
+    question_hash: bytes
+    source_file: str
+    qa_item: Dict[str, Any]
+
+def _as_point_detail(details: Any) -> Optional[PointDetail]:
+    """Normaliza los detalles de un punto (PointDetail o dict por filas) a PointDetail."""
+    if isinstance(details, PointDetail):
+        return details
+    if isinstance(details, Mapping):
+        return PointDetail(details.get('source_file'), details.get('question_hash'))
+    return None
+
+_NULL_HASH = bytes(CONTENT_HASH_SIZE) # Hash "desconocido": nunca coincide con uno real
+
+def _intern(source_file: Any) -> Any:
+    """
+    Interna la ruta de archivo fuente: hay pocos cientos de archivos distintos
+    para millones de puntos, así que todas las filas comparten un único str.
+    """
+    return sys.intern(source_file) if type(source_file) is str else source_file
+
+class IndexedPoints(Mapping):
+    """
+    Registro de puntos indexados en formato columnar (struct-of-arrays).
+
+    En lugar de un dict por punto ({'source_file', 'question_hash'}), guarda
+    tres columnas paralelas: lista de IDs, lista de archivos fuente y un único
+    buffer con los hashes concatenados (CONTENT_HASH_SIZE bytes cada uno), más
+    un dict point_id -> posición para las búsquedas. Así cada punto cuesta un
+    objeto Python en vez de tres.
+
+    Implementa la interfaz de Mapping de solo lectura (`in`, `len`, iteración,
+    `points[id]` devuelve un PointDetail), por lo que el código que trataba
+    'indexed_points' como dict sigue funcionando.
+
+    `file_digests` guarda, por archivo fuente, un hash del conjunto de sus
+    preguntas (ver _file_digest); calculate_diff lo usa para saltarse los
+    archivos que no cambiaron. `file_hashes` guarda el hash de los bytes de
+    cada archivo fuente (ver data_loader.file_content_hash), que permite
+    saltárselos incluso antes de recorrer sus Q&As. `file_stats` guarda su
+    (tamaño, mtime_ns): si no cambiaron, data_loader ni siquiera lee el archivo
+    (ver load_all_qas_from_directory). `hash_algorithm` indica
+    con qué algoritmo se calcularon los hashes (ver CONTENT_HASH_ALGORITHMS).
+
+    El índice invertido archivo -> posiciones (indices_by_file) se construye
+    una vez y se reutiliza hasta la siguiente modificación del registro.
+    """
+    __slots__ = ('_ids', '_source_files', '_hashes', '_index', '_by_file', 'file_digests', 'file_hashes', 'file_stats', 'hash_algorithm')
+
+    def __init__(self) -> None:
+        self._ids: List[str] = []
+        self._source_files: List[str] = []
+        self._hashes = bytearray()
+        self._index: Dict[str, int] = {}
+        self._by_file: Optional[Dict[str, List[int]]] = None
+        self.file_digests: Dict[str, bytes] = {}
+        self.file_hashes: Dict[str, bytes] = {}
+        self.file_stats: Dict[str, Tuple[int, int]] = {}
+        self.hash_algorithm = DEFAULT_HASH_ALGORITHM
+
+    @classmethod
+    def from_columns(cls, ids: List[str], source_files: List[str], hashes: bytes) -> "IndexedPoints":
+        """Construye el registro a partir de sus columnas (formato del archivo de estado)."""
+        if len(source_files) != len(ids) or len(hashes) != len(ids) * CONTENT_HASH_SIZE:
+            raise ValueError("Columnas de 'indexed_points' con longitudes inconsistentes.")
+        points = cls()
+        points._index = {point_id: i for i, point_id in enumerate(ids)}
+        if len(points._index) == len(ids):
+            points._ids = list(ids)
+            points._source_files = [_intern(source_file) for source_file in source_files]
+            points._hashes = bytearray(hashes)
+        else: # IDs repetidos: el último gana, como en un dict
+            points._index = {}
+            size = CONTENT_HASH_SIZE
+            for i, point_id in enumerate(ids):
+                points.set(point_id, source_files[i], hashes[i * size:(i + 1) * size])
+        return points
+
+    @classmethod
+    def from_dict(cls, points_dict: Mapping) -> "IndexedPoints":
+        """Construye el registro desde un mapa {point_id: PointDetail o dict con 'source_file'/'question_hash'}."""
+        points = cls()
+        for point_id, details in points_dict.items():
+            detail = _as_point_detail(details)
+            if detail is not None:
+                points.set(point_id, detail.source_file, detail.question_hash)
+        return points
+
+    def set(self, point_id: str, source_file: str, question_hash: Optional[bytes]) -> None:
+        """Añade o actualiza un punto. Un hash inválido se guarda como _NULL_HASH."""
+        source_file = _intern(source_file)
+        if not isinstance(question_hash, bytes) or len(question_hash) != CONTENT_HASH_SIZE:
+            question_hash = _NULL_HASH
+        self._by_file = None
+        idx = self._index.get(point_id)
+        if idx is None:
+            self._index[point_id] = len(self._ids)
+            self._ids.append(point_id)
+            self._source_files.append(source_file)
+            self._hashes += question_hash
+        else:
+            self._source_files[idx] = source_file
+            self._hashes[idx * CONTENT_HASH_SIZE:(idx + 1) * CONTENT_HASH_SIZE] = question_hash
+
+    def discard(self, point_id: str) -> Optional[str]:
+        """
+        Elimina un punto si existe y devuelve su archivo fuente (None si no existía).
+
+        Mueve la última fila al hueco (O(1)), por lo que no conserva el orden.
+        """
+        idx = self._index.pop(point_id, None)
+        if idx is None:
+            return None
+        self._by_file = None
+        size = CONTENT_HASH_SIZE
+        source_file = self._source_files[idx]
+        last = len(self._ids) - 1
+        if idx != last:
+            moved_id = self._ids[last]
+            self._ids[idx] = moved_id
+            self._source_files[idx] = self._source_files[last]
+            self._hashes[idx * size:(idx + 1) * size] = self._hashes[last * size:(last + 1) * size]
+            self._index[moved_id] = idx
+        self._ids.pop()
+        self._source_files.pop()
+        del self._hashes[last * size:]
+        return source_file
+
+    def extend(self, point_ids: List[str], source_file: str, question_hashes: List[bytes]) -> None:
+        """
+        Añade en bloque los puntos de un archivo. El índice crece una sola vez
+        con el tamaño final (dict.update desde un dict reserva de golpe) en vez
+        de redimensionarse varias veces punto a punto; las listas se extienden
+        de una vez. Si algún ID ya existe o algún hash es inválido, se recurre a set().
+        """
+        joined = b"".join(h for h in question_hashes if isinstance(h, bytes))
+        if not self._append_block(point_ids, source_file, joined):
+            for point_id, question_hash in zip(point_ids, question_hashes):
+                self.set(point_id, source_file, question_hash)
+
+    def _append_block(self, point_ids: List[str], source_file: str, joined_hashes: bytes) -> bool:
+        """
+        Añade al final un bloque de puntos nuevos con sus hashes ya concatenados.
+        Devuelve False (sin modificar nada) si hay IDs repetidos o ya existentes,
+        o si el buffer de hashes no tiene el tamaño esperado.
+        """
+        start = len(self._ids)
+        new_index = dict(zip(point_ids, range(start, start + len(point_ids))))
+        if (len(new_index) != len(point_ids) or len(joined_hashes) != len(point_ids) * CONTENT_HASH_SIZE
+                or not self._index.keys().isdisjoint(new_index)):
+            return False
+        source_file = _intern(source_file)
+        self._by_file = None
+        self._index.update(new_index)
+        self._ids.extend(point_ids)
+        self._source_files.extend([source_file] * len(point_ids))
+        self._hashes += joined_hashes
+        return True
+
+    def extend_joined(self, point_ids: List[str], source_file: str, joined_hashes: bytes) -> None:
+        """Como extend, pero con los hashes ya concatenados (ver gather_hashes)."""
+        if not self._append_block(point_ids, source_file, bytes(joined_hashes)):
+            size = CONTENT_HASH_SIZE
+            self.extend(point_ids, source_file,
+                        [bytes(joined_hashes[i * size:(i + 1) * size]) for i in range(len(point_ids))])
+
+    def copy_rows(self, other: "IndexedPoints", indices: List[int]) -> None:
+        """
+        Copia las filas `indices` de otro registro (sin pasar por dicts intermedios).
+        Si son contiguas y de un mismo archivo (lo habitual: un archivo se añade
+        en bloque) se copian por rebanadas de las columnas, sin objetos por fila.
+        """
+        size = CONTENT_HASH_SIZE
+        if indices:
+            first, last = indices[0], indices[-1]
+            if (last - first + 1 == len(indices) and indices == list(range(first, last + 1))
+                    and other._source_files[first:last + 1].count(other._source_files[first]) == len(indices)
+                    and self._append_block(other._ids[first:last + 1], other._source_files[first],
+                                           other._hashes[first * size:(last + 1) * size])):
+                return
+        if indices and all(other._source_files[idx] == other._source_files[indices[0]] for idx in indices):
+            hashes = other._hashes
+            self.extend([other._ids[idx] for idx in indices], other._source_files[indices[0]],
+                        [bytes(hashes[idx * size:(idx + 1) * size]) for idx in indices])
+            return
+        for idx in indices:
+            self.set(other._ids[idx], other._source_files[idx], bytes(other._hashes[idx * size:(idx + 1) * size]))
+
+    def reusable_file_stats(self) -> Dict[str, Tuple[int, int]]:
+        """
+        (tamaño, mtime_ns) de los archivos que calculate_diff puede copiar sin
+        leerlos: los que tienen también hash de bytes y digest, y solo si el
+        algoritmo de hash del registro está disponible. Es lo que se pasa a
+        data_loader.load_all_qas_from_directory como known_file_stats.
+        """
+        if self.hash_algorithm not in CONTENT_HASH_ALGORITHMS:
+            return {}
+        return {source_file: stat for source_file, stat in self.file_stats.items()
+                if source_file in self.file_hashes and source_file in self.file_digests}
+
+    def indices_by_file(self) -> Dict[str, List[int]]:
+        """
+        Índice invertido archivo fuente -> posiciones de sus puntos. Se cachea
+        hasta la siguiente modificación; el resultado no debe modificarse.
+        """
+        by_file = self._by_file
+        if by_file is None:
+            by_file = {}
+            for idx, source_file in enumerate(self._source_files):
+                by_file.setdefault(source_file, []).append(idx)
+            self._by_file = by_file
+        return by_file
+
+    def point_ids_for_file(self, source_file: str) -> List[str]:
+        """IDs de los puntos de un archivo fuente, en orden de inserción."""
+        ids = self._ids
+        return [ids[idx] for idx in self.indices_by_file().get(source_file, ())]
+
+    def source_files(self) -> Set[str]:
+        """Conjunto de archivos fuente distintos con al menos un punto."""
+        return {source_file for source_file in set(self._source_files) if isinstance(source_file, str)}
+
+    def get_hash(self, point_id: str) -> Optional[bytes]:
+        """Devuelve el hash de un punto (sin construir el dict de detalles) o None si no existe."""
+        idx = self._index.get(point_id)
+        if idx is None:
+            return None
+        return bytes(self._hashes[idx * CONTENT_HASH_SIZE:(idx + 1) * CONTENT_HASH_SIZE])
+
+    def gather_hashes(self, point_ids: List[str]) -> Tuple[bytearray, List[int], List[Optional[bytes]]]:
+        """
+        Recoge con numpy los hashes de varios puntos de una vez (requiere numpy).
+
+        Returns:
+            - Los hashes concatenados, con _NULL_HASH para los puntos sin hash
+              válido o inexistentes.
+            - Las posiciones (en point_ids) de esos puntos.
+            - Para cada una de ellas, lo que devolvería get_hash: None si el
+              punto no existe, _NULL_HASH si existe sin hash válido.
+        """
+        positions = np.fromiter(map(self._index.get, point_ids, repeat(-1)), dtype=np.int64, count=len(point_ids))
+        unknown = positions < 0
+        # Vista sin copia del buffer: se libera al salir (el bytearray no puede crecer mientras exista)
+        table = np.frombuffer(self._hashes, dtype=np.uint8).reshape(-1, CONTENT_HASH_SIZE)
+        gathered = table[np.where(unknown, 0, positions)] if len(table) else np.zeros((len(point_ids), CONTENT_HASH_SIZE), dtype=np.uint8)
+        del table
+        gathered[unknown] = 0
+        missing = np.flatnonzero(~gathered.any(axis=1))
+        previous = [None if is_unknown else _NULL_HASH for is_unknown in unknown[missing].tolist()]
+        return bytearray(gathered.tobytes()), missing.tolist(), previous
+
+    def columns(self) -> Tuple[List[str], List[str], bytes]:
+        """Devuelve las columnas (ids, source_files, hashes concatenados)."""
+        return self._ids, self._source_files, bytes(self._hashes)
+
+    def __getitem__(self, point_id: str) -> PointDetail:
+        idx = self._index[point_id]
+        return PointDetail(self._source_files[idx], bytes(self._hashes[idx * CONTENT_HASH_SIZE:(idx + 1) * CONTENT_HASH_SIZE]))
+
+    def __contains__(self, point_id: object) -> bool:
+        return point_id in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __repr__(self) -> str:
+        return f"IndexedPoints({len(self)} puntos)"
+
+def state_points_for_file(state: Dict[str, Any], rel_path: str) -> List[str]:
+    """
+    Devuelve los IDs de los puntos que el estado (tal como lo devuelve
+    load_state) tiene registrados para un archivo fuente.
+
+    Con el registro columnar usa su índice invertido cacheado; para un
+    'indexed_points' en forma de dict recorre las entradas una vez.
+    """
+    indexed_points = state.get("indexed_points") or {}
+    if isinstance(indexed_points, IndexedPoints):
+        return indexed_points.point_ids_for_file(rel_path)
+    point_ids = []
+    for point_id, details in indexed_points.items():
+        detail = _as_point_detail(details)
+        if detail is not None and detail.source_file == rel_path:
+            point_ids.append(point_id)
+    return point_ids
 
 # --- Funciones de Carga y Guardado de Estado ---
 
+def _json_loads(data: bytes) -> Any:
+    """Parsea JSON (bytes UTF-8; con orjson también memoryview) con orjson si está disponible."""
+    if orjson is not None:
+        return orjson.loads(data) # orjson.JSONDecodeError hereda de json.JSONDecodeError
+    return json.loads(data.decode('utf-8'))
+
+def _json_dumps(obj: Any, pretty: bool = False) -> bytes:
+    """Serializa a JSON (UTF-8 sin escapar) como bytes; compacto salvo pretty=True (indentado a 2)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2) if pretty else orjson.dumps(obj)
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def _iter_state_chunks(state: Dict[str, Any], pretty: bool = False, use_msgpack: bool = False) -> Iterator[bytes]:
+    """
+    Serializa el estado por trozos (cada columna de 'points' por separado) para
+    escribirlo sin materializar el documento entero: el pico de memoria es el de
+    la columna más grande, no el del archivo. El resultado concatenado es
+    idéntico a serializarlo de una vez. pretty=True se serializa de una vez.
+    """
+    if use_msgpack:
+        packer = msgpack.Packer(use_bin_type=True)
+        yield packer.pack_map_header(len(state))
+        for key, value in state.items():
+            yield packer.pack(key)
+            if key == "points" and isinstance(value, dict):
+                yield packer.pack_map_header(len(value))
+                for column, column_value in value.items():
+                    yield packer.pack(column)
+                    yield packer.pack(column_value)
+            else:
+                yield packer.pack(value)
+        return
+    if pretty:
+        yield _json_dumps(state, pretty=True)
+        return
+    yield b"{"
+    for i, (key, value) in enumerate(state.items()):
+        yield (b"," if i else b"") + _json_dumps(key) + b":"
+        if key == "points" and isinstance(value, dict):
+            yield b"{"
+            for j, (column, column_value) in enumerate(value.items()):
+                yield (b"," if j else b"") + _json_dumps(column) + b":"
+                yield _json_dumps(column_value)
+            yield b"}"
+        else:
+            yield _json_dumps(value)
+    yield b"}"
+
+def _source_file_runs(source_files: List[str]) -> List[List[Any]]:
+    """
+    Codifica la columna de archivos fuente por tramos: [[archivo, n_puntos], ...].
+    Los puntos de un archivo se añaden juntos (IndexedPoints.extend), así que
+    hay aproximadamente un tramo por archivo en vez de una ruta por punto.
+    """
+    return [[source_file, sum(1 for _ in run)] for source_file, run in groupby(source_files)]
+
+def _expand_source_file_runs(runs: Any) -> List[str]:
+    """Inversa de _source_file_runs. Lanza ValueError si los tramos no son válidos."""
+    source_files: List[str] = []
+    for run in runs:
+        if not isinstance(run, (list, tuple)) or len(run) != 2 or not isinstance(run[1], int) or run[1] < 0:
+            raise ValueError(f"Tramo inválido en 'source_file_runs': {str(run)[:100]}")
+        source_files.extend([_intern(run[0])] * run[1])
+    return source_files
+
+def _is_zstd_path(state_file_path: Path) -> bool:
+    """True si el archivo de estado debe leerse/escribirse comprimido con zstd."""
+    return state_file_path.suffix == ZSTD_SUFFIX
+
+def _is_msgpack_path(state_file_path: Path) -> bool:
+    """True si el archivo de estado usa msgpack (ignorando un '.zst' final)."""
+    if _is_zstd_path(state_file_path):
+        state_file_path = state_file_path.with_suffix('')
+    return state_file_path.suffix == MSGPACK_SUFFIX
+
+def _file_sha256(file_path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 (hex) de un archivo, leído por bloques de 1 MB."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _parse_state_bytes(state_file_path: Path, parse: Any, accepts_buffer: bool) -> Tuple[Any, str]:
+    """
+    Lee el archivo y lo pasa a `parse`; devuelve (resultado, SHA-256 hex de los
+    bytes leídos). Si el parser acepta un buffer (orjson, msgpack), mapea el
+    archivo en memoria en vez de copiarlo con read(): el SO lo pagina bajo
+    demanda y se evita tener dos copias del archivo a la vez.
+    """
+    with open(state_file_path, 'rb') as f:
+        if not accepts_buffer or os.fstat(f.fileno()).st_size == 0: # mmap no admite archivos vacíos
+            data = f.read()
+            return parse(data), hashlib.sha256(data).hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mm.madvise(mmap.MADV_SEQUENTIAL) # Lectura secuencial: lectura anticipada agresiva
+            with memoryview(mm) as view:
+                return parse(view), hashlib.sha256(view).hexdigest()
+
+def _fsync_directory(directory: Path) -> None:
+    """
+    Sincroniza a disco la entrada de directorio (tras un os.replace) para que el
+    renombrado sobreviva a un corte de energía. No disponible en Windows: se omite.
+    """
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError as e:
+        # El archivo ya se reemplazó; solo se pierde la garantía ante un corte de energía
+        logger.warning(f"No se pudo sincronizar el directorio {directory}: {e}")
+
+# Errores de parseo JSON de los backends disponibles
+_JSON_DECODE_ERRORS: Tuple[type, ...] = (json.JSONDecodeError,) + ((ijson.JSONError,) if ijson is not None else ())
+
+def _stream_state_file(state_file_path: Path) -> Dict[str, Any]:
+    """
+    Lee el archivo de estado con ijson en streaming.
+
+    Una primera pasada lee solo las claves escalares de nivel superior
+    (version, last_run_utc), que save_state escribe antes de los puntos, y se
+    detiene al llegar a ellos. Después se leen los puntos: en formato columnar
+    ('points'), columna a columna en una sola pasada; en el formato por filas heredado
+    ('indexed_points'), par a par, decodificando cada hash al vuelo.
+    """
+    state: Dict[str, Any] = {}
+    points_key = None
+    with open(state_file_path, 'rb') as f:
+        for prefix, event, value in ijson.parse(f):
+            if prefix in ('points', 'indexed_points'):
+                points_key = prefix
+                break
+            if prefix in ('version', 'last_run_utc') and event in ('string', 'null'):
+                state[prefix] = value
+        if points_key == 'points':
+            # Una sola pasada más: cada columna se construye al llegar a ella
+            f.seek(0)
+            state["points"] = dict(ijson.kvitems(f, 'points'))
+        elif points_key == 'indexed_points':
+            f.seek(0)
+            indexed_points = IndexedPoints()
+            indexed_points.hash_algorithm = LEGACY_HASH_ALGORITHM
+            for point_id, details in ijson.kvitems(f, 'indexed_points'):
+                if isinstance(details, dict):
+                    indexed_points.set(point_id, details.get("source_file"), _decode_hash(details.get("question_hash")))
+            state["indexed_points"] = indexed_points
+    return state
+
+def _points_from_state(state: Dict[str, Any]) -> Optional[IndexedPoints]:
+    """
+    Obtiene los puntos indexados de un estado recién leído, en cualquiera de
+    los formatos soportados. Devuelve None si no hay puntos válidos.
+    """
+    columns = state.pop("points", None)
+    if isinstance(columns, dict):
+        hashes = columns.get("question_hashes") or b""
+        runs = columns.get("source_file_runs")
+        points = IndexedPoints.from_columns(
+            columns.get("ids") or [],
+            _expand_source_file_runs(runs) if runs else columns.get("source_files") or [],
+            hashes if isinstance(hashes, bytes) else base64.b64decode(hashes, validate=True), # bytes en msgpack
+        )
+        points.hash_algorithm = columns.get("hash_algorithm") or LEGACY_HASH_ALGORITHM
+        for source_file, digest in (columns.get("file_digests") or {}).items():
+            decoded = _decode_hash(digest)
+            if decoded is not None:
+                points.file_digests[_intern(source_file)] = decoded
+        for source_file, file_hash in (columns.get("file_hashes") or {}).items():
+            decoded = _decode_hash(file_hash)
+            if decoded is not None:
+                points.file_hashes[_intern(source_file)] = decoded
+        for source_file, stat in (columns.get("file_stats") or {}).items():
+            # Solo junto a su hash de bytes: sin él no se podría saltar el archivo
+            if source_file in points.file_hashes and isinstance(stat, list) and len(stat) == 2:
+                points.file_stats[_intern(source_file)] = (stat[0], stat[1])
+        return points
+    rows = state.get("indexed_points")
+    if isinstance(rows, IndexedPoints):
+        return rows # Ya construido en streaming
+    if isinstance(rows, dict): # Formato por filas (versiones 1.0 / 2.0)
+        points = IndexedPoints()
+        points.hash_algorithm = LEGACY_HASH_ALGORITHM
+        for point_id, details in rows.items():
+            if isinstance(details, dict):
+                points.set(point_id, details.get("source_file"), _decode_hash(details.get("question_hash")))
+        return points
+    return None
+
+def state_log_path(state_file_path: Path) -> Path:
+    """Ruta del log incremental asociado a un archivo de estado (<nombre>_log.ndjson)."""
+    if _is_zstd_path(state_file_path):
+        state_file_path = state_file_path.with_suffix('') # 'estado.json.zst' -> 'estado_log.ndjson'
+    return state_file_path.with_name(f"{state_file_path.stem}_log.ndjson")
+
+def _replay_state_log(state_file_path: Path, indexed_points: IndexedPoints) -> int:
+    """
+    Aplica sobre indexed_points los cambios del log incremental (si existe).
+
+    Cada línea es un objeto JSON: {"op": "add", "id", "file", "hash"},
+    {"op": "del", "id"} o {"op": "file", "file", "digest"}. Un cambio de puntos
+    invalida el digest y el hash de bytes de su archivo (salvo que el log
+    registre un digest nuevo),
+    para que calculate_diff no copie filas desactualizadas. Las líneas
+    ilegibles (ej. la última, truncada por un corte) se ignoran.
+
+    Returns:
+        Número de operaciones aplicadas.
+    """
+    log_path = state_log_path(state_file_path)
+    if not log_path.is_file():
+        return 0
+    applied = 0
+    file_digests = indexed_points.file_digests
+    file_hashes = indexed_points.file_hashes
+    with open(log_path, 'rb') as f:
+        for line_num, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = _json_loads(line)
+                op = entry["op"]
+                if op == "add":
+                    indexed_points.set(entry["id"], entry["file"], _decode_hash(entry.get("hash")))
+                    file_digests.pop(entry["file"], None)
+                    file_hashes.pop(entry["file"], None)
+                elif op == "del":
+                    source_file = indexed_points.discard(entry["id"])
+                    if source_file is not None:
+                        file_digests.pop(source_file, None)
+                        file_hashes.pop(source_file, None)
+                elif op == "file":
+                    file_hashes.pop(entry["file"], None) # El log no registra hashes de bytes
+                    digest = _decode_hash(entry.get("digest"))
+                    if digest is None:
+                        file_digests.pop(entry["file"], None)
+                    else:
+                        file_digests[_intern(entry["file"])] = digest
+                else:
+                    raise ValueError(f"operación desconocida '{op}'")
+                applied += 1
+            except (*_JSON_DECODE_ERRORS, KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Línea {line_num} inválida en el log de estado {log_path}: {e}. Ignorada.")
+    logger.info(f"Aplicadas {applied} operaciones del log incremental {log_path}.")
+    return applied
+
+def save_state_incremental(
+    state_file_path: Path,
+    added: Mapping,
+    removed: List[str],
+    file_digests: Optional[Dict[str, Optional[bytes]]] = None
+) -> bool:
+    """
+    Registra cambios del estado añadiendo líneas al log incremental, sin
+    reescribir el archivo de estado completo (coste O(cambios), no O(puntos)).
+
+    load_state aplica el log sobre el último snapshot; save_state (o
+    compact_state) escribe un snapshot nuevo y vacía el log. Si tras escribir
+    el log este supera STATE_LOG_COMPACT_RATIO del snapshot (y
+    STATE_LOG_COMPACT_MIN_BYTES), se compacta automáticamente.
+
+    Args:
+        state_file_path: Ruta al archivo de estado (el log va a su lado).
+        added: Puntos añadidos/modificados {point_id: PointDetail (o dict equivalente)}.
+        removed: IDs de puntos eliminados.
+        file_digests: Digests de archivo a registrar (None como valor lo invalida).
+
+    Returns:
+        True si se escribió exitosamente, False en caso contrario.
+    """
+    log_path = state_log_path(state_file_path)
+    lines: List[bytes] = []
+    for point_id, details in added.items():
+        detail = _as_point_detail(details)
+        if detail is None:
+            continue
+        lines.append(_json_dumps({
+            "op": "add", "id": point_id, "file": detail.source_file,
+            "hash": _encode_hash(detail.question_hash) if isinstance(detail.question_hash, bytes) else None,
+        }))
+    for point_id in removed:
+        lines.append(_json_dumps({"op": "del", "id": point_id}))
+    for source_file, digest in (file_digests or {}).items():
+        lines.append(_json_dumps({"op": "file", "file": source_file, "digest": _encode_hash(digest) if digest else None}))
+    if not lines:
+        return True
+    try:
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        created = not log_path.exists()
+        with open(log_path, 'ab') as f:
+            f.write(b"\n".join(lines) + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if created: # La entrada de directorio del log nuevo también debe sobrevivir a un corte
+            _fsync_directory(log_path.parent)
+        logger.info(f"Registradas {len(lines)} operaciones en el log de estado {log_path}.")
+    except Exception as e:
+        logger.exception(f"Error al escribir el log de estado {log_path}: {e}")
+        return False
+
+    # Los cambios ya son durables en el log: un fallo al compactar no los pierde
+    if _state_log_needs_compaction(state_file_path, log_path):
+        logger.info(f"El log de estado {log_path} supera el {STATE_LOG_COMPACT_RATIO:.0%} del snapshot. Compactando...")
+        if not compact_state(state_file_path):
+            logger.warning(f"No se pudo compactar el estado {state_file_path}. Se mantiene el log incremental.")
+    return True
+
+def _state_log_needs_compaction(state_file_path: Path, log_path: Path) -> bool:
+    """True si el log es lo bastante grande, respecto al snapshot, para compactarlo."""
+    try:
+        log_size = log_path.stat().st_size
+        if log_size < STATE_LOG_COMPACT_MIN_BYTES:
+            return False
+        snapshot_size = state_file_path.stat().st_size if state_file_path.is_file() else 0
+    except OSError:
+        return False
+    return log_size > snapshot_size * STATE_LOG_COMPACT_RATIO
+
+def compact_state(state_file_path: Path) -> bool:
+    """
+    Reescribe el snapshot de estado con el log aplicado y vacía el log.
+    Si el snapshot existe pero no se pudo leer (load_failed), no hace nada y
+    devuelve False: guardar dejaría solo lo del log y lo borraría.
+    """
+    state = load_state(state_file_path)
+    if state.get("load_failed"):
+        logger.error(f"No se compacta {state_file_path}: el snapshot no se pudo cargar. Se mantiene el log incremental.")
+        return False
+    return save_state(state_file_path, state, expected_prev_sha256=state.get("file_sha256"))
+
 def load_state(state_file_path: Path) -> Dict[str, Any]:
     """
-    Carga el estado de indexación desde un archivo JSON.
+    Carga el estado de indexación desde un archivo JSON y aplica encima el
+    log incremental (ver save_state_incremental), si existe.
 
-    Si el archivo no existe o está corrupto, devuelve un estado vacío inicial.
+    Si el archivo no existe o está corrupto, devuelve un estado vacío inicial
+    (con el log aplicado); si existía pero no se pudo leer, 'load_failed' es
+    True para que compact_state no lo sobrescriba.
+    Si la ruta termina en '.zst' se descomprime con zstd (no usa streaming), y
+    si es '.msgpack' (o '.msgpack.zst') se decodifica con msgpack en vez de JSON.
 
     Args:
         state_file_path: Ruta al archivo JSON de estado.
 
     Returns:
         Un diccionario representando el estado cargado o un estado inicial vacío.
-        Formato esperado: {"version": "...", "last_run_utc": "...", "indexed_points": {}}
+        Formato: {"version": "...", "last_run_utc": "...", "indexed_points": IndexedPoints,
+                  "file_sha256": hash hex de los bytes leídos o None,
+                  "load_failed": True si el archivo existía pero no se pudo cargar}
     """
     # CORRECCIÓN: Añadir tipo explícito a initial_state
     initial_state: Dict[str, Any] = {
         "version": STATE_FILE_VERSION,
         "last_run_utc": None,
-        "indexed_points": {}
+        "indexed_points": IndexedPoints(),
+        "file_sha256": None,
+        "load_failed": False,
     }
+
+    def _failed_load() -> Dict[str, Any]:
+        # Snapshot ilegible: estado inicial con lo que haya en el log, marcado como fallido
+        initial_state["load_failed"] = True
+        initial_state["indexed_points"] = IndexedPoints()
+        try:
+            _replay_state_log(state_file_path, initial_state["indexed_points"])
+        except OSError as e:
+            logger.error(f"No se pudo leer el log de estado de {state_file_path}: {e}")
+        return initial_state
+
     if not state_file_path.is_file():
         logger.warning(f"Archivo de estado no encontrado en {state_file_path}. Se asumirá estado inicial.")
+        _replay_state_log(state_file_path, initial_state["indexed_points"])
         return initial_state
 
+    is_zstd = _is_zstd_path(state_file_path)
+    if is_zstd and zstd is None:
+        logger.error(f"El archivo de estado {state_file_path} está comprimido pero 'zstandard' no está instalado (pip install zstandard). Se usará estado inicial.")
+        return _failed_load()
+    is_msgpack = _is_msgpack_path(state_file_path)
+    if is_msgpack and msgpack is None:
+        logger.error(f"El archivo de estado {state_file_path} es msgpack pero 'msgpack' no está instalado (pip install msgpack). Se usará estado inicial.")
+        return _failed_load()
+
     logger.info(f"Cargando estado desde: {state_file_path}")
     try:
-        with open(state_file_path, 'r', encoding='utf-8') as f:
-            state = json.load(f)
+        if not is_zstd and not is_msgpack and ijson is not None and state_file_path.stat().st_size >= STREAMING_LOAD_MIN_BYTES:
+            logger.debug("Archivo de estado grande: cargando en streaming con ijson.")
+            file_sha256 = _file_sha256(state_file_path)
+            state = _stream_state_file(state_file_path)
+        elif is_zstd:
+            with open(state_file_path, 'rb') as f:
+                raw = f.read()
+            file_sha256 = hashlib.sha256(raw).hexdigest()
+            with zstd.ZstdDecompressor().stream_reader(raw) as reader:
+                data = reader.read()
+            state = msgpack.unpackb(data, raw=False) if is_msgpack else _json_loads(data)
+        elif is_msgpack:
+            state, file_sha256 = _parse_state_bytes(state_file_path, lambda data: msgpack.unpackb(data, raw=False), accepts_buffer=True)
+        else:
+            state, file_sha256 = _parse_state_bytes(state_file_path, _json_loads, accepts_buffer=orjson is not None)
 
         # Validaciones básicas de estructura
         if not isinstance(state, dict):
              raise ValueError("El archivo de estado no contiene un objeto JSON.")
         # Asegurar que las claves principales existan, aunque estén vacías/None
-        if "indexed_points" not in state or not isinstance(state.get("indexed_points"), dict):
+        indexed_points = _points_from_state(state)
+        if indexed_points is None:
              logger.warning("Clave 'indexed_points' no encontrada o inválida en el estado. Reiniciando puntos indexados.")
-             state["indexed_points"] = {}
+             indexed_points = IndexedPoints()
+        state["indexed_points"] = indexed_points
         if "version" not in state:
              logger.warning("Clave 'version' no encontrada en el estado. Añadiendo versión por defecto.")
              state["version"] = STATE_FILE_VERSION
+        elif state.get("version") in LEGACY_STATE_FILE_VERSIONS:
+             logger.info(f"Migrando estado de la versión {state.get('version')} a {STATE_FILE_VERSION}.")
+             state["version"] = STATE_FILE_VERSION
         elif state.get("version") != STATE_FILE_VERSION:
              logger.warning(f"Versión del archivo de estado ({state.get('version')}) no coincide con la esperada ({STATE_FILE_VERSION}). Puede haber incompatibilidades.")
         if "last_run_utc" not in state:
              state["last_run_utc"] = None # Asegurar que exista
+        state["file_sha256"] = file_sha256 # Para la precondición de save_state
+        state["load_failed"] = False
 
+        _replay_state_log(state_file_path, state["indexed_points"])
         logger.info(f"Estado cargado. {len(state['indexed_points'])} puntos indexados previamente.")
         return state
 
-    except json.JSONDecodeError as e:
+    except _JSON_DECODE_ERRORS as e:
         logger.error(f"Error al decodificar JSON en el archivo de estado {state_file_path}: {e}. Se usará estado inicial.")
-        return initial_state.copy() # Devolver copia del inicial
+        return _failed_load() # Recién creado en esta llamada: no hace falta copiarlo
+    except (ValueError, binascii.Error) as e: # Columnas inconsistentes, base64 o zstd inválido
+        logger.error(f"Estructura inválida en el archivo de estado {state_file_path}: {e}. Se usará estado inicial.")
+        return _failed_load()
     except Exception as e:
         logger.exception(f"Error inesperado al cargar el archivo de estado {state_file_path}: {e}. Se usará estado inicial.")
-        return initial_state.copy() # Devolver copia del inicial
+        return _failed_load()
 
-def save_state(state_file_path: Path, current_state: Dict[str, Any]) -> bool:
+def save_state(
+    state_file_path: Path,
+    current_state: Dict[str, Any],
+    pretty: bool = False,
+    expected_prev_sha256: Optional[str] = None,
+    durable: bool = True
+) -> bool:
     """
     Guarda el diccionario de estado actual en un archivo JSON de forma atómica.
 
     Actualiza 'last_run_utc' y 'version' antes de guardar.
-    Utiliza escritura a archivo temporal y renombrado para atomicidad.
+    Utiliza escritura a archivo temporal (con fsync) y renombrado para
+    atomicidad, y sincroniza el directorio para que el renombrado sea durable.
+    El JSON se escribe compacto; pretty=True lo indenta (útil para depurar).
+    Si la ruta termina en '.zst' el archivo se comprime con zstd, y con
+    '.msgpack' (o '.msgpack.zst') se escribe en msgpack en lugar de JSON.
 
     Args:
         state_file_path: Ruta al archivo JSON donde guardar el estado.
-        current_state: El diccionario de estado a guardar (se espera que contenga al menos 'indexed_points').
+        current_state: El diccionario de estado a guardar (se espera que contenga al menos
+                       'indexed_points', como IndexedPoints o dict por filas).
+        pretty: Si True, escribe el JSON indentado (más grande y lento).
+        expected_prev_sha256: 'file_sha256' devuelto por load_state. Si se indica y el
+                              archivo actual ya no tiene ese hash (otro proceso lo
+                              reescribió), no se sobrescribe y se devuelve False.
+        durable: Si False, no se hace fsync del archivo ni del directorio. El
+                 renombrado sigue siendo atómico (nunca se lee un estado a medias
+                 mientras el sistema siga en pie), pero un corte de corriente
+                 justo después puede dejar el estado anterior o uno vacío.
 
     Returns:
         True si se guardó exitosamente, False en caso contrario.
     """
     logger.info(f"Guardando estado actualizado en: {state_file_path}...")
-    if not isinstance(current_state.get("indexed_points"), dict):
+    indexed_points = current_state.get("indexed_points")
+    if not isinstance(indexed_points, Mapping):
          logger.error("Intento de guardar estado inválido: 'indexed_points' no es un diccionario.")
          return False
+    if not isinstance(indexed_points, IndexedPoints):
+         indexed_points = IndexedPoints.from_dict(indexed_points)
+
+    is_zstd = _is_zstd_path(state_file_path)
+    if is_zstd and zstd is None:
+         logger.error(f"No se puede guardar {state_file_path} comprimido: 'zstandard' no está instalado (pip install zstandard).")
+         return False
+    is_msgpack = _is_msgpack_path(state_file_path)
+    if is_msgpack and msgpack is None:
+         logger.error(f"No se puede guardar {state_file_path} en msgpack: 'msgpack' no está instalado (pip install msgpack).")
+         return False
 
     # Crear directorio padre si no existe
     try:
@@ -138,26 +1105,64 @@ def save_state(state_file_path: Path, current_state: Dict[str, Any]) -> bool:
          logger.error(f"No se pudo crear el directorio padre para el archivo de estado '{state_file_path.parent}': {e}")
          return False
 
-    # Preparar estado a guardar
+    # Preparar estado a guardar en formato columnar (archivos fuente por tramos,
+    # hashes concatenados; en JSON van en base64, en msgpack directamente como bytes)
+    ids, source_files, hashes = indexed_points.columns()
+    _encode = (lambda digest: digest) if is_msgpack else _encode_hash
     state_to_save: Dict[str, Any] = {
         "version": STATE_FILE_VERSION,
         "last_run_utc": datetime.now(timezone.utc).isoformat(),
         # Asegurarse de guardar solo los puntos indexados actuales
-        "indexed_points": current_state.get("indexed_points", {})
+        "points": {
+            "hash_algorithm": indexed_points.hash_algorithm, # Primero: la carga en streaming lo lee sin recorrer el resto
+            "ids": ids,
+            "source_file_runs": _source_file_runs(source_files),
+            "question_hashes": _encode(hashes),
+            "file_digests": {source_file: _encode(digest) for source_file, digest in indexed_points.file_digests.items()},
+            "file_hashes": {source_file: _encode(file_hash) for source_file, file_hash in indexed_points.file_hashes.items()},
+            "file_stats": {source_file: list(stat) for source_file, stat in indexed_points.file_stats.items()},
+        }
     }
 
     # Escritura atómica
     temp_path_obj: Optional[Path] = None
     try:
         # Crear archivo temporal en el mismo directorio que el final
-        with tempfile.NamedTemporaryFile('w', delete=False, dir=state_file_path.parent, encoding='utf-8', suffix='.tmp') as temp_f:
-            json.dump(state_to_save, temp_f, indent=2, ensure_ascii=False)
+        with tempfile.NamedTemporaryFile('wb', delete=False, dir=state_file_path.parent, suffix='.tmp') as temp_f:
             temp_path = temp_f.name # Guardar nombre temporal como string
             temp_path_obj = Path(temp_path) # Y como objeto Path
+            chunks = _iter_state_chunks(state_to_save, pretty=pretty, use_msgpack=is_msgpack)
+            if is_zstd:
+                # closefd=False: el archivo temporal lo cierra el 'with' exterior tras el fsync
+                with zstd.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(temp_f, closefd=False) as writer:
+                    for chunk in chunks:
+                        writer.write(chunk)
+            else:
+                for chunk in chunks:
+                    temp_f.write(chunk)
+            # Asegurar que los datos estén en disco antes de renombrar
+            temp_f.flush()
+            if durable:
+                os.fsync(temp_f.fileno())
+
+        # Concurrencia optimista: no pisar un estado guardado por otro proceso
+        if expected_prev_sha256 is not None and state_file_path.exists():
+            current_sha256 = _file_sha256(state_file_path)
+            if current_sha256 != expected_prev_sha256:
+                logger.error(f"stale_precondition: el archivo de estado {state_file_path} cambió desde que se cargó "
+                             f"(esperado {expected_prev_sha256[:12]}..., actual {current_sha256[:12]}...). No se sobrescribe.")
+                temp_path_obj.unlink()
+                return False
 
-        # Renombrar atómicamente (reemplaza si existe)
+        # Renombrar atómicamente (reemplaza si existe) y hacer durable el renombrado
         os.replace(temp_path, state_file_path)
-        logger.info(f"Estado guardado exitosamente. {len(state_to_save['indexed_points'])} puntos registrados.")
+        if durable:
+            _fsync_directory(state_file_path.parent)
+        logger.info(f"Estado guardado exitosamente. {len(ids)} puntos registrados.")
+        # El snapshot ya incluye todo lo del log incremental: vaciarlo
+        log_path = state_log_path(state_file_path)
+        if log_path.exists():
+            log_path.unlink()
         return True
 
     except Exception as e:
@@ -173,84 +1178,309 @@ def save_state(state_file_path: Path, current_state: Dict[str, Any]) -> bool:
 
 # --- Lógica de Comparación y Actualización de Estado ---
 
+def _hash_file_questions(
+    normalized_path: str,
+    questions: List[str],
+    algorithm: Optional[str]
+) -> Tuple[List[str], Optional[List[bytes]]]:
+    """Calcula los IDs y hashes de las preguntas de un archivo (solo los IDs si algorithm es None)."""
+    _gen = _generate_qa_uuid_prenormalized
+    point_ids = [_gen(question, normalized_path) for question in questions]
+    return point_ids, (generate_content_hashes_batch(questions, algorithm) if algorithm else None)
+
+def _hash_files_chunk(chunk: List[Tuple[str, List[str], Optional[str]]]) -> List[Tuple[List[str], Optional[List[bytes]]]]:
+    """Worker de proceso: aplica _hash_file_questions a un grupo de archivos."""
+    return [_hash_file_questions(normalized_path, questions, algorithm) for normalized_path, questions, algorithm in chunk]
+
+def _hash_files(
+    pending: List[Tuple[str, List[str], Optional[str]]],
+    max_workers: Optional[int] = None
+) -> List[Tuple[List[str], Optional[List[bytes]]]]:
+    """
+    Calcula IDs y hashes de varios archivos [(ruta_normalizada, preguntas,
+    algoritmo o None para solo IDs)], en el mismo orden. Con muchos Q&As
+    reparte el trabajo entre procesos (solo viajan las preguntas, no los
+    Q&A completos); si el pool falla, se calcula en serie.
+
+    Los archivos grandes se parten en tramos de preguntas (cada ID y hash
+    depende solo de su pregunta y de la ruta), así que la carga queda
+    equilibrada aunque haya pocos archivos o tamaños muy desiguales.
+    """
+    workers = max_workers or os.cpu_count() or 1
+    total_questions = sum(len(questions) for _, questions, _ in pending)
+    if workers > 1 and total_questions >= PARALLEL_DIFF_MIN_QAS:
+        # Unos PARALLEL_SLICES_PER_WORKER tramos por proceso: reparto round-robin sin colas largas
+        slice_size = -(-total_questions // (workers * PARALLEL_SLICES_PER_WORKER))
+        units: List[Tuple[str, List[str], Optional[str]]] = []
+        owners: List[int] = [] # Archivo (posición en pending) de cada tramo
+        for file_pos, (normalized_path, questions, algorithm) in enumerate(pending):
+            for start in range(0, len(questions), slice_size):
+                units.append((normalized_path, questions[start:start + slice_size], algorithm))
+                owners.append(file_pos)
+        workers = min(workers, len(units))
+        chunks = [units[i::workers] for i in range(workers)]
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunk_results = list(executor.map(_hash_files_chunk, chunks))
+            unit_results: List[Any] = [None] * len(units)
+            for i, chunk_result in enumerate(chunk_results):
+                unit_results[i::workers] = chunk_result
+            # Reensamblar los tramos de cada archivo en orden (los archivos vacíos no tienen tramos)
+            results: List[Tuple[List[str], Optional[List[bytes]]]] = [
+                ([], None if algorithm is None else []) for _, _, algorithm in pending
+            ]
+            for file_pos, (unit_ids, unit_hashes) in zip(owners, unit_results):
+                file_ids, file_hashes = results[file_pos]
+                file_ids.extend(unit_ids)
+                if file_hashes is not None:
+                    file_hashes.extend(unit_hashes)
+            logger.debug(f"IDs/hashes de {total_questions} Q&As calculados en {workers} procesos ({len(units)} tramos).")
+            return results
+        except Exception as e:
+            logger.warning(f"Fallo al calcular hashes en paralelo ({e}). Calculando en serie.")
+    return _hash_files_chunk(pending)
+
 def calculate_diff(
     current_qas_map: Dict[str, List[Dict]], # {rel_path -> [qa_dict]}
-    previous_indexed_points: Dict[str, Dict] # {point_id -> {details}}
-) -> Tuple[List[Dict], List[str], Dict[str, Dict]]:
+    previous_indexed_points: Mapping, # IndexedPoints o {point_id -> {details}}
+    max_workers: Optional[int] = None,
+    current_file_hashes: Optional[Mapping[str, bytes]] = None, # {rel_path -> hash de bytes}
+    current_file_stats: Optional[Mapping[str, Tuple[int, int]]] = None # {rel_path -> (tamaño, mtime_ns)}
+) -> Tuple[List[QAToProcess], List[str], IndexedPoints]:
     """
     Compara los Q&A actuales encontrados en los archivos fuente con el estado
     anteriormente indexado para determinar qué necesita ser procesado o eliminado.
 
     Args:
         current_qas_map: Diccionario mapeando ruta_relativa -> lista_de_Q&As_actuales.
-        previous_indexed_points: Diccionario 'indexed_points' del estado anterior.
+        previous_indexed_points: 'indexed_points' del estado anterior (IndexedPoints
+                                 o dict por filas).
+        max_workers: Procesos para calcular IDs/hashes si hay al menos
+                     PARALLEL_DIFF_MIN_QAS Q&As (None = número de CPUs, 1 = en serie).
+        current_file_hashes: Hash de los bytes de cada archivo (data_loader lo
+                             rellena). Un archivo con el mismo hash que en el
+                             estado previo se copia sin recorrer sus Q&As.
+        current_file_stats: (tamaño, mtime_ns) de cada archivo (data_loader lo
+                            rellena). Un archivo con el mismo que en el estado
+                            previo también se copia; data_loader ni lo lee
+                            (lo devuelve con una lista vacía) si se le pasan
+                            los del estado previo (ver IndexedPoints.file_stats).
 
     Returns:
         Una tupla:
-        - qas_to_process (List[Dict]): Lista de diccionarios Q&A (nuevos/modificados),
-                                       enriquecidos con '_id', '_question_hash', '_source_file'.
+        - qas_to_process (List[QAToProcess]): Q&As nuevos/modificados como tuplas
+                                              (point_id, question_hash, source_file, qa_item);
+                                              los dicts Q&A de entrada no se modifican.
         - ids_to_delete (List[str]): Lista de point_ids que ya no están en la fuente.
-        - current_points_details (Dict[str, Dict]): Mapa point_id -> detalles
-                                                   para TODOS los Q&A válidos actuales.
-                                                   (Formato: {'source_file': str, 'question_hash': str})
+        - current_points_details (IndexedPoints): Registro point_id -> detalles
+                                                 para TODOS los Q&A válidos actuales.
+                                                 (Detalles: PointDetail(source_file, question_hash))
     """
     logger.info("Calculando diferencias entre estado actual y anterior...")
-    qas_to_process: List[Dict] = []
-    current_points_details: Dict[str, Dict] = {} # Mapa id -> {source_file, question_hash}
-    current_point_ids: Set[str] = set() # Conjunto de IDs encontrados ahora
+    qas_to_process: List[QAToProcess] = []
+    current_points_details = IndexedPoints() # Registro id -> (source_file, question_hash)
 
     total_qas_evaluated = 0
 
-    # 1. Iterar sobre los Q&A actuales
+    # 1. Recolectar los Q&A actuales válidos (el hash se calcula luego en lote)
+    pending_files: List[Tuple[str, str, List[Tuple[Dict, str]]]] = [] # (ruta, ruta_normalizada, [(qa_item, pregunta)])
+
+    # Archivos sin cambios (mismo digest que en la ejecución anterior): se copian
+    # sus puntos del estado previo sin calcular IDs ni hashes por pregunta.
+    previous_is_columnar = isinstance(previous_indexed_points, IndexedPoints)
+    previous_file_digests = previous_indexed_points.file_digests if previous_is_columnar else {}
+
+    # Hashear con el mismo algoritmo que el estado previo para poder comparar;
+    # un estado nuevo (o un dict por filas) usa el algoritmo por defecto.
+    algorithm = DEFAULT_HASH_ALGORITHM
+    reuse_previous_hashes = True # Ver paso 2: solo si los hashes previos son del mismo algoritmo
+    if previous_is_columnar:
+        if previous_indexed_points.hash_algorithm in CONTENT_HASH_ALGORITHMS:
+            algorithm = previous_indexed_points.hash_algorithm
+        else:
+            logger.warning(f"El estado previo usa el algoritmo de hash '{previous_indexed_points.hash_algorithm}', no disponible (¿falta 'xxhash'?). Se usará '{algorithm}' y se reprocesarán todos los Q&As.")
+            previous_file_digests = {}
+            reuse_previous_hashes = False
+    current_points_details.hash_algorithm = algorithm
+    current_file_hashes = current_file_hashes or {}
+    current_file_stats = current_file_stats or {}
+    previous_file_hashes = previous_indexed_points.file_hashes if previous_is_columnar and reuse_previous_hashes else {}
+    previous_file_stats = previous_indexed_points.file_stats if previous_file_hashes else {}
+    previous_by_file: Optional[Dict[str, List[int]]] = None # Índice invertido, se construye solo si hace falta
+    unchanged_files = 0
+
     for file_rel_path, qa_list in current_qas_map.items():
+        file_rel_path = _intern(file_rel_path) # Compartido por todas sus filas y sus qa_item
         if not isinstance(qa_list, list): # Chequeo extra por si data_loader falla
              logger.warning(f"Se encontró un valor no esperado (no lista) para el archivo '{file_rel_path}' en current_qas_map. Saltando archivo.")
              continue
 
-        for qa_item in qa_list:
-            total_qas_evaluated += 1
-            question = qa_item.get('q')
-            if not question or not isinstance(question, str): # Saltar si falta pregunta o no es string
-                logger.warning(f"Q&A item sin pregunta 'q' válida en archivo {file_rel_path}. Saltando item: {str(qa_item)[:100]}...")
+        total_qas_evaluated += len(qa_list)
+        file_hash = current_file_hashes.get(file_rel_path)
+        file_stat = current_file_stats.get(file_rel_path)
+        if (file_hash is None and file_stat is not None and previous_file_stats.get(file_rel_path) == file_stat
+                and file_rel_path in previous_file_hashes and file_rel_path in previous_file_digests):
+            # Mismo tamaño y mtime que en la ejecución anterior: mismos bytes (no se leyó)
+            file_hash = previous_file_hashes[file_rel_path]
+        if file_hash is not None:
+            current_points_details.file_hashes[file_rel_path] = file_hash
+            if file_stat is not None:
+                current_points_details.file_stats[file_rel_path] = file_stat
+            # Bytes idénticos a la ejecución anterior: copiar sus puntos sin mirar los Q&As
+            if previous_file_hashes.get(file_rel_path) == file_hash and file_rel_path in previous_file_digests:
+                if previous_by_file is None:
+                    previous_by_file = previous_indexed_points.indices_by_file()
+                current_points_details.file_digests[file_rel_path] = previous_file_digests[file_rel_path]
+                current_points_details.copy_rows(previous_indexed_points, previous_by_file.get(file_rel_path, []))
+                unchanged_files += 1
+                continue
+
+        # Camino rápido: extraer todas las preguntas sin comprobaciones por elemento
+        # y validarlas en bloque; str.__len__ lanza TypeError si alguna no es str y
+        # devuelve 0 si está vacía. Solo si algo falla (raro) se filtra y registra uno a uno.
+        try:
+            questions = [qa_item['q'] for qa_item in qa_list]
+            all_valid = all(map(str.__len__, questions))
+        except (KeyError, TypeError):
+            all_valid = False
+        if all_valid:
+            file_items: List[Tuple[Dict, str]] = list(zip(qa_list, questions))
+        else:
+            file_items = [
+                (qa_item, question) for qa_item in qa_list
+                if isinstance(qa_item, dict) and (question := qa_item.get('q')) and isinstance(question, str)
+            ]
+            for qa_item in qa_list:
+                if not isinstance(qa_item, dict):
+                    logger.warning(f"Q&A item no es un diccionario en archivo {file_rel_path}. Saltando item: {str(qa_item)[:100]}...")
+                    continue
+                question = qa_item.get('q')
+                if not question or not isinstance(question, str): # Saltar si falta pregunta o no es string
+                    logger.warning(f"Q&A item sin pregunta 'q' válida en archivo {file_rel_path}. Saltando item: {str(qa_item)[:100]}...")
+
+        file_digest = _file_digest([question for _, question in file_items], algorithm)
+        current_points_details.file_digests[file_rel_path] = file_digest
+        if previous_file_digests.get(file_rel_path) == file_digest:
+            if previous_by_file is None:
+                previous_by_file = previous_indexed_points.indices_by_file()
+            if file_rel_path in previous_by_file or not file_items:
+                current_points_details.copy_rows(previous_indexed_points, previous_by_file.get(file_rel_path, []))
+                unchanged_files += 1
                 continue
 
-            point_id = generate_qa_uuid(question, file_rel_path)
-            q_hash = generate_content_hash(question)
-            current_point_ids.add(point_id)
+        # La ruta es la misma para todo el archivo: normalizarla una sola vez
+        pending_files.append((file_rel_path, file_rel_path.replace("\\", "/"), file_items))
+
+    # Ligado local: evita la búsqueda del atributo en cada iteración. Con
+    # IndexedPoints se lee el hash directamente de su buffer, sin crear dicts.
+    if isinstance(previous_indexed_points, IndexedPoints):
+        _prev_hash = previous_indexed_points.get_hash
+        previous_files = {source_file.replace("\\", "/") for source_file in previous_indexed_points.source_files()}
+    else:
+        _prev_get = previous_indexed_points.get
+        def _prev_hash(pid: str) -> Optional[bytes]:
+            detail = _as_point_detail(_prev_get(pid))
+            return detail.question_hash if detail else None
+        previous_files = set()
+        for details in previous_indexed_points.values():
+            detail = _as_point_detail(details)
+            if detail is not None and isinstance(detail.source_file, str):
+                previous_files.add(detail.source_file.replace("\\", "/"))
+
+    # 2. Calcular IDs y hashes de los archivos pendientes (en lote, o en paralelo si son muchos).
+    # El ID se deriva de la pregunta, así que un ID ya presente en el estado previo
+    # implica la misma pregunta y el mismo hash: en archivos ya conocidos solo se
+    # calculan los IDs y el hash se reutiliza del estado previo (memoización entre
+    # ejecuciones); solo se hashean las preguntas con ID nuevo.
+    file_results = _hash_files(
+        [(normalized_path, [question for _, question in file_items],
+          None if reuse_previous_hashes and normalized_path in previous_files else algorithm)
+         for _, normalized_path, file_items in pending_files],
+        max_workers
+    )
+
+    n_new = n_changed = n_unchanged = 0
+    _append_to_process = qas_to_process.append # Ligado local para el bucle por elemento
+    for (file_rel_path, normalized_path, file_items), (file_ids, file_hashes) in zip(pending_files, file_results):
+        previous_missing: Optional[List[Optional[bytes]]] = None # Hash previo de cada posición en missing
+        joined_hashes: Optional[bytearray] = None
+        if file_hashes is None: # Archivo conocido: reutilizar hashes previos, calcular el resto
+            if previous_is_columnar and np is not None and len(file_ids) >= NUMPY_GATHER_MIN_POINTS:
+                # Todos los hashes previos de una vez, sin un objeto bytes por punto;
+                # file_hashes solo guarda los recalculados ({posición: hash})
+                joined_hashes, missing, previous_missing = previous_indexed_points.gather_hashes(file_ids)
+                file_hashes = {}
+            else:
+                file_hashes = [_prev_hash(point_id) for point_id in file_ids]
+                missing = [i for i, q_hash in enumerate(file_hashes)
+                           if not isinstance(q_hash, bytes) or len(q_hash) != CONTENT_HASH_SIZE or q_hash == _NULL_HASH]
+                previous_missing = [file_hashes[i] for i in missing]
+            if missing:
+                computed = generate_content_hashes_batch([file_items[i][1] for i in missing], algorithm)
+                for i, q_hash in zip(missing, computed):
+                    file_hashes[i] = q_hash
+                    if joined_hashes is not None:
+                        joined_hashes[i * CONTENT_HASH_SIZE:(i + 1) * CONTENT_HASH_SIZE] = q_hash
+
+        # Guardar detalles actuales en bloque por archivo
+        if joined_hashes is not None:
+            current_points_details.extend_joined(file_ids, file_rel_path, joined_hashes)
+        else:
+            current_points_details.extend(file_ids, file_rel_path, file_hashes)
+
+        # Filtro rápido: el ID depende de la ruta, así que si el estado previo no
+        # tenía ningún punto de este archivo todos sus Q&As son nuevos (sin buscar uno a uno)
+        if normalized_path not in previous_files:
+            logger.debug(f"Archivo nuevo: {file_rel_path} ({len(file_items)} Q&As nuevos)")
+            n_new += len(file_items)
+            qas_to_process.extend(QAToProcess(point_id, q_hash, file_rel_path, qa_item)
+                                  for (qa_item, _), q_hash, point_id in zip(file_items, file_hashes, file_ids))
+            continue
 
-            # Guardar detalles actuales
-            current_points_details[point_id] = {
-                "source_file": file_rel_path,
-                "question_hash": q_hash
-            }
+        # Una sola búsqueda en el estado previo por punto: si ya se hizo al reutilizar
+        # hashes, los reutilizados son por construcción iguales (sin cambios) y solo
+        # quedan por clasificar los recalculados.
+        if previous_missing is not None:
+            n_unchanged += len(file_ids) - len(missing)
+            candidates: Iterator[Tuple[int, Optional[bytes]]] = zip(missing, previous_missing)
+        else:
+            candidates = ((i, _prev_hash(point_id)) for i, point_id in enumerate(file_ids))
 
+        for i, previous_hash in candidates:
             # Comparar con estado previo
-            previous_entry = previous_indexed_points.get(point_id)
-            if not previous_entry:
-                # Es nuevo
-                logger.debug(f"Nuevo Q&A: ID={point_id}, Archivo={file_rel_path}")
-                # Enriquecer el dict original con info necesaria para procesamiento
-                qa_item['_id'] = point_id
-                qa_item['_question_hash'] = q_hash
-                qa_item['_source_file'] = file_rel_path
-                qas_to_process.append(qa_item)
-            elif previous_entry.get('question_hash') != q_hash:
-                # Ha cambiado
-                logger.info(f"Q&A Modificado detectado: ID={point_id}, Archivo={file_rel_path} (Hash anterior: {previous_entry.get('question_hash', 'N/A')[:8]}... vs Nuevo: {q_hash[:8]}...)")
-                qa_item['_id'] = point_id
-                qa_item['_question_hash'] = q_hash
-                qa_item['_source_file'] = file_rel_path
-                qas_to_process.append(qa_item)
+            # (sin logs por elemento: solo contadores, resumidos al final)
+            qa_item, q_hash, point_id = file_items[i][0], file_hashes[i], file_ids[i]
+            if previous_hash is None:
+                # Es nuevo. Tupla aparte en vez de añadir claves al dict original (evita redimensionarlo)
+                n_new += 1
+                _append_to_process(QAToProcess(point_id, q_hash, file_rel_path, qa_item))
+            elif previous_hash != q_hash:
+                # Ha cambiado (poco frecuente: se registra cada uno)
+                n_changed += 1
+                previous_hex = previous_hash.hex()[:8] if isinstance(previous_hash, bytes) else str(previous_hash)[:8]
+                logger.info(f"Q&A Modificado detectado: ID={point_id}, Archivo={file_rel_path} (Hash anterior: {previous_hex}... vs Nuevo: {q_hash.hex()[:8]}...)")
+                _append_to_process(QAToProcess(point_id, q_hash, file_rel_path, qa_item))
             else:
-                # Sin cambios
-                logger.debug(f"Q&A sin cambios: ID={point_id}, Archivo={file_rel_path}")
-                pass # No añadir a qas_to_process
+                # Sin cambios: no añadir a qas_to_process
+                n_unchanged += 1
 
-    # 2. Identificar IDs a eliminar
-    previous_ids = set(previous_indexed_points.keys())
-    ids_to_delete = list(previous_ids - current_point_ids)
+    # 3. Identificar IDs a eliminar
+    # Con IndexedPoints: diferencia de las vistas de claves de ambos índices (un
+    # bucle en C) y se ordenan solo los eliminados por su posición en el estado
+    # previo, para que el resultado sea determinista. Con un dict por filas, la
+    # misma diferencia de vistas y, solo si hay eliminados, una pasada sobre el
+    # estado previo para conservar su orden.
+    current_index = current_points_details._index
+    if previous_is_columnar:
+        previous_index = previous_indexed_points._index
+        ids_to_delete = sorted(previous_index.keys() - current_index.keys(), key=previous_index.__getitem__)
+    else:
+        previous_keys = previous_indexed_points.keys()
+        removed = previous_keys - current_index.keys()
+        ids_to_delete = [pid for pid in previous_keys if pid in removed] if removed else []
 
-    logger.info(f"Evaluados {total_qas_evaluated} Q&As actuales.")
+    logger.info(f"Evaluados {total_qas_evaluated} Q&As actuales ({unchanged_files} archivos sin cambios copiados del estado anterior).")
+    logger.debug(f"Q&As en archivos recalculados: {n_new} nuevos, {n_changed} modificados, {n_unchanged} sin cambios.")
     logger.info(f"Diff calculado: {len(qas_to_process)} a procesar (nuevos/modificados), {len(ids_to_delete)} a eliminar.")
 
     return qas_to_process, ids_to_delete, current_points_details
@@ -270,7 +1500,7 @@ if __name__ == "__main__":
     h1 = generate_content_hash(q1)
     print(f"Pregunta: '{q1}' en '{f1}'")
     print(f"  ID UUIDv5: {id1}")
-    print(f"  Hash SHA256: {h1[:12]}...")
+    print(f"  Hash SHA256/128: {h1.hex()[:12]}...")
 
     q2 = "¿Cómo funciona?" # Misma pregunta
     f2 = "docs/manual.json" # Diferente archivo
@@ -278,7 +1508,7 @@ if __name__ == "__main__":
     h2 = generate_content_hash(q2)
     print(f"Pregunta: '{q2}' en '{f2}'")
     print(f"  ID UUIDv5: {id2}") # ID debe ser diferente de id1
-    print(f"  Hash SHA256: {h2[:12]}...") # Hash debe ser igual a h1
+    print(f"  Hash SHA256/128: {h2.hex()[:12]}...") # Hash debe ser igual a h1
     assert id1 != id2
     assert h1 == h2
 
@@ -288,7 +1518,7 @@ if __name__ == "__main__":
     h3 = generate_content_hash(q3)
     print(f"Pregunta: '{q3}' en '{f3}'")
     print(f"  ID UUIDv5: {id3}") # ID debe ser diferente de id1 e id2
-    print(f"  Hash SHA256: {h3[:12]}...") # Hash debe ser diferente de h1/h2
+    print(f"  Hash SHA256/128: {h3.hex()[:12]}...") # Hash debe ser diferente de h1/h2
     assert id3 != id1 and id3 != id2
     assert h3 != h1
 
@@ -323,7 +1553,7 @@ if __name__ == "__main__":
     assert loaded_s["version"] == STATE_FILE_VERSION
     assert loaded_s["last_run_utc"] is not None
     assert id1 in loaded_s["indexed_points"]
-    assert loaded_s["indexed_points"][id1]["question_hash"] == h1
+    assert loaded_s["indexed_points"][id1].question_hash == h1
     assert len(loaded_s["indexed_points"]) == 2
 
     # Prueba de diff
@@ -348,7 +1578,7 @@ if __name__ == "__main__":
 
     upsert_list, delete_list, current_details_map = calculate_diff(current_data_map, prev_points_dict)
 
-    print(f"  Q&As a procesar (upsert): {len(upsert_list)} -> {[item['_id'][:8] for item in upsert_list]}")
+    print(f"  Q&As a procesar (upsert): {len(upsert_list)} -> {[item.point_id[:8] for item in upsert_list]}")
     print(f"  IDs a eliminar: {len(delete_list)} -> {[pid[:8] for pid in delete_list]}")
     print(f"  Detalles actuales: {len(current_details_map)} puntos")
 
@@ -358,7 +1588,7 @@ if __name__ == "__main__":
     id4_current = generate_qa_uuid(q4, f4) # Mismo que id4
 
     # Verificar upsert: deben estar q3 y q4
-    upsert_ids_set = {item['_id'] for item in upsert_list}
+    upsert_ids_set = {item.point_id for item in upsert_list}
     assert id3_current in upsert_ids_set
     assert id4_current in upsert_ids_set
     assert id1_current not in upsert_ids_set # q1 no cambió
@@ -372,8 +1602,8 @@ if __name__ == "__main__":
     assert id3_current in current_details_map
     assert id4_current in current_details_map
     assert len(current_details_map) == 3
-    assert current_details_map[id1_current]['question_hash'] == h1
-    assert current_details_map[id3_current]['question_hash'] == h3
+    assert current_details_map[id1_current].question_hash == h1
+    assert current_details_map[id3_current].question_hash == h3
 
     print("\nPruebas básicas de state_manager completadas.")
     # Limpieza opcional
@@ -5,28 +5,79 @@
 Módulo para dividir textos largos (específicamente las respuestas 'a')
 en fragmentos (chunks) más pequeños con posible solapamiento.
 
-Utiliza RecursiveCharacterTextSplitter de langchain_text_splitters.
+Utiliza RecursiveCharacterTextSplitter de langchain_text_splitters, que se
+importa la primera vez que se crea un chunker (ver _splitter_class).
 """
 
+from __future__ import annotations
+
 import logging
+import operator
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 # CORRECCIÓN: Añadir Dict y Tuple a las importaciones de typing
-from typing import List, Optional, Any, Dict, Tuple
+from typing import List, Optional, Any, Dict, Tuple, Callable, Iterator, TYPE_CHECKING
 from functools import lru_cache
 
-# Importar dependencia de Langchain
-try:
+if TYPE_CHECKING: # Solo para las anotaciones; en ejecución se importa bajo demanda
     from langchain_text_splitters import RecursiveCharacterTextSplitter
-except ImportError:
-    print("[ERROR CRÍTICO] Librería 'langchain-text-splitters' no instalada. Ejecuta: pip install langchain-text-splitters")
-    RecursiveCharacterTextSplitter = None # type: ignore
+
+try:
+    import numpy as np
+except ImportError: # Opcional aquí: sin numpy se agrupan las piezas en Python
+    np = None # type: ignore
 
 logger = logging.getLogger(__name__)
 
-# Caché para reutilizar instancias de chunker con la misma configuración
-# CORRECCIÓN: Añadir tipo correcto al caché
-_chunker_cache: Dict[Tuple[int, int], RecursiveCharacterTextSplitter] = {}
+# Clase RecursiveCharacterTextSplitter una vez importada (None: aún no se intentó;
+# False: no está instalada). Importar Langchain arrastra muchos módulos, así que
+# se difiere hasta que haga falta un chunker en vez de pagarlo al importar este módulo.
+_RCTS: Any = None
+
+def _splitter_class() -> Any:
+    """Devuelve RecursiveCharacterTextSplitter, importándolo la primera vez (None si no está instalado)."""
+    global _RCTS
+    if _RCTS is None:
+        try:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter as splitter_class
+            _RCTS = splitter_class
+        except ImportError:
+            print("[ERROR CRÍTICO] Librería 'langchain-text-splitters' no instalada. Ejecuta: pip install langchain-text-splitters")
+            _RCTS = False
+    return _RCTS or None
+
+# Separadores por defecto de RecursiveCharacterTextSplitter (los que usa get_answer_chunker)
+_DEFAULT_SEPARATORS = ("\n\n", "\n", " ", "")
+
+# Por debajo de este número de textos chunk_texts_parallel divide en serie
+# (arrancar procesos y serializar los textos costaría más que dividirlos).
+PARALLEL_CHUNK_MIN_TEXTS = 256
+# Textos por tarea enviada a cada proceso
+PARALLEL_CHUNK_SHARD_SIZE = 256
+# A partir de cuántas piezas se agrupan en ventanas con numpy (cumsum/searchsorted)
+# en vez de pieza a pieza; por debajo, el coste de crear los arrays no compensa.
+NUMPY_MERGE_MIN_PIECES = 512
+
+# Espacios/tabulaciones repetidos y saltos de línea de más (restos típicos de
+# convertir HTML a texto), colapsados por normalize_text_whitespace.
+_WS_SPACES = re.compile(r"[ \t]{2,}")
+_WS_NL = re.compile(r"\n{3,}")
+
+def _as_int(value: Any) -> Optional[int]:
+    """
+    Convierte a int un valor entero de cualquier tipo numérico (int, enteros
+    de numpy, floats sin decimales como 1000.0). None si no es entero.
+    """
+    if isinstance(value, bool):
+        return None
+    try:
+        return operator.index(value)
+    except TypeError:
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        return None
 
-@lru_cache(maxsize=4) # Usar lru_cache es generalmente más simple y eficiente que el dict manual
 def get_answer_chunker(
     chunk_size: int = 1000,
     chunk_overlap: int = 150
@@ -34,6 +85,10 @@ def get_answer_chunker(
     """
     Obtiene una instancia configurada de RecursiveCharacterTextSplitter usando caché.
 
+    Los argumentos se validan y se normalizan a int antes de consultar la
+    caché, así que 1000, 1000.0, numpy.int64(1000) o pasarlos por nombre o
+    por posición devuelven la misma instancia.
+
     Args:
         chunk_size: Tamaño máximo de cada fragmento (en caracteres).
         chunk_overlap: Número de caracteres de solapamiento entre fragmentos.
@@ -42,25 +97,31 @@ def get_answer_chunker(
         Una instancia de RecursiveCharacterTextSplitter o None si la librería
         no está disponible o hay un error de configuración.
     """
-    if RecursiveCharacterTextSplitter is None:
-        logger.critical("Dependencia 'langchain-text-splitters' no disponible.")
+    size, overlap = _as_int(chunk_size), _as_int(chunk_overlap)
+    if size is None or size <= 0:
+        logger.error("Configuración inválida: chunk_size (%s) debe ser un entero positivo.", chunk_size)
         return None
-
-    if not isinstance(chunk_size, int) or chunk_size <= 0:
-        logger.error(f"Configuración inválida: chunk_size ({chunk_size}) debe ser un entero positivo.")
-        return None
-    if not isinstance(chunk_overlap, int) or chunk_overlap < 0:
-         logger.error(f"Configuración inválida: chunk_overlap ({chunk_overlap}) debe ser un entero no negativo.")
+    if overlap is None or overlap < 0:
+         logger.error("Configuración inválida: chunk_overlap (%s) debe ser un entero no negativo.", chunk_overlap)
          return None
-    if chunk_overlap >= chunk_size:
-        logger.error(f"Configuración inválida: chunk_overlap ({chunk_overlap}) debe ser menor que chunk_size ({chunk_size}).")
+    if overlap >= size:
+        logger.error("Configuración inválida: chunk_overlap (%s) debe ser menor que chunk_size (%s).", overlap, size)
+        return None
+    return _get_answer_chunker_cached(size, overlap)
+
+@lru_cache(maxsize=4) # Usar lru_cache es generalmente más simple y eficiente que el dict manual
+def _get_answer_chunker_cached(chunk_size: int, chunk_overlap: int) -> Optional[RecursiveCharacterTextSplitter]:
+    """Crea el chunker para una configuración ya validada (ver get_answer_chunker)."""
+    splitter_class = _splitter_class()
+    if splitter_class is None:
+        logger.critical("Dependencia 'langchain-text-splitters' no disponible.")
         return None
 
     # lru_cache maneja el cacheo basado en los argumentos de la función
-    logger.info(f"Obteniendo/Creando instancia de RecursiveCharacterTextSplitter (size={chunk_size}, overlap={chunk_overlap})...")
+    logger.info("Obteniendo/Creando instancia de RecursiveCharacterTextSplitter (size=%s, overlap=%s)...", chunk_size, chunk_overlap)
     try:
         # Usar separadores por defecto de Langchain: ["\n\n", "\n", " ", ""]
-        chunker = RecursiveCharacterTextSplitter(
+        chunker = splitter_class(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             length_function=len,
@@ -68,19 +129,372 @@ def get_answer_chunker(
         )
         # CORRECCIÓN: Verificar el tipo devuelto por si acaso (aunque debería ser correcto)
         # y para satisfacer a mypy si lru_cache ofusca el tipo.
-        if isinstance(chunker, RecursiveCharacterTextSplitter):
+        if isinstance(chunker, splitter_class):
              logger.debug("Instancia de chunker obtenida/creada.")
              return chunker
         else:
              logger.error("La creación de RecursiveCharacterTextSplitter devolvió un tipo inesperado.")
              return None
     except Exception as e:
-        logger.exception(f"Error inesperado al crear RecursiveCharacterTextSplitter: {e}")
+        logger.exception("Error inesperado al crear RecursiveCharacterTextSplitter: %s", e)
+        return None
+
+def _merge_windows(lengths: List[int], chunk_size: int, chunk_overlap: int) -> Iterator[Tuple[int, int]]:
+    """
+    Ventanas (primera, última + 1) de piezas que agrupa _iter_merge_splits,
+    calculadas sobre las sumas acumuladas de las longitudes: el fin de cada
+    ventana y el inicio de la siguiente (retrocediendo hasta `chunk_overlap`)
+    se buscan con searchsorted, sin recorrer las piezas una a una. Requiere
+    numpy y piezas no vacías, de menos de `chunk_size` cada una.
+    """
+    n = len(lengths)
+    prefix = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(lengths, out=prefix[1:])
+    bounds = prefix.tolist()
+    start = 0
+    # Primera pieza que ya no cabe en la ventana que empieza en `start`
+    i = int(np.searchsorted(prefix, chunk_size, side='right')) - 1
+    while i < n:
+        if start < i:
+            yield start, i
+            # Descartar del inicio mientras lo acumulado supere el solapamiento
+            # o la pieza i no quepa detrás (mismo criterio que _iter_merge_splits)
+            threshold = max(bounds[i] - chunk_overlap, min(bounds[i + 1] - chunk_size, bounds[i]))
+            start = max(start, int(np.searchsorted(prefix, threshold, side='left')))
+        i = max(int(np.searchsorted(prefix, bounds[start] + chunk_size, side='right')) - 1, i + 1)
+    if start < n:
+        yield start, n
+
+def _iter_merge_splits(splits: List[str], chunk_size: int, chunk_overlap: int, strip: bool) -> Iterator[str]:
+    """
+    Equivalente a TextSplitter._merge_splits con length_function=len y
+    separadores conservados (se une con ""), sin llamadas a métodos por pieza
+    y descartando piezas del inicio con un índice en vez de recortar la lista.
+    Genera cada chunk en cuanto está completo. Con muchas piezas (y numpy)
+    las ventanas se calculan con _merge_windows.
+    """
+    if np is not None and len(splits) >= NUMPY_MERGE_MIN_PIECES:
+        for first, last in _merge_windows(list(map(len, splits)), chunk_size, chunk_overlap):
+            doc = "".join(splits[first:last])
+            if strip:
+                doc = doc.strip()
+            if doc:
+                yield doc
+        return
+    current: List[str] = []
+    start = 0 # Primer elemento vigente de `current`
+    total = 0
+    for piece in splits:
+        piece_len = len(piece)
+        if total + piece_len > chunk_size:
+            if total > chunk_size:
+                logger.warning("Se creó un chunk de tamaño %d, mayor que el especificado %d", total, chunk_size)
+            if start < len(current):
+                doc = "".join(current[start:])
+                if strip:
+                    doc = doc.strip()
+                if doc:
+                    yield doc
+                while total > chunk_overlap or (total + piece_len > chunk_size and total > 0):
+                    total -= len(current[start])
+                    start += 1
+        current.append(piece)
+        total += piece_len
+    doc = "".join(current[start:])
+    if strip:
+        doc = doc.strip()
+    if doc:
+        yield doc
+
+def _iter_split_text(text: str, separators: Tuple[str, ...], chunk_size: int, chunk_overlap: int, strip: bool) -> Iterator[str]:
+    """
+    Equivalente a RecursiveCharacterTextSplitter._split_text para separadores
+    literales conservados al inicio de cada pieza (keep_separator=True), pero
+    buscando y dividiendo con `in`/str.split (en C) en lugar de re.search/re.split.
+    Genera los chunks en orden, sin acumularlos.
+    """
+    separator = separators[-1]
+    remaining: Tuple[str, ...] = ()
+    for i, candidate in enumerate(separators):
+        if not candidate:
+            separator = candidate
+            break
+        if candidate in text:
+            separator = candidate
+            remaining = separators[i + 1:]
+            break
+
+    if separator:
+        parts = text.split(separator)
+        splits = [separator + part for part in parts[1:]] # El separador va al inicio de cada pieza
+        if parts[0]:
+            splits.insert(0, parts[0])
+    else:
+        splits = list(text)
+
+    good_splits: List[str] = []
+    for piece in splits:
+        if len(piece) < chunk_size:
+            good_splits.append(piece)
+            continue
+        if good_splits:
+            yield from _iter_merge_splits(good_splits, chunk_size, chunk_overlap, strip)
+            good_splits = []
+        if not remaining:
+            yield piece
+        else:
+            yield from _iter_split_text(piece, remaining, chunk_size, chunk_overlap, strip)
+    if good_splits:
+        yield from _iter_merge_splits(good_splits, chunk_size, chunk_overlap, strip)
+
+def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    """Equivalente a text[start:end].strip() pero devolviendo los límites, sin copiar."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+def _iter_merge_spans(text: str, pieces: List[Tuple[int, int]], chunk_size: int, chunk_overlap: int, strip: bool) -> Iterator[Tuple[int, int]]:
+    """
+    Como _iter_merge_splits, pero sobre piezas dadas como (inicio, fin) en
+    `text`. Las piezas que se unen son contiguas, así que cada chunk es el
+    tramo entre el inicio de la primera y el fin de la última.
+    """
+    if np is not None and len(pieces) >= NUMPY_MERGE_MIN_PIECES:
+        for first, last in _merge_windows([end - begin for begin, end in pieces], chunk_size, chunk_overlap):
+            span = _strip_span(text, pieces[first][0], pieces[last - 1][1]) if strip else (pieces[first][0], pieces[last - 1][1])
+            if span[0] < span[1]:
+                yield span
+        return
+    start = 0 # Primera pieza vigente
+    total = 0
+    for i, (piece_start, piece_end) in enumerate(pieces):
+        piece_len = piece_end - piece_start
+        if total + piece_len > chunk_size:
+            if total > chunk_size:
+                logger.warning("Se creó un chunk de tamaño %d, mayor que el especificado %d", total, chunk_size)
+            if start < i:
+                span = _strip_span(text, pieces[start][0], pieces[i - 1][1]) if strip else (pieces[start][0], pieces[i - 1][1])
+                if span[0] < span[1]:
+                    yield span
+                while total > chunk_overlap or (total + piece_len > chunk_size and total > 0):
+                    total -= pieces[start][1] - pieces[start][0]
+                    start += 1
+        total += piece_len
+    if start < len(pieces):
+        span = _strip_span(text, pieces[start][0], pieces[-1][1]) if strip else (pieces[start][0], pieces[-1][1])
+        if span[0] < span[1]:
+            yield span
+
+def _iter_split_spans(text: str, begin: int, end: int, separators: Tuple[str, ...], chunk_size: int, chunk_overlap: int, strip: bool) -> Iterator[Tuple[int, int]]:
+    """
+    Como _iter_split_text sobre text[begin:end], pero produciendo los chunks
+    como (inicio, fin) en `text`: las piezas se localizan con str.find y nunca
+    se copian.
+    """
+    separator = separators[-1]
+    remaining: Tuple[str, ...] = ()
+    for i, candidate in enumerate(separators):
+        if not candidate:
+            separator = candidate
+            break
+        if text.find(candidate, begin, end) >= 0:
+            separator = candidate
+            remaining = separators[i + 1:]
+            break
+
+    pieces: List[Tuple[int, int]] = []
+    if separator:
+        # El separador va al inicio de cada pieza; una primera pieza vacía se descarta
+        piece_start = begin
+        found = text.find(separator, begin, end)
+        while found >= 0:
+            if found > piece_start:
+                pieces.append((piece_start, found))
+            piece_start = found
+            found = text.find(separator, found + len(separator), end)
+        pieces.append((piece_start, end))
+    else:
+        pieces = [(i, i + 1) for i in range(begin, end)]
+
+    good: List[Tuple[int, int]] = []
+    for piece_start, piece_end in pieces:
+        if piece_end - piece_start < chunk_size:
+            good.append((piece_start, piece_end))
+            continue
+        if good:
+            yield from _iter_merge_spans(text, good, chunk_size, chunk_overlap, strip)
+            good = []
+        if not remaining:
+            yield piece_start, piece_end
+        else:
+            yield from _iter_split_spans(text, piece_start, piece_end, remaining, chunk_size, chunk_overlap, strip)
+    if good:
+        yield from _iter_merge_spans(text, good, chunk_size, chunk_overlap, strip)
+
+def _is_standard_chunker(chunker: RecursiveCharacterTextSplitter) -> bool:
+    """
+    True si el chunker usa la configuración estándar (separadores por defecto
+    no regex, separador al inicio, medida con len()) que reproducen las
+    divisiones propias de este módulo.
+    """
+    return (type(chunker) is _splitter_class()
+            and tuple(getattr(chunker, '_separators', ())) == _DEFAULT_SEPARATORS
+            and not getattr(chunker, '_is_separator_regex', True)
+            and getattr(chunker, '_keep_separator', None) in (True, "start")
+            and getattr(chunker, '_length_function', None) is len)
+
+@lru_cache(maxsize=8) # Una entrada por chunker (get_answer_chunker ya los reutiliza)
+def _fast_iter_splitter(chunker: RecursiveCharacterTextSplitter) -> Optional[Callable[[str], Iterator[str]]]:
+    """
+    Devuelve un generador de chunks equivalente a chunker.split_text pero sin
+    regex ni despacho de métodos por pieza, o None si la configuración del
+    chunker no es la estándar (separadores por defecto no regex, separador al
+    inicio, medida con len()). En ese caso se usa split_text de Langchain.
+    """
+    if not _is_standard_chunker(chunker):
+        return None
+    chunk_size, chunk_overlap = chunker._chunk_size, chunker._chunk_overlap
+    strip = getattr(chunker, '_strip_whitespace', True)
+    return lambda text: _iter_split_text(text, _DEFAULT_SEPARATORS, chunk_size, chunk_overlap, strip)
+
+@lru_cache(maxsize=8)
+def _fast_span_splitter(chunker: RecursiveCharacterTextSplitter) -> Optional[Callable[[str], List[Tuple[int, int]]]]:
+    """Como _fast_iter_splitter, pero devolviendo los chunks como (inicio, fin) en el texto."""
+    if not _is_standard_chunker(chunker):
+        return None
+    chunk_size, chunk_overlap = chunker._chunk_size, chunker._chunk_overlap
+    strip = getattr(chunker, '_strip_whitespace', True)
+    return lambda text: list(_iter_split_spans(text, 0, len(text), _DEFAULT_SEPARATORS, chunk_size, chunk_overlap, strip))
+
+@lru_cache(maxsize=8)
+def _fast_splitter(chunker: RecursiveCharacterTextSplitter) -> Optional[Callable[[str], List[str]]]:
+    """Como _fast_iter_splitter, pero devolviendo la lista completa (como split_text)."""
+    iter_split = _fast_iter_splitter(chunker)
+    if iter_split is None:
         return None
+    return lambda text: list(iter_split(text))
+
+@lru_cache(maxsize=32) # Pocas entradas: cada una retiene el texto completo y sus chunks
+def _split_cached(chunker: RecursiveCharacterTextSplitter, text: str) -> Tuple[str, ...]:
+    """
+    Divide un texto largo memorizando el resultado por (chunker, texto): una
+    respuesta repetida en llamadas seguidas (plantillas) no se vuelve a
+    dividir. El límite es pequeño a propósito: la mayoría de respuestas
+    aparecen una sola vez y el indexador usa chunk_texts, que ya divide una
+    sola vez los textos repetidos de cada lote sin retener nada entre
+    ejecuciones. Se guarda como tupla para que nadie pueda modificar el
+    resultado cacheado. La clave usa el propio chunker (no su id(), que
+    podría reutilizarse tras liberarlo).
+    """
+    return tuple(get_split_function(chunker)(text))
+
+def _short_text_limit(chunker: RecursiveCharacterTextSplitter) -> int:
+    """
+    Longitud máxima de un texto que cabe entero en un chunk y puede devolverse
+    sin pasar por split_text (-1 si el chunker no mide con len()).
+
+    Para esos textos Langchain recorre igualmente toda la cascada de
+    separadores y acaba devolviendo el texto completo (sin espacios en los
+    extremos si strip_whitespace está activo, o nada si queda vacío).
+    """
+    if getattr(chunker, '_length_function', None) is not len:
+        return -1
+    return chunker._chunk_size
+
+def _short_text_chunks(chunker: RecursiveCharacterTextSplitter, text: str) -> List[str]:
+    """Resultado de split_text para un texto que cabe en un chunk, sin dividirlo."""
+    if getattr(chunker, '_strip_whitespace', True):
+        text = text.strip()
+    return [text] if text else []
+
+@lru_cache(maxsize=8) # Una entrada por chunker (get_answer_chunker ya los reutiliza)
+def get_split_function(chunker: RecursiveCharacterTextSplitter) -> Callable[[str], List[str]]:
+    """
+    Resuelve una sola vez la función de división de un chunker: el camino
+    rápido para textos cortos más la división propia (o split_text de
+    Langchain si la configuración no es la estándar). Pensada para bucles
+    sobre muchos textos junto con chunk_text_fast, sin buscar atributos ni
+    revalidar el chunker en cada iteración.
+    """
+    split_long = _fast_splitter(chunker) or chunker.split_text
+    limit = _short_text_limit(chunker)
+    strip = getattr(chunker, '_strip_whitespace', True)
+
+    def split(text: str) -> List[str]:
+        if len(text) > limit:
+            return split_long(text)
+        if strip:
+            text = text.strip()
+        return [text] if text else []
+    return split
+
+def chunk_text_fast(split_fn: Callable[[str], List[str]], text: Optional[str]) -> List[str]:
+    """
+    Divide un texto con una función ya resuelta por get_split_function, sin
+    validaciones, logs ni captura de errores (a diferencia de chunk_text).
+    """
+    return split_fn(text) if text else []
+
+def _locate_chunks(text: str, chunks: List[str]) -> Optional[List[Tuple[int, int]]]:
+    """
+    Localiza cada chunk en el texto original, en orden (cada uno empieza
+    después del inicio del anterior), y devuelve sus (inicio, fin). None si
+    alguno no aparece tal cual en el texto.
+    """
+    spans: List[Tuple[int, int]] = []
+    cursor = 0
+    for chunk in chunks:
+        start = text.find(chunk, cursor)
+        if start < 0:
+            return None
+        spans.append((start, start + len(chunk)))
+        cursor = start + 1
+    return spans
+
+def merge_small_chunks(text: str, chunks: List[str], min_chunk_size: int, max_size: int) -> List[str]:
+    """
+    Une los chunks de menos de `min_chunk_size` caracteres con su vecino
+    (el anterior, o el siguiente si es el primero) mientras el resultado no
+    supere `max_size`, para no generar fragmentos sin contexto.
+
+    Cada chunk es un tramo del texto original (con solapamiento entre
+    vecinos), así que la unión se toma del propio texto entre el inicio del
+    primero y el fin del segundo: el solapamiento no se duplica. Si algún chunk
+    no se localiza en el texto, se devuelven sin cambios.
+    """
+    if min_chunk_size <= 0 or len(chunks) < 2:
+        return chunks
+    spans = _locate_chunks(text, chunks)
+    if spans is None:
+        return chunks
+    merged: List[List[int]] = [list(spans[0])]
+    for start, end in spans[1:]:
+        previous = merged[-1]
+        small = end - start < min_chunk_size or previous[1] - previous[0] < min_chunk_size
+        if small and end - previous[0] <= max_size:
+            previous[1] = end # Unir con el anterior (o absorber un primero demasiado pequeño)
+        else:
+            merged.append([start, end])
+    if len(merged) == len(spans):
+        return chunks
+    return [text[start:end] for start, end in merged]
+
+def normalize_text_whitespace(text: str) -> str:
+    """
+    Colapsa las series de espacios/tabulaciones en un espacio y las de tres o
+    más saltos de línea en un párrafo ("\\n\\n"). Los separadores que usa el
+    splitter se conservan, pero el texto (y el número de chunks) se reduce en
+    proporción al espacio en blanco sobrante.
+    """
+    return _WS_NL.sub("\n\n", _WS_SPACES.sub(" ", text))
 
 def chunk_text(
     chunker: Optional[RecursiveCharacterTextSplitter],
-    text: Optional[str]
+    text: Optional[str],
+    min_chunk_size: int = 0,
+    normalize_whitespace: bool = False
 ) -> List[str]:
     """
     Divide un texto dado en fragmentos usando un TextSplitter configurado.
@@ -89,30 +503,235 @@ def chunk_text(
     devolverá una lista con el texto original como único elemento.
 
     Args:
-        chunker: La instancia de RecursiveCharacterTextSplitter a usar.
+        chunker: La instancia de RecursiveCharacterTextSplitter a usar (la que
+                 devuelve get_answer_chunker). No se comprueba su tipo en cada
+                 llamada: un objeto de otro tipo falla dentro del try y
+                 devuelve una lista vacía, como cualquier otro error.
         text: El texto a dividir.
+        min_chunk_size: Si es mayor que 0, los chunks más cortos se unen con
+                        un vecino sin superar chunk_size + chunk_overlap
+                        (ver merge_small_chunks).
+        normalize_whitespace: Si es True, el texto se pasa antes por
+                              normalize_text_whitespace (los chunks dejan de
+                              ser idénticos a los de split_text).
 
     Returns:
         Una lista de strings (fragmentos). Lista vacía si la entrada es inválida o hay error.
     """
-    if not isinstance(chunker, RecursiveCharacterTextSplitter):
-        logger.error("Se proporcionó un objeto chunker inválido o None a chunk_text.")
+    if chunker is None:
+        logger.error("Se proporcionó un chunker None a chunk_text.")
         return [] # Devolver lista vacía en caso de error
     if not text: # Manejar None o string vacío
-        logger.debug("Texto de entrada para chunking está vacío o es None.")
         return [] # Devolver lista vacía consistentemente
 
-    # El chunker de Langchain maneja textos más cortos que chunk_size devolviendo [texto]
     try:
-        logger.debug(f"Dividiendo texto (longitud: {len(text)}) en chunks (size={chunker._chunk_size}, overlap={chunker._chunk_overlap})...")
-        chunks = chunker.split_text(text)
-        logger.debug(f"Texto dividido en {len(chunks)} chunks.")
+        if normalize_whitespace:
+            text = normalize_text_whitespace(text)
+        # Camino rápido: un texto que cabe en un chunk no necesita el splitter recursivo
+        if len(text) <= _short_text_limit(chunker):
+            return _short_text_chunks(chunker, text)
+        debug = logger.isEnabledFor(logging.DEBUG) # Sin formatear mensajes si DEBUG está desactivado
+        if debug:
+            logger.debug("Dividiendo texto (longitud: %d) en chunks (size=%d, overlap=%d)...", len(text), chunker._chunk_size, chunker._chunk_overlap)
+        chunks = list(_split_cached(chunker, text))
+        if min_chunk_size > 0:
+            chunks = merge_small_chunks(text, chunks, min_chunk_size, chunker._chunk_size + chunker._chunk_overlap)
+        if debug:
+            logger.debug("Texto dividido en %d chunks.", len(chunks))
         return chunks
     except Exception as e:
-        logger.exception(f"Error inesperado durante la división del texto: {e}")
+        logger.exception("Error inesperado durante la división del texto: %s", e)
         # Considerar devolver [text] como fallback si falló la división? O vacía?
         return [] # Devolver lista vacía para indicar fallo
 
+def iter_chunk_text(
+    chunker: Optional[RecursiveCharacterTextSplitter],
+    text: Optional[str]
+) -> Iterator[str]:
+    """
+    Versión generadora de chunk_text: produce los fragmentos de uno en uno a
+    medida que se construyen, para consumirlos (y liberarlos) sin tener la
+    lista completa en memoria. Con la configuración estándar del chunker los
+    genera de forma incremental; con otras, recorre el resultado de split_text.
+
+    Args:
+        chunker: La instancia de RecursiveCharacterTextSplitter a usar.
+        text: El texto a dividir.
+
+    Yields:
+        Los fragmentos en orden. Nada si la entrada es inválida o hay error
+        (en ese caso se registra, como en chunk_text).
+    """
+    if chunker is None:
+        logger.error("Se proporcionó un chunker None a iter_chunk_text.")
+        return
+    if not text:
+        return
+    try:
+        if len(text) <= _short_text_limit(chunker):
+            yield from _short_text_chunks(chunker, text)
+            return
+        chunks = (_fast_iter_splitter(chunker) or chunker.split_text)(text)
+    except Exception as e:
+        logger.exception("Error inesperado durante la división del texto: %s", e)
+        return
+    yield from chunks
+
+def chunk_offsets(
+    chunker: Optional[RecursiveCharacterTextSplitter],
+    text: Optional[str]
+) -> List[Tuple[int, int]]:
+    """
+    Divide un texto como chunk_text, pero devuelve cada fragmento como
+    (inicio, fin) en el texto original en lugar de una copia: text[inicio:fin]
+    es el fragmento. Los fragmentos solapados comparten así el mismo texto, y
+    solo se crean cadenas al consumirlos (ver materialize).
+
+    Args:
+        chunker: La instancia de RecursiveCharacterTextSplitter a usar.
+        text: El texto a dividir.
+
+    Returns:
+        Lista de (inicio, fin) en orden. Vacía si la entrada es inválida o
+        hay un error (se registra, como en chunk_text).
+    """
+    if chunker is None:
+        logger.error("Se proporcionó un chunker None a chunk_offsets.")
+        return []
+    if not text:
+        return []
+    try:
+        if len(text) <= _short_text_limit(chunker):
+            if not getattr(chunker, '_strip_whitespace', True):
+                return [(0, len(text))]
+            start, end = _strip_span(text, 0, len(text))
+            return [(start, end)] if start < end else []
+        split_spans = _fast_span_splitter(chunker)
+        if split_spans is not None:
+            return split_spans(text)
+        # Configuración no estándar: dividir con Langchain y localizar los chunks
+        spans = _locate_chunks(text, chunker.split_text(text))
+        if spans is None:
+            logger.error("No se pudieron localizar los chunks en el texto original.")
+            return []
+        return spans
+    except Exception as e:
+        logger.exception("Error inesperado durante la división del texto: %s", e)
+        return []
+
+def materialize(text: str, spans: List[Tuple[int, int]]) -> Iterator[str]:
+    """
+    Produce el fragmento text[inicio:fin] de cada (inicio, fin) de
+    chunk_offsets, de uno en uno y solo cuando se consume.
+    """
+    for start, end in spans:
+        yield text[start:end]
+
+def chunk_texts(
+    chunker: Optional[RecursiveCharacterTextSplitter],
+    texts: List[Optional[str]],
+    pool: bool = True,
+    min_chunk_size: int = 0,
+    normalize_whitespace: bool = False
+) -> List[List[str]]:
+    """
+    Divide una lista de textos en fragmentos, equivalente a
+    `[chunk_text(chunker, t, min_chunk_size, normalize_whitespace) for t in texts]` pero validando el chunker y
+    resolviendo `split_text` una sola vez, sin logs por texto.
+
+    Args:
+        chunker: La instancia de RecursiveCharacterTextSplitter a usar.
+        texts: Los textos a dividir (None o vacíos producen una lista vacía).
+        pool: Si es True, los chunks idénticos (cabeceras, avisos o firmas
+              repetidos entre respuestas) comparten un único objeto str
+              dentro del lote, lo que reduce la memoria antes de los embeddings.
+        min_chunk_size: Como en chunk_text (0 = sin unir chunks pequeños).
+        normalize_whitespace: Como en chunk_text.
+
+    Returns:
+        Una lista con la lista de fragmentos de cada texto, en el mismo orden.
+        Listas vacías para todos si el chunker es inválido.
+    """
+    if chunker is None:
+        logger.error("Se proporcionó un chunker None a chunk_texts.")
+        return [[] for _ in texts]
+
+    try:
+        _split = get_split_function(chunker) # Resuelta una vez para todo el lote
+        max_size = chunker._chunk_size + chunker._chunk_overlap
+        # Textos idénticos dentro del lote (respuestas de plantilla) se dividen una sola vez
+        split_by_text: Dict[str, List[str]] = {}
+        all_chunks = []
+        for text in texts:
+            if not text:
+                all_chunks.append([])
+            else:
+                chunks = split_by_text.get(text)
+                if chunks is None:
+                    source = normalize_text_whitespace(text) if normalize_whitespace else text
+                    chunks = _split(source)
+                    if min_chunk_size > 0:
+                        chunks = merge_small_chunks(source, chunks, min_chunk_size, max_size)
+                    split_by_text[text] = chunks
+                all_chunks.append(list(chunks)) # Copia: cada texto recibe su propia lista
+    except Exception as e:
+        # Algún texto no se pudo dividir: repetir uno a uno para aislarlo (y registrarlo)
+        logger.warning("Error dividiendo textos en lote (%s). Reintentando uno a uno.", e)
+        all_chunks = [chunk_text(chunker, text, min_chunk_size, normalize_whitespace) for text in texts]
+    if pool:
+        all_chunks = _pool_chunks(all_chunks)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%d textos divididos en %d chunks (size=%d, overlap=%d).", len(texts), sum(map(len, all_chunks)), chunker._chunk_size, chunker._chunk_overlap)
+    return all_chunks
+
+def _pool_chunks(all_chunks: List[List[str]]) -> List[List[str]]:
+    """Hace que los chunks idénticos del lote compartan un único objeto str."""
+    # Pool local al lote (un dict a nivel de módulo crecería sin límite; str no admite weakref)
+    _dedup: Dict[str, str] = {}
+    _setdefault = _dedup.setdefault
+    return [[_setdefault(chunk, chunk) for chunk in chunks] for chunks in all_chunks]
+
+def _split_worker(args: Tuple[List[Optional[str]], int, int, int, bool]) -> List[List[str]]:
+    """Worker de proceso: divide un grupo de textos (el chunker se cachea por proceso)."""
+    texts, chunk_size, chunk_overlap, min_chunk_size, normalize_whitespace = args
+    return chunk_texts(get_answer_chunker(chunk_size, chunk_overlap), texts, pool=False,
+                       min_chunk_size=min_chunk_size, normalize_whitespace=normalize_whitespace)
+
+def chunk_texts_parallel(
+    texts: List[Optional[str]],
+    chunk_size: int = 1000,
+    chunk_overlap: int = 150,
+    max_workers: Optional[int] = None,
+    pool: bool = True,
+    min_chunk_size: int = 0,
+    normalize_whitespace: bool = False
+) -> List[List[str]]:
+    """
+    Como chunk_texts con un chunker de get_answer_chunker(chunk_size,
+    chunk_overlap), pero repartiendo los textos entre procesos en grupos de
+    PARALLEL_CHUNK_SHARD_SIZE: la división es Python puro y no libera el GIL.
+
+    Con menos de PARALLEL_CHUNK_MIN_TEXTS textos, un solo proceso disponible o
+    si el pool falla, se divide en serie en el proceso actual.
+
+    Returns:
+        Una lista con la lista de fragmentos de cada texto, en el mismo orden.
+    """
+    workers = max_workers or os.cpu_count() or 1
+    if workers > 1 and len(texts) >= PARALLEL_CHUNK_MIN_TEXTS:
+        shards = [(texts[i:i + PARALLEL_CHUNK_SHARD_SIZE], chunk_size, chunk_overlap, min_chunk_size, normalize_whitespace)
+                  for i in range(0, len(texts), PARALLEL_CHUNK_SHARD_SIZE)]
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as executor:
+                all_chunks = [chunks for shard_result in executor.map(_split_worker, shards) for chunks in shard_result]
+            logger.debug("%d textos divididos en %d grupos entre procesos.", len(texts), len(shards))
+            return _pool_chunks(all_chunks) if pool else all_chunks
+        except Exception as e:
+            logger.warning("Fallo al dividir textos en paralelo (%s). Dividiendo en serie.", e)
+    return chunk_texts(get_answer_chunker(chunk_size, chunk_overlap), texts, pool=pool,
+                       min_chunk_size=min_chunk_size, normalize_whitespace=normalize_whitespace)
+
+
 
 # --- Bloque para pruebas rápidas ---
 if __name__ == "__main__":
@@ -156,6 +775,12 @@ if __name__ == "__main__":
         print(f"  Número de chunks generados: {len(chunks_none)}")
         assert chunks_none == []
 
+        print("\nProbando división en lote:")
+        chunks_lote = chunk_texts(mi_chunker, [texto_largo, texto_corto, "", None])
+        assert chunks_lote == [chunks_largos, chunks_cortos, [], []]
+        chunks_repetidos = chunk_texts(mi_chunker, [texto_corto + " ", " " + texto_corto])
+        assert chunks_repetidos[0][0] is chunks_repetidos[1][0] # Mismo objeto gracias al pool
+
         print("\nProbando chunker cacheado:")
         mi_chunker_2 = get_answer_chunker(chunk_size=test_chunk_size, chunk_overlap=test_overlap)
         # lru_cache devuelve la misma instancia para los mismos argumentos
@@ -6,25 +6,101 @@ Módulo para configurar el sistema de logging de la aplicación Kelly Indexer
 de forma centralizada.
 """
 
+import atexit
 import logging
+import logging.handlers
+import os
+import pickle
+import queue
+import socketserver
+import struct
 import sys
+import threading
 from pathlib import Path
 # CORRECCIÓN: Importar List para el type hint de 'handlers'
-from typing import Optional, List
-
-# Mapeo de nombres de nivel de log a constantes de logging
-LOG_LEVEL_MAP = {
-    'DEBUG': logging.DEBUG,
-    'INFO': logging.INFO,
-    'WARNING': logging.WARNING,
-    'ERROR': logging.ERROR,
-    'CRITICAL': logging.CRITICAL,
-}
+from typing import Optional, List, Set, Tuple
 
 # Formato por defecto para los logs
 DEFAULT_LOG_FORMAT = '%(asctime)s - %(name)s [%(levelname)s] - %(message)s'
 DEFAULT_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 
+class FastFormatter(logging.Formatter):
+    """
+    Formatter especializado en DEFAULT_LOG_FORMAT: compone la línea con un
+    f-string en lugar de aplicar el formato con % sobre record.__dict__, y
+    reutiliza la fecha formateada mientras no cambie el segundo (los
+    registros del mismo segundo comparten el texto). Produce exactamente la
+    misma salida que logging.Formatter(DEFAULT_LOG_FORMAT, datefmt).
+    """
+
+    def __init__(self, datefmt: str = DEFAULT_DATE_FORMAT) -> None:
+        super().__init__(DEFAULT_LOG_FORMAT, datefmt=datefmt)
+        self._time_cache: Tuple[int, str] = (-1, "") # (segundo, fecha formateada)
+
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        if not datefmt: # Sin datefmt la fecha lleva milisegundos: no se cachea
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        cached_second, cached = self._time_cache
+        if second != cached_second:
+            cached = super().formatTime(record, datefmt)
+            self._time_cache = (second, cached) # Una sola asignación: segura entre hilos
+        return cached
+
+    def format(self, record: logging.LogRecord) -> str:
+        record.message = record.getMessage()
+        record.asctime = self.formatTime(record, self.datefmt)
+        s = f"{record.asctime} - {record.name} [{record.levelname}] - {record.message}"
+        # Igual que logging.Formatter.format: traza de la excepción y de la pila al final
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            if s[-1:] != "\n":
+                s = s + "\n"
+            s = s + record.exc_text
+        if record.stack_info:
+            if s[-1:] != "\n":
+                s = s + "\n"
+            s = s + self.formatStack(record.stack_info)
+        return s
+
+# Formatters creados una vez al importar: el del formato por defecto (el que
+# se usa casi siempre) y el del QueueHandler, que solo deja el mensaje
+_DEFAULT_FORMATTER = FastFormatter(DEFAULT_DATE_FORMAT)
+_MESSAGE_FORMATTER = logging.Formatter('%(message)s')
+
+# Archivo de log: rotación por tamaño y escritura en bloques. Los registros se
+# acumulan en memoria y se vuelcan cada LOG_BUFFER_CAPACITY registros, ante un
+# WARNING o superior, cada LOG_FLUSH_INTERVAL segundos (para no tener el
+# archivo desfasado en ejecuciones largas con poco log) o al cerrar el logging.
+LOG_FILE_MAX_BYTES = 50_000_000
+LOG_FILE_BACKUP_COUNT = 3
+LOG_BUFFER_CAPACITY = 1024
+LOG_FLUSH_INTERVAL = 5.0
+# Buffer del archivo en sí: las escrituras se agrupan en bloques de este tamaño
+LOG_FILE_BUFFER_SIZE = 65536
+
+# Configuración aplicada por la última llamada a setup_logging y handlers que
+# instaló: una llamada repetida con los mismos argumentos no los reconstruye
+_applied_config: Optional[Tuple[Optional[str], Optional[str], str, str, Optional[Tuple[str, int]]]] = None
+_applied_handlers: List[logging.Handler] = []
+
+# Directorios de log ya creados/comprobados en este proceso (sin repetir mkdir)
+_prepared_dirs: Set[Path] = set()
+
+# Hilo que formatea y escribe los registros: el logger raíz solo tiene un
+# QueueHandler, así que cada llamada de log en el hilo que indexa se reduce a
+# encolar el registro. Los handlers reales (consola, archivo) viven aquí.
+_listener: Optional[logging.handlers.QueueListener] = None
+# Señal para detener el hilo que vuelca periódicamente el buffer del archivo
+_flush_stop: Optional[threading.Event] = None
+
+# Handlers reutilizados entre configuraciones: el de consola (mientras
+# sys.stderr sea el mismo) y el del archivo (ruta, handler, buffer) mientras
+# no cambie la ruta, para no cerrar y reabrir el archivo al reconfigurar.
+_console_handler: Optional[logging.StreamHandler] = None
+_file_handler_spec: Optional[Tuple[str, "BufferedRotatingFileHandler", logging.handlers.MemoryHandler]] = None
+
 # Obtener un logger para este módulo (útil para logs internos del setup)
 logger = logging.getLogger(__name__)
 # Poner un handler básico temporal por si setup_logging falla muy temprano
@@ -33,17 +109,154 @@ if not logger.hasHandlers():
      logger.addHandler(logging.StreamHandler(sys.stderr))
      logger.setLevel(logging.WARNING) # Nivel default bajo para no ser verboso
 
+class BufferedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler que escribe a través de un buffer de
+    LOG_FILE_BUFFER_SIZE bytes y solo lo vuelca al disco en flush()/close() o
+    ante un registro de nivel `flush_level` o superior, en lugar de hacer un
+    write (más un seek para decidir la rotación) por registro. El tamaño del
+    archivo para rotar se lleva en memoria (en caracteres, aproximado).
+    """
+
+    def __init__(self, filename: Path, maxBytes: int = 0, backupCount: int = 0,
+                 encoding: Optional[str] = None, delay: bool = False,
+                 flush_level: int = logging.WARNING) -> None:
+        self.flush_level = flush_level
+        self._size = 0
+        super().__init__(filename, mode='a', maxBytes=maxBytes, backupCount=backupCount,
+                         encoding=encoding, delay=delay)
+
+    def _open(self):
+        stream = open(self.baseFilename, self.mode, buffering=LOG_FILE_BUFFER_SIZE,
+                      encoding=self.encoding, errors=self.errors)
+        self._size = stream.seek(0, os.SEEK_END) # Tamaño actual (modo 'append')
+        return stream
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            msg = self.format(record) + self.terminator # Formatear una sola vez
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes > 0 and self._size and self._size + len(msg) >= self.maxBytes:
+                self.doRollover()
+                if self.stream is None: # Con delay=True doRollover no reabre el archivo
+                    self.stream = self._open()
+            self.stream.write(msg)
+            self._size += len(msg)
+            if record.levelno >= self.flush_level:
+                self.stream.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+def _stderr(msg: str) -> None:
+    """
+    Escribe un aviso de configuración directamente en el descriptor 2 (un
+    solo write, sin el lock de sys.stderr), para no depender del logging
+    mientras se configura ni bloquearse con otros hilos que escriban.
+    """
+    try:
+        os.write(2, (msg + "\n").encode('utf-8', errors='replace'))
+    except OSError: # Sin stderr (p. ej. pythonw): no hay dónde avisar
+        pass
+
+def _stop_listener() -> None:
+    """Detiene el hilo de logging, escribiendo antes los registros pendientes en la cola."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def _periodic_flush(handlers: List[logging.Handler], stop: threading.Event) -> None:
+    """Vuelca los buffers del archivo cada LOG_FLUSH_INTERVAL segundos hasta que se pida parar."""
+    while not stop.wait(LOG_FLUSH_INTERVAL):
+        for handler in handlers: # En orden: registros en memoria, luego buffer del archivo
+            handler.flush()
+
+def _stop_periodic_flush() -> None:
+    """Detiene el volcado periódico del buffer del archivo, si está activo."""
+    global _flush_stop
+    if _flush_stop is not None:
+        _flush_stop.set()
+        _flush_stop = None
+
+def _discard_inherited_stream(handler: "BufferedRotatingFileHandler") -> None:
+    """
+    Descarta, sin escribirlo, el buffer del archivo heredado del padre: el
+    descriptor del hijo se redirige a /dev/null antes de cerrar el stream (el
+    padre sigue escribiendo ese contenido por su cuenta). El handler reabre el
+    archivo en el siguiente registro.
+    """
+    stream = handler.stream
+    if stream is None:
+        return
+    try:
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        try:
+            os.dup2(devnull, stream.fileno()) # Solo afecta al hijo: tras el fork la tabla de descriptores es suya
+        finally:
+            os.close(devnull)
+        stream.close()
+    except (OSError, ValueError):
+        pass
+    handler.stream = None
+
+def _use_handlers_directly_in_child() -> None:
+    """
+    Tras un fork (p. ej. workers de ProcessPoolExecutor) el hilo del
+    QueueListener no existe en el hijo: se sustituye el QueueHandler del raíz
+    por los handlers reales para que sus registros no se queden en la cola.
+
+    Los buffers heredados (registros del MemoryHandler y bytes del buffer del
+    archivo) son del padre, que ya los escribirá: se descartan para no
+    duplicarlos. En el hijo el archivo se escribe sin buffer (un flush por
+    registro), porque los workers pueden terminar con os._exit sin volcarlo.
+    """
+    global _listener, _applied_handlers, _file_handler_spec, _flush_stop
+    if _listener is None:
+        return
+    root = logging.getLogger()
+    for handler in _applied_handlers:
+        root.removeHandler(handler)
+    child_handlers: List[logging.Handler] = []
+    for handler in _listener.handlers:
+        if isinstance(handler, logging.handlers.MemoryHandler):
+            handler.buffer.clear()
+            if handler.target is None:
+                continue
+            handler = handler.target # Sin acumular registros en memoria
+        if isinstance(handler, BufferedRotatingFileHandler):
+            _discard_inherited_stream(handler)
+            handler.flush_level = logging.NOTSET
+        root.addHandler(handler)
+        child_handlers.append(handler)
+    _applied_handlers = child_handlers
+    _listener = None
+    _file_handler_spec = None # Una reconfiguración en el hijo crea sus propios handlers
+    _flush_stop = None # El hilo de volcado periódico tampoco existe en el hijo
+
+# atexit es LIFO: ambos se ejecutan antes de logging.shutdown, que vuelca y cierra los handlers
+atexit.register(_stop_listener)
+atexit.register(_stop_periodic_flush)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_use_handlers_directly_in_child)
+
 def setup_logging(
     log_level_str: str = 'INFO',
     log_file: Optional[Path] = None,
     log_format: str = DEFAULT_LOG_FORMAT,
-    date_format: str = DEFAULT_DATE_FORMAT
+    date_format: str = DEFAULT_DATE_FORMAT,
+    force: bool = False,
+    aggregator_addr: Optional[Tuple[str, int]] = None
 ) -> None:
     """
     Configura el logging raíz para la aplicación Kelly Indexer.
 
     Aplica un nivel, formato, y opcionalmente añade un handler para escribir
-    logs a un archivo además de la consola (stderr).
+    logs a un archivo además de la consola (stderr). Esos handlers se
+    ejecutan en un hilo aparte (QueueListener); el logger raíz solo encola
+    los registros con un QueueHandler.
 
     Args:
         log_level_str: Nivel mínimo de log a registrar (ej. 'DEBUG', 'INFO').
@@ -52,88 +265,224 @@ def setup_logging(
                   Si es None, solo se logueará a la consola.
         log_format: Formato a usar para los mensajes de log.
         date_format: Formato a usar para la fecha/hora en los logs.
+        force: Reconfigurar aunque el logging ya esté configurado con los
+               mismos argumentos (por defecto esa llamada no hace nada, para
+               no cerrar y reabrir los handlers en cada invocación).
+        aggregator_addr: (host, puerto) de un agregador (run_log_aggregator).
+                         Si se indica, los registros solo se envían por socket
+                         a ese proceso, que es el único que escribe el archivo
+                         de log (sin consola ni archivo propios): útil para
+                         procesos worker que no deben competir por el archivo.
     """
+    global _applied_config, _applied_handlers, _listener, _flush_stop, _console_handler, _file_handler_spec
+    config_key = (str(log_level_str).upper(), str(log_file) if log_file else None, log_format, date_format,
+                  tuple(aggregator_addr) if aggregator_addr else None)
+    root_handlers = logging.getLogger().handlers
+    if (not force and config_key == _applied_config and _applied_handlers
+            and all(handler in root_handlers for handler in _applied_handlers)):
+        return
+
     # Validar y obtener el nivel de logging numérico
-    numeric_log_level = LOG_LEVEL_MAP.get(log_level_str.upper())
-    if numeric_log_level is None:
-         # Usar print aquí porque el logger raíz no está configurado aún
-         print(f"[ADVERTENCIA SetupLogging] Nivel de log '{log_level_str}' no reconocido. Usando INFO por defecto.")
+    # getLevelName devuelve el número para un nombre registrado (y "Level X" si no
+    # lo es), sin mantener un mapa propio duplicado del de logging
+    numeric_log_level = logging.getLevelName(config_key[0])
+    if not isinstance(numeric_log_level, int):
+         # Escribir directamente porque el logger raíz no está configurado aún
+         _stderr(f"[ADVERTENCIA SetupLogging] Nivel de log '{log_level_str}' no reconocido. Usando INFO por defecto.")
          numeric_log_level = logging.INFO # Usar INFO como fallback
 
     # CORRECCIÓN: Especificar tipo explícito para la lista de handlers
     handlers: List[logging.Handler] = []
 
-    # --- Handler para la Consola ---
-    try:
-        console_handler = logging.StreamHandler(sys.stderr)
-        # Se podría configurar un formatter específico si se quisiera diferente al de archivo
-        # console_formatter = logging.Formatter(log_format, datefmt=date_format)
-        # console_handler.setFormatter(console_formatter)
-        handlers.append(console_handler)
-    except Exception as e:
-         # Muy raro que falle StreamHandler, pero por si acaso
-         print(f"[ERROR SetupLogging] No se pudo crear el handler de consola: {e}", file=sys.stderr)
+    file_handler: Optional[logging.FileHandler] = None # Definir fuera del if para claridad
+    buffer_handler: Optional[logging.handlers.MemoryHandler] = None
 
+    if aggregator_addr:
+        # --- Envío al agregador: un send() por registro, desde el hilo del listener ---
+        handlers.append(logging.handlers.SocketHandler(*aggregator_addr))
+    else:
+        # --- Handler para la Consola ---
+        try:
+            # Reutilizar el de la configuración anterior si sigue escribiendo en el sys.stderr actual
+            if _console_handler is None or _console_handler.stream is not sys.stderr:
+                _console_handler = logging.StreamHandler(sys.stderr)
+            handlers.append(_console_handler)
+        except Exception as e:
+             # Muy raro que falle StreamHandler, pero por si acaso
+             _stderr(f"[ERROR SetupLogging] No se pudo crear el handler de consola: {e}")
 
-    # --- Handler para Archivo (Opcional) ---
-    file_handler: Optional[logging.FileHandler] = None # Definir fuera del if para claridad
-    if log_file:
-        # Convertir a Path si no lo es
-        if not isinstance(log_file, Path):
-             try: log_file = Path(log_file)
-             except TypeError:
-                 print(f"[ERROR SetupLogging] 'log_file' debe ser una ruta válida (Path), se recibió {type(log_file)}. Logueando solo a consola.", file=sys.stderr)
-                 log_file = None # Anular
-
-        if log_file: # Proceder si la ruta es válida
-            try:
-                # Asegurar que el directorio padre exista
-                log_file.parent.mkdir(parents=True, exist_ok=True)
-                # Crear el handler de archivo en modo 'append'
-                file_handler = logging.FileHandler(log_file, mode='a', encoding='utf-8')
-                # file_handler.setFormatter(logging.Formatter(log_format, datefmt=date_format)) # Si se usa formatter específico
-                handlers.append(file_handler) # Añadir a la lista (type-safe ahora)
-                # Usar print para este mensaje inicial porque el logger aún no está 100% configurado
-                print(f"[INFO SetupLogging] Logging configurado también para archivo: {log_file.resolve()}")
-            except PermissionError:
-                print(f"[ERROR SetupLogging] Permiso denegado al intentar crear/abrir archivo de log: {log_file}. Logueando solo a consola.", file=sys.stderr)
-            except Exception as e:
-                print(f"[ERROR SetupLogging] No se pudo configurar el log a archivo {log_file}: {e}. Logueando solo a consola.", file=sys.stderr)
+
+        # --- Handler para Archivo (Opcional) ---
+        if log_file:
+            # Convertir a Path si no lo es
+            if not isinstance(log_file, Path):
+                 try: log_file = Path(log_file)
+                 except TypeError:
+                     _stderr(f"[ERROR SetupLogging] 'log_file' debe ser una ruta válida (Path), se recibió {type(log_file)}. Logueando solo a consola.")
+                     log_file = None # Anular
+
+            if log_file: # Proceder si la ruta es válida
+                try:
+                    # Asegurar que el directorio padre exista (una vez por directorio)
+                    if log_file.parent not in _prepared_dirs:
+                        log_file.parent.mkdir(parents=True, exist_ok=True)
+                        _prepared_dirs.add(log_file.parent)
+                    if _file_handler_spec is not None and _file_handler_spec[0] == str(log_file):
+                        # Misma ruta que la configuración anterior: seguir con el archivo ya abierto
+                        _, file_handler, buffer_handler = _file_handler_spec
+                    else:
+                        # Handler de archivo rotativo con buffer (modo 'append'; se abre al primer registro)
+                        file_handler = BufferedRotatingFileHandler(
+                            log_file, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUP_COUNT,
+                            encoding='utf-8', delay=True
+                        )
+                        # Escrituras en bloque: evita una escritura al disco por registro con DEBUG
+                        buffer_handler = logging.handlers.MemoryHandler(
+                            capacity=LOG_BUFFER_CAPACITY, flushLevel=logging.WARNING, target=file_handler,
+                            flushOnClose=True
+                        )
+                    handlers.append(buffer_handler)
+                    # Escribir directamente este mensaje inicial porque el logger aún no está 100% configurado
+                    # abspath no resuelve enlaces (sin un lstat por componente, lento en FS de red)
+                    _stderr(f"[INFO SetupLogging] Logging configurado también para archivo: {os.path.abspath(log_file)}")
+                except PermissionError:
+                    _stderr(f"[ERROR SetupLogging] Permiso denegado al intentar crear/abrir archivo de log: {log_file}. Logueando solo a consola.")
+                except Exception as e:
+                    _stderr(f"[ERROR SetupLogging] No se pudo configurar el log a archivo {log_file}: {e}. Logueando solo a consola.")
 
     # --- Configurar el Logger Raíz ---
     if not handlers:
-         print("[ERROR SetupLogging] No se pudo configurar ningún handler. Usando config básica de emergencia.", file=sys.stderr)
+         _stderr("[ERROR SetupLogging] No se pudo configurar ningún handler. Usando config básica de emergencia.")
          logging.basicConfig(level=numeric_log_level) # Config básica sin formato ni handlers específicos
          logging.error("Fallo al configurar handlers, usando configuración muy básica.")
          return
 
     try:
+        # Un único Formatter compartido por todos los handlers (el precreado si el formato es el por defecto)
+        if log_format == DEFAULT_LOG_FORMAT:
+            formatter = _DEFAULT_FORMATTER if date_format == DEFAULT_DATE_FORMAT else FastFormatter(date_format)
+        else:
+            formatter = logging.Formatter(log_format, datefmt=date_format)
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        if file_handler: # Formatea el destino del MemoryHandler
+            file_handler.setFormatter(formatter)
+        # Los handlers reales pasan al hilo del listener; el raíz solo encola
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        # Solo el mensaje (y la traza si hay excepción): el formato completo lo
+        # aplican los handlers reales (sin esto basicConfig le pondría el suyo)
+        queue_handler.setFormatter(_MESSAGE_FORMATTER)
+        listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        # Detener el listener anterior (vacía su cola) antes de cerrar sus handlers
+        previous_listener = _listener
+        if previous_listener is not None:
+            previous_listener.stop()
+        # basicConfig cierra los handlers previos del raíz, pero no los del
+        # listener anterior ni los archivos de destino de un MemoryHandler.
+        # Los que se reutilizan en esta configuración no se cierran.
+        previous_handlers = list(previous_listener.handlers) if previous_listener is not None else []
+        previous_targets = [h.target for h in previous_handlers + _applied_handlers
+                            if isinstance(h, logging.handlers.MemoryHandler) and h.target is not None]
+        reused = set(handlers) | {file_handler}
+        previous_handlers = [h for h in previous_handlers if h not in reused]
+        previous_targets = [h for h in previous_targets if h not in reused]
+        # basicConfig(force=True) cierra los handlers del raíz: sacar antes los
+        # reutilizados (tras un fork el raíz tiene los handlers reales)
+        root_logger = logging.getLogger()
+        for handler in root_handlers[:]:
+            if handler in reused:
+                root_logger.removeHandler(handler)
         # logging.basicConfig configura el logger raíz.
         # force=True (Python 3.8+) elimina handlers previos.
         logging.basicConfig(
             level=numeric_log_level,
-            format=log_format,
-            datefmt=date_format,
-            handlers=handlers, # Pasar la lista de handlers construida
+            handlers=[queue_handler],
             force=True
         )
+        listener.start()
+        _listener = listener
+        _file_handler_spec = (str(log_file), file_handler, buffer_handler) if file_handler and buffer_handler else None
+        _stop_periodic_flush()
+        if buffer_handler is not None and file_handler is not None:
+            _flush_stop = threading.Event()
+            threading.Thread(target=_periodic_flush, args=([buffer_handler, file_handler], _flush_stop),
+                             name="log-flush", daemon=True).start()
+        _applied_config, _applied_handlers = config_key, [queue_handler]
+        for handler in previous_handlers:
+            handler.close()
+        for target in previous_targets:
+            target.close()
         # Loguear usando el logger raíz recién configurado
-        logging.info(f"Sistema de Logging inicializado a nivel: {logging.getLevelName(logging.getLogger().level)}")
+        logging.info("Sistema de Logging inicializado a nivel: %s", logging.getLevelName(logging.getLogger().level))
         if file_handler: # Loguear que el archivo se está usando
-             logging.info(f"Logs siendo escritos también en: {log_file}")
+             logging.info("Logs siendo escritos también en: %s", log_file)
+        if aggregator_addr:
+             logging.info("Logs enviados al agregador en %s:%s", *aggregator_addr)
 
     except ValueError as e:
          # Error común si el formato es inválido
-         print(f"[ERROR CRÍTICO SetupLogging] Error en la configuración de formato de logging: {e}")
+         _stderr(f"[ERROR CRÍTICO SetupLogging] Error en la configuración de formato de logging: {e}")
          # Intentar configurar básico para que al menos algo funcione
          logging.basicConfig(level=logging.WARNING)
-         logging.critical(f"Fallo en formato de log, usando config básica: {e}")
+         logging.critical("Fallo en formato de log, usando config básica: %s", e)
     except Exception as e:
-         print(f"[ERROR CRÍTICO SetupLogging] Error inesperado al configurar logging con basicConfig: {e}")
+         _stderr(f"[ERROR CRÍTICO SetupLogging] Error inesperado al configurar logging con basicConfig: {e}")
          logging.basicConfig(level=logging.WARNING)
-         logging.critical(f"Fallo inesperado en setup logging, usando config básica: {e}")
+         logging.critical("Fallo inesperado en setup logging, usando config básica: %s", e)
 
 
+class _LogRecordStreamHandler(socketserver.StreamRequestHandler):
+    """
+    Recibe registros de un SocketHandler (longitud '>L' + pickle del dict del
+    registro, ver SocketHandler.makePickle) y los pasa al logging local.
+    """
+
+    def handle(self) -> None:
+        while True:
+            header = self.rfile.read(4)
+            if len(header) < 4: # Conexión cerrada por el worker
+                return
+            length = struct.unpack('>L', header)[0]
+            data = self.rfile.read(length)
+            if len(data) < length:
+                return
+            record = logging.makeLogRecord(pickle.loads(data))
+            logging.getLogger(record.name).handle(record)
+
+class _LogRecordSocketServer(socketserver.ThreadingTCPServer):
+    """Servidor TCP del agregador: un hilo por worker conectado."""
+    allow_reuse_address = True
+    daemon_threads = True
+
+def run_log_aggregator(
+    addr: Tuple[str, int] = ('localhost', logging.handlers.DEFAULT_TCP_LOGGING_PORT),
+    log_file: Optional[Path] = None,
+    log_level_str: str = 'DEBUG'
+) -> None:
+    """
+    Ejecuta (bloqueando hasta Ctrl+C) un agregador de logs: recibe los
+    registros que envían los procesos configurados con
+    setup_logging(aggregator_addr=addr) y los escribe, como único proceso con
+    el archivo abierto, por la consola y el archivo de log (con buffer, en el
+    hilo del QueueListener).
+
+    Los registros llegan serializados con pickle, así que el agregador solo
+    debe escuchar en direcciones de confianza (por defecto, localhost).
+
+    Args:
+        addr: (host, puerto) en el que escuchar.
+        log_file: Archivo de log donde escribir (None: solo consola).
+        log_level_str: Nivel del agregador; los workers ya filtran por el suyo.
+    """
+    setup_logging(log_level_str, log_file)
+    with _LogRecordSocketServer(tuple(addr), _LogRecordStreamHandler) as server:
+        logging.info("Agregador de logs escuchando en %s:%s", *server.server_address[:2])
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logging.info("Agregador de logs detenido.")
+
 # --- Bloque para pruebas rápidas de este módulo ---
 if __name__ == "__main__":
     print("--- Probando setup_logging ---")
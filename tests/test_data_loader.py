@@ -0,0 +1,166 @@
+# tests/test_data_loader.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para el módulo data_loader de Kelly Indexer.
+Verifica la carga y validación de archivos JSON Q&A y el escaneo del directorio.
+"""
+
+import json
+import pytest
+from pathlib import Path
+
+# Importar funciones del módulo data_loader
+# Asumiendo que pytest corre desde la raíz y src está en PYTHONPATH
+try:
+    from kelly_indexer.data_loader import (
+        file_content_hash,
+        load_single_json_file,
+        load_all_qas_from_directory,
+    )
+except ImportError:
+     pytest.fail("No se pudo importar desde 'kelly_indexer.data_loader'. Asegúrate de la estructura y PYTHONPATH.", pytrace=False)
+
+
+def _qa(q: str) -> dict:
+    return {"q": q, "a": f"Respuesta a {q}", "product": "P", "keywords": ["k"]}
+
+# Contenidos de prueba en memoria (las pruebas unitarias no necesitan archivos)
+_VALID_BYTES = json.dumps([_qa("P1"), _qa("P2")]).encode("utf-8")
+_MIXED_BYTES = json.dumps([_qa("P3"), {"q": "P4"}, {**_qa("P5"), "q": "  "}]).encode("utf-8")
+_NOT_A_LIST_BYTES = json.dumps({"q": "x"}).encode("utf-8")
+_BAD_BYTES = b"[{'bad': 'json'}"
+
+@pytest.fixture
+def input_dir(tmp_path: Path) -> Path:
+    """Directorio de entrada con archivos válidos, vacíos, inválidos y un subdirectorio."""
+    (tmp_path / "valid.json").write_bytes(_VALID_BYTES)
+    (tmp_path / "empty.json").write_bytes(b"[]")
+    (tmp_path / "not_a_list.json").write_bytes(_NOT_A_LIST_BYTES)
+    (tmp_path / "bad.json").write_bytes(_BAD_BYTES)
+    (tmp_path / "notes.txt").write_text("no es json", encoding="utf-8")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "mixed.json").write_bytes(_MIXED_BYTES)
+    return tmp_path
+
+# --- Pruebas ---
+
+def test_load_single_json_file_filters_invalid_items():
+    """Se devuelven solo los items válidos; estructura o JSON inválidos dan None."""
+    assert [qa["q"] for qa in load_single_json_file(_MIXED_BYTES)] == ["P3"]
+    assert load_single_json_file(b"[]") == []
+    assert load_single_json_file(_NOT_A_LIST_BYTES) is None
+    assert load_single_json_file(_BAD_BYTES) is None
+
+def test_load_single_json_file_from_bytes_records_hash():
+    """Con bytes también se calcula el hash del contenido, bajo la clave indicada."""
+    file_hashes = {}
+    assert len(load_single_json_file(_VALID_BYTES, file_hashes, "faq.json")) == 2
+    assert file_hashes == {"faq.json": file_content_hash(_VALID_BYTES)}
+
+def test_load_single_json_file_from_path(input_dir):
+    """La misma validación leyendo del disco; una ruta inexistente da None."""
+    assert [qa["q"] for qa in load_single_json_file(input_dir / "sub" / "mixed.json")] == ["P3"]
+    assert load_single_json_file(input_dir / "bad.json") is None
+    assert load_single_json_file(input_dir / "no_existe.json") is None
+
+def test_load_all_qas_from_directory_uses_relative_paths_and_hashes(input_dir):
+    """Las claves son rutas relativas y file_hashes recibe el hash de cada archivo leído."""
+    file_hashes = {}
+    result = load_all_qas_from_directory(input_dir, file_hashes)
+    assert sorted(result) == ["sub/mixed.json", "valid.json"]
+    assert [qa["q"] for qa in result["valid.json"]] == ["P1", "P2"]
+    assert set(file_hashes) == {"valid.json", "empty.json", "not_a_list.json", "bad.json", "sub/mixed.json"}
+    assert file_hashes["valid.json"] == file_content_hash((input_dir / "valid.json").read_bytes())
+
+def test_load_all_qas_from_directory_parallel_matches_serial(input_dir, monkeypatch):
+    """La carga en el pool de hilos da el mismo resultado, en el mismo orden, que en serie."""
+    from kelly_indexer import data_loader
+    for i in range(20):
+        (input_dir / "sub" / f"extra_{i}.json").write_text(json.dumps([_qa(f"E{i}")]), encoding="utf-8")
+    serial_hashes, parallel_hashes = {}, {}
+    serial = load_all_qas_from_directory(input_dir, serial_hashes)
+    monkeypatch.setattr(data_loader, "PARALLEL_LOAD_MIN_FILES", 1)
+    parallel = load_all_qas_from_directory(input_dir, parallel_hashes)
+    assert list(parallel.items()) == list(serial.items())
+    assert parallel_hashes == serial_hashes
+
+def test_load_without_orjson(input_dir, monkeypatch):
+    """Sin orjson se parsea con json de la biblioteca estándar."""
+    from kelly_indexer import data_loader
+    monkeypatch.setattr(data_loader, "orjson", None)
+    assert sorted(load_all_qas_from_directory(input_dir)) == ["sub/mixed.json", "valid.json"]
+
+def test_load_all_qas_from_directory_processes_match_serial(input_dir, monkeypatch):
+    """El reparto entre procesos devuelve los mismos Q&A y hashes que la carga en serie."""
+    from kelly_indexer import data_loader
+    serial_hashes, process_hashes = {}, {}
+    serial = load_all_qas_from_directory(input_dir, serial_hashes)
+    monkeypatch.setattr(data_loader, "PROCESS_LOAD_MIN_FILES", 1)
+    monkeypatch.setattr(data_loader, "PROCESS_LOAD_CHUNKSIZE", 2)
+    monkeypatch.setattr(data_loader.os, "cpu_count", lambda: 2)
+    in_processes = load_all_qas_from_directory(input_dir, process_hashes)
+    assert list(in_processes.items()) == list(serial.items())
+    assert process_hashes == serial_hashes
+
+def test_read_file_bytes_matches_read_bytes(tmp_path):
+    """La lectura con os.open/os.read devuelve exactamente los bytes del archivo."""
+    from kelly_indexer.data_loader import _read_file_bytes
+    for name, content in [("vacio.json", b""), ("datos.json", "[\"ñandú\"]\r\n".encode("utf-8") * 5000)]:
+        path = tmp_path / name
+        path.write_bytes(content)
+        assert _read_file_bytes(str(path)) == content
+
+def test_read_file_bytes_handles_short_reads(tmp_path, monkeypatch):
+    """Un read que devuelve menos bytes de los pedidos no se toma como fin del archivo."""
+    from kelly_indexer import data_loader
+    content = b"[" + b'"x",' * 100 + b'"y"]'
+    path = tmp_path / "corto.json"
+    path.write_bytes(content)
+    real_read = data_loader.os.read
+    monkeypatch.setattr(data_loader.os, "read", lambda fd, n: real_read(fd, min(n, 7)))
+    assert data_loader._read_file_bytes(str(path)) == content
+
+def test_streamed_parse_matches_full_parse(input_dir, monkeypatch):
+    """Con ijson (archivos grandes) se obtienen los mismos Q&A, errores y hashes que cargando el archivo entero."""
+    pytest.importorskip("ijson")
+    from kelly_indexer import data_loader
+    full_hashes, streamed_hashes = {}, {}
+    full = load_all_qas_from_directory(input_dir, full_hashes)
+    monkeypatch.setattr(data_loader, "STREAM_PARSE_MIN_BYTES", 0)
+    streamed = load_all_qas_from_directory(input_dir, streamed_hashes)
+    assert list(streamed.items()) == list(full.items())
+    assert streamed_hashes == full_hashes
+    assert load_single_json_file(input_dir / "bad.json") is None
+    assert load_single_json_file(input_dir / "not_a_list.json") is None
+
+def test_msgspec_validation_matches_python_validation(monkeypatch):
+    """La validación con msgspec da los mismos Q&A (con claves extra) que la validación item a item."""
+    pytest.importorskip("msgspec")
+    from kelly_indexer import data_loader
+    extra_bytes = json.dumps([{**_qa("P6"), "extra": 1}, _qa("P7")]).encode("utf-8")
+    contents = [_VALID_BYTES, _MIXED_BYTES, extra_bytes, b"[]", _NOT_A_LIST_BYTES, _BAD_BYTES]
+    with_msgspec = [load_single_json_file(raw) for raw in contents]
+    monkeypatch.setattr(data_loader, "msgspec", None)
+    assert with_msgspec == [load_single_json_file(raw) for raw in contents]
+    assert with_msgspec[2][0]["extra"] == 1
+
+def test_load_all_qas_from_directory_skips_files_with_known_stats(input_dir):
+    """Un archivo con el mismo tamaño y mtime que el conocido no se lee y aparece vacío."""
+    file_stats = {}
+    loaded = load_all_qas_from_directory(input_dir, {}, file_stats)
+    assert set(file_stats) == {"valid.json", "empty.json", "not_a_list.json", "bad.json", "sub/mixed.json"}
+    known = {"valid.json": file_stats["valid.json"], "sub/mixed.json": (0, 0)}
+    file_hashes = {}
+    skipped = load_all_qas_from_directory(input_dir, file_hashes, {}, known)
+    assert skipped["valid.json"] == [] and "valid.json" not in file_hashes
+    assert skipped["sub/mixed.json"] == loaded["sub/mixed.json"]
+
+def test_load_all_qas_from_directory_does_not_follow_symlink_loops(input_dir):
+    """Un enlace simbólico a un directorio padre no se recorre (sin ELOOP ni resultado vacío)."""
+    try:
+        (input_dir / "sub" / "loop").symlink_to("..", target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pytest.skip("No se pueden crear enlaces simbólicos en este sistema")
+    result = load_all_qas_from_directory(input_dir)
+    assert sorted(result) == ["sub/mixed.json", "valid.json"]
@@ -0,0 +1,80 @@
+# tests/test_logging_setup.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para el módulo utils.logging_setup de Kelly Indexer.
+Verifica el comportamiento del logging a archivo en procesos hijos (fork).
+"""
+
+import logging
+import os
+import time
+import pytest
+from pathlib import Path
+
+try:
+    from kelly_indexer.utils import logging_setup
+    from kelly_indexer.utils.logging_setup import setup_logging
+except ImportError:
+     pytest.fail("No se pudo importar desde 'kelly_indexer.utils.logging_setup'. Asegúrate de la estructura y PYTHONPATH.", pytrace=False)
+
+
+@pytest.fixture
+def log_file(tmp_path: Path):
+    path = tmp_path / "indexer.log"
+    setup_logging("INFO", path, force=True)
+    yield path
+    setup_logging("INFO", None, force=True) # Cierra (y vuelca) los handlers del archivo
+
+
+def _wait_until_buffered(message: str) -> None:
+    """Espera a que el hilo del listener deje el registro en el buffer del MemoryHandler."""
+    buffer_handler = logging_setup._file_handler_spec[2]
+    deadline = time.monotonic() + 5
+    while not any(record.getMessage() == message for record in buffer_handler.buffer):
+        assert time.monotonic() < deadline, "El registro no llegó al buffer del archivo"
+        time.sleep(0.01)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Requiere os.fork")
+def test_forked_child_neither_duplicates_parent_buffer_nor_loses_its_records(log_file: Path):
+    logging.getLogger("test.parent").info("parent-before-fork")
+    _wait_until_buffered("parent-before-fork")
+
+    pids = []
+    for i in range(2):
+        pid = os.fork()
+        if pid == 0: # Hijo: como un worker del pool, termina con os._exit sin volcar nada
+            try:
+                logging.getLogger("test.child").info("child-%d", i)
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+    setup_logging("INFO", None, force=True)
+    content = log_file.read_text(encoding="utf-8")
+    assert content.count("parent-before-fork") == 1
+    assert content.count("child-0") == 1
+    assert content.count("child-1") == 1
+
+def test_setup_logging_does_not_disable_levels_globally():
+    """El nivel se aplica al logger raíz: un logger con nivel propio más bajo sigue emitiendo."""
+    setup_logging("WARNING", None, force=True)
+    try:
+        assert logging.root.manager.disable == logging.NOTSET
+        child = logging.getLogger("test.verbose")
+        child.setLevel(logging.DEBUG)
+        assert child.isEnabledFor(logging.DEBUG)
+    finally:
+        logging.getLogger("test.verbose").setLevel(logging.NOTSET)
+        setup_logging("INFO", None, force=True)
+
+def test_setup_logging_leaves_logrecord_globals_alone():
+    """Configurar no toca los ajustes globales de logging (otros handlers pueden usar línea, hilo o stack_info)."""
+    srcfile, threads, processes = logging._srcfile, logging.logThreads, logging.logProcesses
+    setup_logging("INFO", None, force=True)
+    assert (logging._srcfile, logging.logThreads, logging.logProcesses) == (srcfile, threads, processes)
+    record = logging.getLogger("test.caller").makeRecord("test.caller", logging.INFO, __file__, 1, "m", (), None)
+    assert record.thread is not None
@@ -0,0 +1,117 @@
+# tests/test_qdrant_ops.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para el módulo qdrant_ops de Kelly Indexer.
+Verifica los reintentos de batch_upsert con un cliente Qdrant falso (sin servidor).
+"""
+
+import pytest
+
+pytest.importorskip("qdrant_client", reason="Requiere qdrant-client")
+
+from httpx import Headers
+from qdrant_client import models
+from qdrant_client.http.exceptions import UnexpectedResponse, ResponseHandlingException
+
+try:
+    from kelly_indexer import qdrant_ops
+    from kelly_indexer.qdrant_ops import batch_upsert, ensure_collection, invalidate_collection_cache
+except ImportError:
+     pytest.fail("No se pudo importar desde 'kelly_indexer.qdrant_ops'. Asegúrate de la estructura y PYTHONPATH.", pytrace=False)
+
+
+class _FakeClient:
+    """Cliente falso: cada upsert lanza el siguiente error de `errors` y, agotados, responde COMPLETED."""
+
+    def __init__(self, *errors: Exception) -> None:
+        self.errors = list(errors)
+        self.calls = 0
+
+    def upsert(self, collection_name, points, wait=True):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return models.UpdateResult(operation_id=self.calls, status=models.UpdateStatus.COMPLETED)
+
+class _FakeCollectionsClient:
+    """Cliente falso con las colecciones en un dict {nombre -> kwargs de creación}."""
+
+    def __init__(self, *existing: str) -> None:
+        self.collections = {name: {} for name in existing}
+
+    def collection_exists(self, collection_name):
+        return collection_name in self.collections
+
+    def create_collection(self, collection_name, vectors_config, **kwargs):
+        self.collections[collection_name] = kwargs
+
+def _points(n: int = 3):
+    return [models.PointStruct(id=i, vector=[0.1, 0.2], payload={"q": f"P{i}"}) for i in range(n)]
+
+def _response_error(status_code: int, headers=None) -> UnexpectedResponse:
+    return UnexpectedResponse(status_code, "", b"{}", Headers(headers or {}))
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Registra las esperas entre reintentos sin dormir."""
+    delays = []
+    monkeypatch.setattr(qdrant_ops.time, "sleep", delays.append)
+    return delays
+
+# --- Pruebas ---
+
+def test_batch_upsert_retries_429_honouring_retry_after(sleeps):
+    """Un 429 se reintenta esperando lo indicado por Retry-After."""
+    client = _FakeClient(_response_error(429, {"Retry-After": "7"}))
+    assert batch_upsert(client, "col", _points(), max_retries=2) == (3, 0)
+    assert client.calls == 2
+    assert sleeps == [7.0]
+
+def test_batch_upsert_does_not_retry_400(sleeps):
+    """Un 400 (petición inválida) marca el lote como fallido sin reintentar."""
+    client = _FakeClient(_response_error(400))
+    assert batch_upsert(client, "col", _points(), max_retries=2) == (0, 3)
+    assert client.calls == 1
+    assert sleeps == []
+
+def test_batch_upsert_retries_connection_errors(sleeps):
+    """Los fallos de transporte del cliente (ResponseHandlingException) y de conexión se reintentan."""
+    client = _FakeClient(ResponseHandlingException(ConnectionRefusedError()), ConnectionError())
+    assert batch_upsert(client, "col", _points(), max_retries=2, retry_delay=0) == (3, 0)
+    assert client.calls == 3
+    assert len(sleeps) == 2
+
+def test_batch_upsert_gives_up_after_max_retries(sleeps):
+    """Si el error transitorio persiste, el lote se da por fallido tras max_retries reintentos."""
+    client = _FakeClient(*[ResponseHandlingException(TimeoutError())] * 3)
+    assert batch_upsert(client, "col", _points(), max_retries=1, retry_delay=0) == (0, 3)
+    assert client.calls == 2
+
+def test_ensure_collection_reports_only_collections_it_creates(sleeps):
+    """created_collections recibe la colección solo si esta llamada la crea (con bulk_load sin indexar)."""
+    invalidate_collection_cache()
+    client = _FakeCollectionsClient("existente")
+    created = set()
+    assert ensure_collection(client, "existente", 4, bulk_load=True, created_collections=created)
+    assert ensure_collection(client, "nueva", 4, bulk_load=True, created_collections=created)
+    assert created == {"nueva"}
+    assert client.collections["nueva"]["optimizers_config"].indexing_threshold == 0
+    assert ensure_collection(client, "nueva", 4, created_collections=created) # Caché: no se vuelve a crear
+    assert created == {"nueva"}
+    invalidate_collection_cache()
+
+def test_status_ok_accepts_subclasses_and_duck_typed_results():
+    """Se acepta cualquier respuesta con .status COMPLETED o un dict con status 'ok' (también subclases)."""
+    class _Result(models.UpdateResult):
+        pass
+    class _Dict(dict):
+        pass
+    class _Duck:
+        status = models.UpdateStatus.COMPLETED
+    assert qdrant_ops._status_ok(_Result(operation_id=1, status=models.UpdateStatus.COMPLETED))
+    assert qdrant_ops._status_ok(_Dict(status="ok"))
+    assert qdrant_ops._status_ok(_Duck())
+    assert not qdrant_ops._status_ok(models.UpdateResult(operation_id=1, status=models.UpdateStatus.ACKNOWLEDGED))
+    assert not qdrant_ops._status_ok({"status": "error"})
+    assert not qdrant_ops._status_ok(None)
@@ -0,0 +1,559 @@
+# tests/test_state_manager.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para el módulo state_manager de Kelly Indexer.
+Verifica hashes, IDs deterministas, carga/guardado de estado y cálculo de diff.
+"""
+
+import json
+import base64
+import uuid
+import hashlib
+import pytest
+from pathlib import Path
+
+# Importar funciones del módulo state_manager
+# Asumiendo que pytest corre desde la raíz y src está en PYTHONPATH
+try:
+    from kelly_indexer.state_manager import (
+        QDRANT_POINT_NAMESPACE,
+        STATE_FILE_VERSION,
+        CONTENT_HASH_SIZE,
+        DEFAULT_HASH_ALGORITHM,
+        IndexedPoints,
+        PointDetail,
+        generate_content_hash,
+        generate_content_hashes_batch,
+        generate_qa_uuid,
+        generate_qa_uuids_batch,
+        generate_file_qa_uuids,
+        load_state,
+        save_state,
+        save_state_incremental,
+        compact_state,
+        state_log_path,
+        calculate_diff,
+        state_points_for_file,
+    )
+except ImportError:
+     pytest.fail("No se pudo importar desde 'kelly_indexer.state_manager'. Asegúrate de la estructura y PYTHONPATH.", pytrace=False)
+
+
+# --- Datos de prueba ---
+Q1, F1 = "¿Cómo funciona?", "docs/faq.json"
+Q2, F2 = "¿Cómo funciona?", "docs/manual.json" # Misma pregunta, otro archivo
+Q3 = "¿Cómo funciona esto?"
+Q4, F4 = "Nueva pregunta", "docs/nuevo.json"
+
+ID1 = generate_qa_uuid(Q1, F1)
+ID2 = generate_qa_uuid(Q2, F2)
+ID3 = generate_qa_uuid(Q3, F1)
+ID4 = generate_qa_uuid(Q4, F4)
+HASH1 = generate_content_hash(Q1)
+HASH3 = generate_content_hash(Q3)
+
+def _qa(question: str) -> dict:
+    """Crea un Q&A mínimo válido con la pregunta dada."""
+    return {"q": question, "a": "Respuesta", "product": "P", "keywords": []}
+
+
+# --- Pruebas de Hashing e IDs ---
+
+def test_generate_content_hash_consistency():
+    """El hash depende solo del contenido y es binario de CONTENT_HASH_SIZE bytes."""
+    assert generate_content_hash(Q1) == generate_content_hash(Q2)
+    assert generate_content_hash(Q1) != generate_content_hash(Q3)
+    assert isinstance(HASH1, bytes) and len(HASH1) == CONTENT_HASH_SIZE
+    assert generate_content_hash(Q1, "sha256") == hashlib.sha256(Q1.encode("utf-8")).digest()[:CONTENT_HASH_SIZE]
+
+def test_generate_content_hash_memoizes_repeated_texts():
+    """Un texto repetido se hashea una sola vez por algoritmo."""
+    from kelly_indexer import state_manager
+    state_manager._content_hash_cached.cache_clear()
+    assert generate_content_hash(Q1) == generate_content_hash(Q1, DEFAULT_HASH_ALGORITHM) == HASH1
+    assert state_manager._content_hash_cached.cache_info().hits == 1
+
+def test_generate_content_hash_blake2b():
+    """blake2b_128 (sin dependencias opcionales) es el BLAKE2b de 16 bytes del texto."""
+    assert generate_content_hash(Q1, "blake2b_128") == hashlib.blake2b(Q1.encode("utf-8"), digest_size=CONTENT_HASH_SIZE).digest()
+    assert generate_content_hash(Q1, "blake2b_128") != generate_content_hash(Q3, "blake2b_128")
+
+def test_generate_content_hash_xxh3():
+    """Con xxhash instalado, xxh3_128 es el algoritmo por defecto."""
+    xxhash = pytest.importorskip("xxhash")
+    assert DEFAULT_HASH_ALGORITHM == "xxh3_128"
+    assert HASH1 == xxhash.xxh3_128_digest(Q1.encode("utf-8"))
+
+def test_generate_content_hash_blake3():
+    """blake3_128 es el BLAKE3 de 16 bytes del texto."""
+    blake3 = pytest.importorskip("blake3")
+    assert generate_content_hash(Q1, "blake3_128") == blake3.blake3(Q1.encode("utf-8")).digest(length=CONTENT_HASH_SIZE)
+
+def test_generate_content_hashes_batch_matches_single():
+    """La versión por lotes devuelve lo mismo que llamar uno a uno."""
+    texts = [Q1, Q3, Q4, ""]
+    assert generate_content_hashes_batch(texts) == [generate_content_hash(t) for t in texts]
+    assert generate_content_hashes_batch([]) == []
+
+def test_generate_content_hashes_batch_threaded(monkeypatch):
+    """Con textos largos el lote se hashea en hilos, con el mismo resultado y orden."""
+    from kelly_indexer import state_manager
+    monkeypatch.setattr(state_manager, "THREADED_HASH_MIN_TOTAL_BYTES", 0)
+    monkeypatch.setattr(state_manager.os, "cpu_count", lambda: 4)
+    texts = [Q1 * 500, Q3 * 500, Q4 * 500]
+    assert generate_content_hashes_batch(texts) == [generate_content_hash(t) for t in texts]
+
+def test_generate_qa_uuid_deterministic():
+    """El ID depende de pregunta y archivo, y normaliza separadores de ruta."""
+    assert generate_qa_uuid(Q1, F1) == ID1
+    assert ID1 != ID2
+    assert generate_qa_uuid(Q1, "docs\\faq.json") == ID1
+
+def test_generate_qa_uuid_matches_uuid5():
+    """La generación manual de UUID v5 coincide con uuid.uuid5 (IDs ya indexados no cambian)."""
+    for question, path in [(Q1, F1), (Q3, F1), (Q4, F4), ("", "x.json")]:
+        expected = str(uuid.uuid5(QDRANT_POINT_NAMESPACE, f"question:{question}|source:{path}"))
+        assert generate_qa_uuid(question, path) == expected
+    assert generate_qa_uuids_batch([(Q1, F1), (Q1, "docs\\faq.json"), (Q4, F4)]) == [ID1, ID1, ID4]
+    assert generate_file_qa_uuids([Q1, Q3], "docs\\faq.json") == [ID1, ID3]
+
+
+# --- Pruebas de Carga/Guardado ---
+
+def test_load_state_missing_file(tmp_path):
+    """Si el archivo no existe se devuelve un estado inicial vacío."""
+    state = load_state(tmp_path / "no_existe.json")
+    assert state["indexed_points"] == {}
+    assert state["version"] == STATE_FILE_VERSION
+
+def test_load_save_state(tmp_path):
+    """Un estado guardado se recupera igual al recargarlo."""
+    state_path = tmp_path / "state.json"
+    points = {
+        ID1: PointDetail(F1, HASH1),
+        ID3: PointDetail(F1, HASH3),
+    }
+    assert save_state(state_path, {"indexed_points": points})
+    loaded = load_state(state_path)
+    assert loaded["version"] == STATE_FILE_VERSION
+    assert loaded["last_run_utc"] is not None
+    assert loaded["indexed_points"] == points
+    # En disco se guarda en columnas, con los hashes concatenados en base64
+    on_disk = json.loads(state_path.read_text(encoding="utf-8"))
+    assert on_disk["points"]["ids"] == [ID1, ID3]
+    assert on_disk["points"]["source_file_runs"] == [[F1, 2]]
+    assert base64.b64decode(on_disk["points"]["question_hashes"]) == HASH1 + HASH3
+
+def test_indexed_points_mapping_interface():
+    """IndexedPoints se comporta como un dict de solo lectura {id: detalles}."""
+    points = IndexedPoints()
+    points.set(ID1, F1, HASH1)
+    points.set(ID3, F1, b"invalido")  # Hash inválido -> se guarda como nulo
+    points.set(ID1, F4, HASH1)        # Actualización: no duplica
+    assert len(points) == 2 and list(points) == [ID1, ID3]
+    assert points[ID1] == PointDetail(F4, HASH1)
+    assert points.get_hash(ID3) == bytes(CONTENT_HASH_SIZE)
+    assert points.get_hash(ID4) is None and ID4 not in points
+    assert IndexedPoints.from_columns(*points.columns()) == points
+
+def test_indexed_points_extend():
+    """extend() añade en bloque y, con IDs repetidos o ya existentes, actualiza como set()."""
+    points = IndexedPoints()
+    points.extend([ID1, ID3], F1, [HASH1, HASH3])
+    points.extend([ID3, ID4], F4, [HASH1, HASH1])  # ID3 ya existe -> se actualiza
+    assert list(points) == [ID1, ID3, ID4]
+    assert points[ID3] == PointDetail(F4, HASH1)
+    assert points.get_hash(ID1) == HASH1
+
+def test_indexed_points_copy_rows_contiguous_and_scattered():
+    """copy_rows da el mismo resultado con filas contiguas (por rebanadas) o salteadas."""
+    source = IndexedPoints()
+    source.extend([ID1, ID3], F1, [HASH1, HASH3])
+    source.set(ID4, F4, HASH1)
+    contiguous = IndexedPoints()
+    contiguous.copy_rows(source, [0, 1])
+    assert dict(contiguous) == {ID1: PointDetail(F1, HASH1), ID3: PointDetail(F1, HASH3)}
+    scattered = IndexedPoints()
+    scattered.copy_rows(source, [0, 2])
+    assert dict(scattered) == {ID1: PointDetail(F1, HASH1), ID4: PointDetail(F4, HASH1)}
+
+def test_state_points_for_file_uses_cached_index():
+    """El índice archivo -> IDs se reutiliza y se invalida al modificar el registro."""
+    points = IndexedPoints()
+    points.extend([ID1, ID3], F1, [HASH1, HASH3])
+    assert state_points_for_file({"indexed_points": points}, F1) == [ID1, ID3]
+    assert points.indices_by_file() is points.indices_by_file()
+    points.discard(ID1)
+    assert points.point_ids_for_file(F1) == [ID3]
+    legacy = {"indexed_points": {ID4: {"source_file": F4, "question_hash": HASH1}}}
+    assert state_points_for_file(legacy, F4) == [ID4] and state_points_for_file(legacy, F1) == []
+
+def test_load_save_state_without_orjson(tmp_path, monkeypatch):
+    """Sin orjson se usa json de la stdlib y el resultado es el mismo."""
+    from kelly_indexer import state_manager
+    monkeypatch.setattr(state_manager, "orjson", None)
+    state_path = tmp_path / "state.json"
+    points = {ID1: PointDetail(F1, HASH1)}
+    assert save_state(state_path, {"indexed_points": points})
+    assert load_state(state_path)["indexed_points"] == points
+
+def test_load_state_streaming_matches_full_load(tmp_path, monkeypatch):
+    """La carga en streaming (ijson) produce el mismo estado que la carga completa."""
+    pytest.importorskip("ijson")
+    from kelly_indexer import state_manager
+    state_path = tmp_path / "state.json"
+    _, _, points = calculate_diff({F1: [_qa(Q1), _qa(Q3)]}, {}, current_file_hashes={F1: b"h" * 16},
+                                  current_file_stats={F1: (120, 1_700_000_000_000_000_000)})
+    assert save_state(state_path, {"indexed_points": points})
+    full = load_state(state_path)
+    monkeypatch.setattr(state_manager, "STREAMING_LOAD_MIN_BYTES", 0)
+    streamed = load_state(state_path)
+    assert streamed == full
+    for attr in ("file_digests", "file_hashes", "file_stats", "hash_algorithm"):
+        assert getattr(streamed["indexed_points"], attr) == getattr(full["indexed_points"], attr)
+
+def test_load_state_migrates_legacy_hex_hashes(tmp_path):
+    """Un estado 1.0 (SHA-256 completo en hex) se migra sin provocar reindexación."""
+    state_path = tmp_path / "state.json"
+    legacy = {
+        "version": "1.0",
+        "last_run_utc": None,
+        "indexed_points": {ID1: {"source_file": F1, "question_hash": hashlib.sha256(Q1.encode("utf-8")).hexdigest()}},
+    }
+    state_path.write_text(json.dumps(legacy), encoding="utf-8")
+    loaded = load_state(state_path)
+    assert loaded["version"] == STATE_FILE_VERSION
+    assert loaded["indexed_points"].hash_algorithm == "sha256"
+    assert loaded["indexed_points"][ID1].question_hash == generate_content_hash(Q1, "sha256")
+    to_process, to_delete, _ = calculate_diff({F1: [_qa(Q1)]}, loaded["indexed_points"])
+    assert to_process == [] and to_delete == []
+
+def test_calculate_diff_keeps_previous_hash_algorithm(tmp_path):
+    """El diff usa el algoritmo del estado previo (y lo conserva) para no reprocesar todo."""
+    state_path = tmp_path / "state.json"
+    points = IndexedPoints()
+    points.hash_algorithm = "sha256"
+    points.set(ID1, F1, generate_content_hash(Q1, "sha256"))
+    assert save_state(state_path, {"indexed_points": points})
+    loaded = load_state(state_path)["indexed_points"]
+    assert loaded.hash_algorithm == "sha256"
+    to_process, _, details = calculate_diff({F1: [_qa(Q1)]}, loaded)
+    assert to_process == [] and details.hash_algorithm == "sha256"
+
+def test_load_state_invalid_json(tmp_path):
+    """Un archivo corrupto produce un estado inicial vacío (sin excepción)."""
+    state_path = tmp_path / "state.json"
+    state_path.write_text("{esto no es json", encoding="utf-8")
+    assert load_state(state_path)["indexed_points"] == {}
+
+def test_load_state_empty_file(tmp_path):
+    """Un archivo vacío (no mapeable en memoria) también produce un estado inicial."""
+    state_path = tmp_path / "state.json"
+    state_path.write_bytes(b"")
+    assert load_state(state_path)["indexed_points"] == {}
+
+def test_load_state_wrong_structure(tmp_path):
+    """Si 'indexed_points' no es un dict se reinicia a vacío."""
+    state_path = tmp_path / "state.json"
+    state_path.write_text(json.dumps({"version": STATE_FILE_VERSION, "indexed_points": []}), encoding="utf-8")
+    assert load_state(state_path)["indexed_points"] == {}
+
+
+# --- Pruebas de Diff ---
+
+def test_calculate_diff_initial_run():
+    """Sin estado previo, todos los Q&A válidos se procesan y nada se elimina."""
+    to_process, to_delete, details = calculate_diff({F1: [_qa(Q1), _qa(Q3)]}, {})
+    assert {item.point_id for item in to_process} == {ID1, ID3}
+    assert to_delete == []
+    assert set(details) == {ID1, ID3}
+
+def test_calculate_diff_no_changes():
+    """Si nada cambió no hay nada que procesar ni eliminar."""
+    previous = {ID1: PointDetail(F1, HASH1)}
+    to_process, to_delete, details = calculate_diff({F1: [_qa(Q1)]}, previous)
+    assert to_process == []
+    assert to_delete == []
+    assert details == previous
+
+def test_calculate_diff_logic():
+    """Detecta nuevos, modificados (hash distinto) y eliminados."""
+    previous = {
+        ID1: {"source_file": F1, "question_hash": HASH1},              # Sin cambios
+        ID2: {"source_file": F2, "question_hash": HASH1},              # Eliminado
+        ID3: {"source_file": F1, "question_hash": b"hash_anterior!!"},  # Modificado
+    }
+    current = {F1: [_qa(Q1), _qa(Q3)], F4: [_qa(Q4)]}
+    to_process, to_delete, details = calculate_diff(current, previous)
+
+    processed = {item.point_id: item for item in to_process}
+    assert set(processed) == {ID3, ID4}
+    assert processed[ID3].question_hash == HASH3
+    assert processed[ID4].source_file == F4
+    assert processed[ID4].qa_item == current[F4][0] and "_id" not in processed[ID4].qa_item  # Sin enriquecer
+    assert to_delete == [ID2]
+    assert set(details) == {ID1, ID3, ID4}
+    assert details[ID1] == PointDetail(F1, HASH1)
+
+def test_calculate_diff_item_missing_required_fields():
+    """Items sin 'q' válida se ignoran sin afectar al resto."""
+    current = {F1: [_qa(Q1), {"a": "sin pregunta"}, {"q": None}, {"q": 123}, {"q": ""}, "no es un dict"]}
+    to_process, to_delete, details = calculate_diff(current, {})
+    assert [item.point_id for item in to_process] == [ID1]
+    assert set(details) == {ID1}
+
+def test_calculate_diff_normalizes_windows_paths():
+    """Rutas con '\\' generan los mismos IDs que con '/' (la ruta original se conserva en detalles)."""
+    to_process, _, details = calculate_diff({"docs\\faq.json": [_qa(Q1)]}, {})
+    assert [item.point_id for item in to_process] == [ID1]
+    assert details[ID1].source_file == "docs\\faq.json"
+
+def test_calculate_diff_new_file_quick_filter():
+    """Un archivo sin puntos previos se marca entero como nuevo; el mismo archivo con otra barra no."""
+    previous = IndexedPoints.from_dict({ID1: PointDetail("docs\\faq.json", HASH1)})
+    previous.hash_algorithm = DEFAULT_HASH_ALGORITHM
+    to_process, _, _ = calculate_diff({"docs/faq.json": [_qa(Q1)], F4: [_qa(Q4)]}, previous)
+    assert [item.point_id for item in to_process] == [ID4]
+
+def test_calculate_diff_reuses_previous_hashes(monkeypatch):
+    """En un archivo ya conocido solo se hashean las preguntas con ID nuevo."""
+    from kelly_indexer import state_manager
+    _, _, previous = calculate_diff({F1: [_qa(Q1)]}, {})
+    hashed: list = []
+    original = state_manager.generate_content_hashes_batch
+    def _spy(contents, algorithm=None):
+        hashed.extend(contents)
+        return original(contents, algorithm)
+    monkeypatch.setattr(state_manager, "generate_content_hashes_batch", _spy)
+    to_process, _, details = calculate_diff({F1: [_qa(Q1), _qa(Q3)]}, previous)
+    assert hashed == [Q3]
+    assert [item.point_id for item in to_process] == [ID3]
+    assert details[ID1].question_hash == HASH1 and details[ID3].question_hash == HASH3
+
+def test_calculate_diff_numpy_gather_matches_per_point(monkeypatch):
+    """Recoger los hashes previos con numpy da el mismo diff que punto a punto."""
+    pytest.importorskip("numpy")
+    from kelly_indexer import state_manager
+    previous = IndexedPoints.from_dict({ID1: PointDetail(F1, HASH1), ID3: PointDetail(F1, b"invalido")})
+    previous.hash_algorithm = DEFAULT_HASH_ALGORITHM
+    current = {F1: [_qa(Q1), _qa(Q3), _qa(Q4)]}
+    expected = calculate_diff(current, previous)
+    monkeypatch.setattr(state_manager, "NUMPY_GATHER_MIN_POINTS", 1)
+    to_process, to_delete, details = calculate_diff(current, previous)
+    assert to_process == expected[0] and to_delete == expected[1]
+    assert list(details.items()) == list(expected[2].items())
+    assert {item.point_id for item in to_process} == {ID3, generate_qa_uuid(Q4, F1)}
+
+def test_calculate_diff_deletions_keep_previous_order():
+    """Los IDs a eliminar salen en el orden del estado previo (resultado determinista)."""
+    previous = IndexedPoints.from_dict({ID4: PointDetail(F4, HASH1), ID1: PointDetail(F1, HASH1), ID2: PointDetail(F2, HASH1)})
+    previous.hash_algorithm = DEFAULT_HASH_ALGORITHM
+    _, to_delete, _ = calculate_diff({F1: [_qa(Q1)]}, previous)
+    assert to_delete == [ID4, ID2]
+
+def test_calculate_diff_skips_unchanged_files(tmp_path):
+    """Archivos con el mismo digest se copian del estado previo; los modificados se recalculan."""
+    current = {F1: [_qa(Q1), _qa(Q3)], F4: [_qa(Q4)]}
+    _, _, first_details = calculate_diff(current, {})
+    state_path = tmp_path / "state.json"
+    assert save_state(state_path, {"indexed_points": first_details})
+    previous = load_state(state_path)["indexed_points"]
+    assert set(previous.file_digests) == {F1, F4}
+
+    to_process, to_delete, details = calculate_diff(current, previous)
+    assert to_process == [] and to_delete == []
+    assert details == first_details
+
+    # Cambiar una pregunta de F4: solo ese archivo se recalcula
+    to_process, to_delete, details = calculate_diff({F1: [_qa(Q1), _qa(Q3)], F4: [_qa("Otra pregunta")]}, previous)
+    assert [item.source_file for item in to_process] == [F4]
+    assert to_delete == [ID4]
+    assert details[ID1] == first_details[ID1]
+
+def test_calculate_diff_skips_files_with_same_bytes_hash(tmp_path, monkeypatch):
+    """Un archivo con el mismo hash de bytes que en el estado previo no se recorre."""
+    from kelly_indexer import state_manager
+    current = {F1: [_qa(Q1), _qa(Q3)]}
+    file_hashes = {F1: b"\x01" * 16}
+    _, _, first_details = calculate_diff(current, {}, current_file_hashes=file_hashes)
+    state_path = tmp_path / "state.json"
+    assert save_state(state_path, {"indexed_points": first_details})
+    previous = load_state(state_path)["indexed_points"]
+    assert previous.file_hashes == file_hashes
+
+    monkeypatch.setattr(state_manager, "_file_digest", lambda *a, **k: pytest.fail("no debería calcular el digest"))
+    to_process, to_delete, details = calculate_diff(current, previous, current_file_hashes=file_hashes)
+    assert to_process == [] and to_delete == []
+    assert details == first_details and details.file_hashes == file_hashes
+
+def test_save_state_stale_precondition(tmp_path):
+    """Si otro proceso reescribió el estado desde la carga, save_state no lo pisa."""
+    state_path = tmp_path / "state.json"
+    assert save_state(state_path, {"indexed_points": {ID1: PointDetail(F1, HASH1)}})
+    loaded = load_state(state_path)
+    assert loaded["file_sha256"] == hashlib.sha256(state_path.read_bytes()).hexdigest()
+    assert save_state(state_path, {"indexed_points": {ID3: PointDetail(F1, HASH3)}})  # Otro proceso
+    assert not save_state(state_path, loaded, expected_prev_sha256=loaded["file_sha256"])
+    assert set(load_state(state_path)["indexed_points"]) == {ID3}
+    assert list(tmp_path.glob("*.tmp")) == []
+
+def test_save_state_without_fsync(tmp_path, monkeypatch):
+    """Con durable=False no se hace fsync, y el estado se guarda y recarga igual."""
+    from kelly_indexer import state_manager
+    def _no_fsync(*args):
+        pytest.fail("no debería hacer fsync")
+    monkeypatch.setattr(state_manager.os, "fsync", _no_fsync)
+    monkeypatch.setattr(state_manager, "_fsync_directory", _no_fsync)
+    state_path = tmp_path / "state.json"
+    points = {ID1: PointDetail(F1, HASH1)}
+    assert save_state(state_path, {"indexed_points": points}, durable=False)
+    assert load_state(state_path)["indexed_points"] == points
+
+def test_save_state_compact_and_pretty(tmp_path):
+    """Por defecto el JSON se guarda compacto; pretty=True lo indenta. Ambos se cargan igual."""
+    points = {ID1: PointDetail(F1, HASH1)}
+    compact_path, pretty_path = tmp_path / "compact.json", tmp_path / "pretty.json"
+    assert save_state(compact_path, {"indexed_points": points})
+    assert save_state(pretty_path, {"indexed_points": points}, pretty=True)
+    assert "\n" not in compact_path.read_text(encoding="utf-8").strip()
+    assert "\n  " in pretty_path.read_text(encoding="utf-8")
+    assert load_state(compact_path)["indexed_points"] == load_state(pretty_path)["indexed_points"] == points
+
+def test_save_state_streamed_chunks_match_single_dump():
+    """La escritura por trozos produce exactamente el mismo JSON/msgpack que serializar de una vez."""
+    from kelly_indexer import state_manager
+    state = {"version": STATE_FILE_VERSION, "last_run_utc": None,
+             "points": {"ids": [ID1, ID3], "source_files": [F1, F1], "question_hashes": "AAAA", "file_digests": {}}}
+    assert b"".join(state_manager._iter_state_chunks(state)) == state_manager._json_dumps(state)
+    if state_manager.msgpack is not None:
+        chunks = state_manager._iter_state_chunks(state, use_msgpack=True)
+        assert b"".join(chunks) == state_manager.msgpack.packb(state, use_bin_type=True)
+
+def test_save_state_zstd_roundtrip(tmp_path):
+    """Una ruta terminada en .zst guarda el estado comprimido y lo carga igual."""
+    zstd = pytest.importorskip("zstandard")
+    points = {ID1: PointDetail(F1, HASH1)}
+    state_path = tmp_path / "state.json.zst"
+    assert save_state(state_path, {"indexed_points": points})
+    raw = state_path.read_bytes()
+    assert json.loads(zstd.ZstdDecompressor().stream_reader(raw).read())["points"]["ids"] == [ID1]
+    assert load_state(state_path)["indexed_points"] == points
+    assert state_log_path(state_path).name == "state_log.ndjson"
+
+def test_save_state_msgpack_roundtrip(tmp_path):
+    """Una ruta .msgpack guarda el estado en binario (hashes como bytes) y lo carga igual."""
+    msgpack = pytest.importorskip("msgpack")
+    points = IndexedPoints.from_dict({ID1: PointDetail(F1, HASH1), ID3: PointDetail(F1, HASH3)})
+    state_path = tmp_path / "state.msgpack"
+    assert save_state(state_path, {"indexed_points": points})
+    raw = msgpack.unpackb(state_path.read_bytes(), raw=False)
+    assert raw["points"]["question_hashes"] == HASH1 + HASH3
+    assert load_state(state_path)["indexed_points"] == points
+    assert state_log_path(state_path).name == "state_log.ndjson"
+
+def test_load_state_reads_per_point_source_files(tmp_path):
+    """Un estado 3.0 (archivo fuente por punto, sin tramos) se sigue cargando."""
+    state_path = tmp_path / "state.json"
+    state_path.write_text(json.dumps({"version": "3.0", "points": {
+        "ids": [ID1, ID4], "source_files": [F1, F4],
+        "question_hashes": base64.b64encode(HASH1 + HASH1).decode("ascii")}}), encoding="utf-8")
+    loaded = load_state(state_path)
+    assert loaded["version"] == STATE_FILE_VERSION
+    assert dict(loaded["indexed_points"]) == {ID1: PointDetail(F1, HASH1), ID4: PointDetail(F4, HASH1)}
+
+def test_load_state_interns_source_files(tmp_path):
+    """Las filas de un mismo archivo comparten el mismo objeto str tras cargar."""
+    state_path = tmp_path / "state.json"
+    _, _, details = calculate_diff({F1: [_qa(Q1), _qa(Q3)]}, {})
+    assert save_state(state_path, {"indexed_points": details})
+    loaded = load_state(state_path)["indexed_points"]
+    assert loaded[ID1].source_file is loaded[ID3].source_file
+    # Las claves de los digests por archivo son el mismo objeto que el de las filas
+    assert next(iter(loaded.file_digests)) is loaded[ID1].source_file
+
+def test_save_state_incremental_replay_and_compact(tmp_path):
+    """Los cambios del log se aplican al cargar; compactar los vuelca al snapshot y vacía el log."""
+    state_path = tmp_path / "state.json"
+    _, _, details = calculate_diff({F1: [_qa(Q1), _qa(Q3)]}, {})
+    assert save_state(state_path, {"indexed_points": details})
+
+    assert save_state_incremental(state_path, {ID4: PointDetail(F4, generate_content_hash(Q4))}, [ID3])
+    # Una línea truncada (corte a mitad de escritura) se ignora
+    with open(state_log_path(state_path), "ab") as f:
+        f.write(b'{"op": "add", "id"')
+
+    loaded = load_state(state_path)["indexed_points"]
+    assert set(loaded) == {ID1, ID4}
+    assert loaded[ID4].question_hash == generate_content_hash(Q4)
+    assert F1 not in loaded.file_digests  # Digest invalidado por el borrado de ID3
+
+    assert compact_state(state_path)
+    assert not state_log_path(state_path).exists()
+    assert load_state(state_path)["indexed_points"] == loaded
+
+def test_compact_state_keeps_log_when_snapshot_is_corrupt(tmp_path):
+    """Con el snapshot corrupto, el log se aplica al cargar y compactar no lo borra."""
+    state_path = tmp_path / "state.json"
+    _, _, details = calculate_diff({F1: [_qa(Q1)]}, {})
+    assert save_state(state_path, {"indexed_points": details})
+    assert save_state_incremental(state_path, {ID4: PointDetail(F4, generate_content_hash(Q4))}, [])
+    state_path.write_text("{no es json", encoding="utf-8")
+
+    loaded = load_state(state_path)
+    assert loaded["load_failed"] and set(loaded["indexed_points"]) == {ID4}
+    assert not compact_state(state_path)
+    assert state_log_path(state_path).exists()
+    assert state_path.read_text(encoding="utf-8") == "{no es json"
+
+def test_save_state_incremental_compacts_large_log(tmp_path, monkeypatch):
+    """Un log mayor que STATE_LOG_COMPACT_RATIO del snapshot se vuelca al snapshot automáticamente."""
+    from kelly_indexer import state_manager
+    state_path = tmp_path / "state.json"
+    _, _, details = calculate_diff({F1: [_qa(Q1)]}, {})
+    assert save_state(state_path, {"indexed_points": details})
+    monkeypatch.setattr(state_manager, "STATE_LOG_COMPACT_MIN_BYTES", 0)
+    monkeypatch.setattr(state_manager, "STATE_LOG_COMPACT_RATIO", 100.0)
+    assert save_state_incremental(state_path, {ID4: PointDetail(F4, generate_content_hash(Q4))}, [])
+    assert state_log_path(state_path).exists()  # Log pequeño respecto al snapshot: se mantiene
+
+    monkeypatch.setattr(state_manager, "STATE_LOG_COMPACT_RATIO", 0.25)
+    assert save_state_incremental(state_path, {}, [ID1])
+    assert not state_log_path(state_path).exists()
+    assert set(load_state(state_path)["indexed_points"]) == {ID4}
+
+def test_calculate_diff_copies_files_with_unchanged_stats(tmp_path):
+    """Un archivo no leído (mismo tamaño y mtime que en el estado previo) conserva sus puntos."""
+    state_path = tmp_path / "state.json"
+    stats = {F1: (120, 1_700_000_000_000_000_000)}
+    _, _, details = calculate_diff({F1: [_qa(Q1), _qa(Q3)]}, {}, current_file_hashes={F1: b"h" * 16}, current_file_stats=stats)
+    assert save_state(state_path, {"indexed_points": details})
+    previous = load_state(state_path)["indexed_points"]
+    assert previous.reusable_file_stats() == stats
+
+    to_process, to_delete, current = calculate_diff({F1: []}, previous, current_file_stats=stats)
+    assert to_process == [] and to_delete == []
+    assert current == previous and current.file_stats == stats
+    # Con otro mtime el archivo sí se recorre (aquí vacío): sus puntos se eliminan
+    _, to_delete, _ = calculate_diff({F1: []}, previous, current_file_stats={F1: (120, 0)})
+    assert set(to_delete) == {ID1, ID3}
+
+def test_calculate_diff_parallel_matches_serial(monkeypatch):
+    """El cálculo repartido entre procesos da el mismo resultado que en serie."""
+    from kelly_indexer import state_manager
+    current = {f"docs/f{i}.json": [_qa(f"Pregunta {i}-{j}") for j in range(5)] for i in range(6)}
+    serial = calculate_diff(current, {}, max_workers=1)
+    monkeypatch.setattr(state_manager, "PARALLEL_DIFF_MIN_QAS", 0)
+    parallel = calculate_diff(current, {}, max_workers=2)
+    assert [item.point_id for item in parallel[0]] == [item.point_id for item in serial[0]]
+    assert parallel[2] == serial[2]
+
+def test_hash_files_splits_large_files_across_processes(monkeypatch):
+    """Un archivo grande se parte en tramos entre procesos y se reensambla en orden."""
+    from kelly_indexer import state_manager
+    pending = [("docs/grande.json", [f"Pregunta {j}" for j in range(20)], DEFAULT_HASH_ALGORITHM),
+               ("docs/vacio.json", [], DEFAULT_HASH_ALGORITHM),
+               ("docs/conocido.json", ["Otra", "Más"], None)]
+    serial = state_manager._hash_files(pending, max_workers=1)
+    monkeypatch.setattr(state_manager, "PARALLEL_DIFF_MIN_QAS", 0)
+    assert state_manager._hash_files(pending, max_workers=2) == serial
@@ -0,0 +1,156 @@
+# tests/test_text_chunker.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para el módulo text_chunker de Kelly Indexer.
+Verifica que la división rápida coincide exactamente con la de Langchain.
+"""
+
+import random
+import pytest
+
+# Sin langchain-text-splitters no hay chunker con el que comparar
+langchain_splitters = pytest.importorskip("langchain_text_splitters")
+
+# Importar funciones del módulo text_chunker
+# Asumiendo que pytest corre desde la raíz y src está en PYTHONPATH
+try:
+    from kelly_indexer.text_chunker import (
+        get_answer_chunker,
+        chunk_text,
+        chunk_texts,
+        chunk_texts_parallel,
+        iter_chunk_text,
+        get_split_function,
+        chunk_text_fast,
+        chunk_offsets,
+        materialize,
+        _fast_splitter,
+    )
+except ImportError:
+     pytest.fail("No se pudo importar desde 'kelly_indexer.text_chunker'. Asegúrate de la estructura y PYTHONPATH.", pytrace=False)
+
+
+# --- Pruebas ---
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(10, 0), (10, 3), (50, 10), (1000, 150), (2, 1)])
+def test_fast_splitter_matches_langchain(chunk_size, chunk_overlap):
+    """La división propia da los mismos chunks que RecursiveCharacterTextSplitter.split_text."""
+    chunker = get_answer_chunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    fast_split = _fast_splitter(chunker)
+    assert fast_split is not None
+    rng = random.Random(chunk_size * 1000 + chunk_overlap)
+    pieces = ["a", "bb", "ccc ", " ", "\n", "\n\n", "palabra", "x" * 25, "  "]
+    for _ in range(300):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 200)))
+        assert fast_split(text) == chunker.split_text(text), repr(text)
+
+def test_fast_splitter_skips_custom_configuration():
+    """Con separadores propios se usa el split_text de Langchain."""
+    chunker = langchain_splitters.RecursiveCharacterTextSplitter(chunk_size=50, chunk_overlap=0, separators=[". ", ""])
+    assert _fast_splitter(chunker) is None
+
+def test_chunk_texts_matches_chunk_text_and_pools_duplicates():
+    """chunk_texts equivale a chunk_text por texto y comparte los chunks repetidos."""
+    chunker = get_answer_chunker(chunk_size=40, chunk_overlap=5)
+    firma = "Atentamente, el equipo de soporte."
+    texts = [f"Primera respuesta larga con varias palabras.\n\n{firma}", None, "", f"Otra respuesta.\n\n{firma}"]
+    result = chunk_texts(chunker, texts)
+    assert result == [chunk_text(chunker, text) for text in texts]
+    assert result[0][-1] is result[3][-1]
+
+def test_chunk_texts_parallel_matches_serial(monkeypatch):
+    """El reparto entre procesos da los mismos chunks, en el mismo orden, que en serie."""
+    from kelly_indexer import text_chunker
+    monkeypatch.setattr(text_chunker, "PARALLEL_CHUNK_MIN_TEXTS", 0)
+    monkeypatch.setattr(text_chunker, "PARALLEL_CHUNK_SHARD_SIZE", 3)
+    texts = [f"Respuesta {i}. " * (i + 1) for i in range(10)] + [None]
+    expected = chunk_texts(get_answer_chunker(chunk_size=40, chunk_overlap=5), texts)
+    assert chunk_texts_parallel(texts, chunk_size=40, chunk_overlap=5, max_workers=2) == expected
+
+def test_chunk_text_memoizes_repeated_answers():
+    """Una respuesta repetida se divide una vez; cada llamada recibe su propia lista."""
+    from kelly_indexer import text_chunker
+    chunker = get_answer_chunker(chunk_size=40, chunk_overlap=5)
+    text = "Respuesta de plantilla que se repite en muchas preguntas distintas."
+    text_chunker._split_cached.cache_clear()
+    first, second = chunk_text(chunker, text), chunk_text(chunker, text)
+    assert first == second and first is not second
+    assert text_chunker._split_cached.cache_info().hits == 1
+    # Acotada: las respuestas únicas no se acumulan en memoria durante todo el proceso
+    assert text_chunker._split_cached.cache_info().maxsize <= 64
+
+def test_iter_chunk_text_matches_chunk_text():
+    """El generador produce los mismos fragmentos que chunk_text, en el mismo orden."""
+    chunker = get_answer_chunker(chunk_size=40, chunk_overlap=5)
+    texts = ["Corta.", "  ", None, "Una respuesta bastante más larga que se divide.\n\nEn varios fragmentos distintos."]
+    for text in texts:
+        assert list(iter_chunk_text(chunker, text)) == chunk_text(chunker, text)
+
+def test_chunk_text_fast_with_resolved_split_function():
+    """La función resuelta una vez da lo mismo que chunk_text para cualquier texto."""
+    chunker = get_answer_chunker(chunk_size=40, chunk_overlap=5)
+    split_fn = get_split_function(chunker)
+    assert get_split_function(chunker) is split_fn
+    for text in ["Corta.  ", "", None, "Una respuesta más larga que el tamaño de chunk configurado."]:
+        assert chunk_text_fast(split_fn, text) == chunk_text(chunker, text)
+
+def test_chunk_text_merges_small_trailing_chunk():
+    """Con min_chunk_size, un fragmento final diminuto se une al anterior sin duplicar el solapamiento."""
+    chunker = get_answer_chunker(chunk_size=40, chunk_overlap=5)
+    text = "Primera parte de la respuesta completa.\n\nFin."
+    plain = chunk_text(chunker, text)
+    assert plain[-1] == "Fin."
+    merged = chunk_text(chunker, text, min_chunk_size=10)
+    assert merged == [text]
+    assert chunk_texts(chunker, [text], min_chunk_size=10) == [merged]
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(10, 3), (50, 10)])
+def test_chunk_offsets_materialize_to_langchain_chunks(chunk_size, chunk_overlap):
+    """Los tramos (inicio, fin) reconstruyen exactamente los chunks de split_text."""
+    chunker = get_answer_chunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    rng = random.Random(chunk_size)
+    pieces = ["a", "bb", "ccc ", " ", "\n", "\n\n", "palabra", "x" * 25, "  "]
+    for _ in range(200):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 200)))
+        assert list(materialize(text, chunk_offsets(chunker, text))) == chunker.split_text(text), repr(text)
+    assert chunk_offsets(chunker, None) == []
+    assert chunk_offsets(chunker, "  Corta  ") == [(2, 7)]
+
+def test_chunk_offsets_with_custom_configuration():
+    """Con separadores propios los chunks de Langchain se localizan en el texto."""
+    chunker = langchain_splitters.RecursiveCharacterTextSplitter(chunk_size=20, chunk_overlap=0, separators=[". ", ""])
+    text = "Primera frase corta. Segunda frase corta. Tercera."
+    assert list(materialize(text, chunk_offsets(chunker, text))) == chunker.split_text(text)
+
+def test_numpy_window_merge_matches_langchain(monkeypatch):
+    """Agrupar las piezas con numpy da los mismos chunks que pieza a pieza."""
+    pytest.importorskip("numpy")
+    from kelly_indexer import text_chunker
+    monkeypatch.setattr(text_chunker, "NUMPY_MERGE_MIN_PIECES", 1)
+    rng = random.Random(7)
+    pieces = ["a", "bb", "ccc ", " ", "\n", "\n\n", "palabra", "x" * 25, "  "]
+    for chunk_size, chunk_overlap in [(10, 3), (50, 10), (40, 39)]:
+        chunker = get_answer_chunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        for _ in range(100):
+            text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 200)))
+            expected = chunker.split_text(text)
+            assert _fast_splitter(chunker)(text) == expected, repr(text)
+            assert list(materialize(text, chunk_offsets(chunker, text))) == expected, repr(text)
+
+def test_get_answer_chunker_normalizes_numeric_arguments():
+    """Configuraciones equivalentes (float entero, por nombre o posición) comparten instancia."""
+    chunker = get_answer_chunker(chunk_size=321, chunk_overlap=21)
+    assert get_answer_chunker(321, 21) is chunker
+    assert get_answer_chunker(321.0, 21.0) is chunker
+    assert get_answer_chunker(chunk_size=320.5, chunk_overlap=21) is None
+    assert get_answer_chunker(chunk_size="321", chunk_overlap=21) is None
+
+def test_chunk_text_normalizes_whitespace_when_requested():
+    """Con normalize_whitespace los espacios y saltos de línea sobrantes se colapsan antes de dividir."""
+    chunker = get_answer_chunker(chunk_size=40, chunk_overlap=5)
+    text = "Primera   parte\t\t de la respuesta.\n\n\n\n\nSegunda parte, tras   varias líneas."
+    normalized = "Primera parte de la respuesta.\n\nSegunda parte, tras varias líneas."
+    assert chunk_text(chunker, text, normalize_whitespace=True) == chunker.split_text(normalized)
+    assert chunk_texts(chunker, [text, None], normalize_whitespace=True) == [chunker.split_text(normalized), []]
+    assert chunk_text(chunker, text) == chunker.split_text(text)